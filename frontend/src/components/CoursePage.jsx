@@ -1,6 +1,6 @@
 import { useEffect, useState } from "react";
 import { useParams, useNavigate } from "react-router-dom";
-import axios from "axios";
+import { fetchCourseQuizzes } from "./fetchCourseQuizzes";
 import {
   Box,
   Heading,
@@ -21,15 +21,7 @@ function CoursePage() {
   useEffect(() => {
     const fetchQuizzes = async () => {
       try {
-        const response = await axios.get(
-          `${import.meta.env.VITE_API_BASE_URL}/api/quizzes/${courseCode}`,
-          {
-            headers: {
-              Authorization: `Bearer ${localStorage.getItem("access")}`,
-            },
-          }
-        );
-        setQuizzes(response.data);
+        setQuizzes(await fetchCourseQuizzes(courseCode));
       } catch (error) {
         console.error("Error fetching quizzes:", error);
         toast({
@@ -75,7 +67,7 @@ function CoursePage() {
               </Text>
 
               <Text>
-                <strong>Number of Questions:</strong> {quiz.questions.length}
+                <strong>Number of Questions:</strong> {quiz.question_count}
               </Text>
 
               <Button
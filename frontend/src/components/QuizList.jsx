@@ -1,6 +1,6 @@
 import { useEffect, useState, useContext } from "react";
 import { AuthContext } from "../AuthContext";
-import axios from "axios";
+import { fetchCourseQuizzes } from "./fetchCourseQuizzes";
 import { useNavigate } from "react-router-dom";
 import {
   Box,
@@ -38,16 +38,9 @@ function QuizList() {
         if (user.coursesEnrolled && user.coursesEnrolled.length > 0) {
           for (const courseCode of user.coursesEnrolled) {
             try {
-              const response = await axios.get(
-                `${import.meta.env.VITE_API_BASE_URL}/api/quizzes/${courseCode}`,
-                {
-                  headers: {
-                    Authorization: `Bearer ${localStorage.getItem("access")}`,
-                  },
-                }
-              );
+              const quizzes = await fetchCourseQuizzes(courseCode);
               const courseName = courseCode; // You might want to get actual course names
-              allQuizzes.push(...response.data.map(quiz => ({
+              allQuizzes.push(...quizzes.map(quiz => ({
                 ...quiz,
                 courseCode,
                 courseName
@@ -112,7 +105,7 @@ function QuizList() {
                   </Text>
                   <Text fontSize="sm">
                     <strong>Duration:</strong> {quiz.duration_minutes} minutes | {" "}
-                    <strong>Questions:</strong> {quiz.questions?.length || 0}
+                    <strong>Questions:</strong> {quiz.question_count || 0}
                   </Text>
                 </Box>
                 <Button
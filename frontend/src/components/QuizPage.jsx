@@ -34,6 +34,27 @@ function QuizPage() {
           }
         );
         setQuiz(response.data);
+
+        // Pick up answers autosaved before a reload or a crashed browser.
+        // Best effort: e.g. a teacher previewing the quiz has none to resume
+        try {
+          const saved = await axios.get(
+            `${import.meta.env.VITE_API_BASE_URL}/api/quiz/${quizId}/answers`,
+            {
+              headers: {
+                Authorization: `Bearer ${localStorage.getItem("access")}`,
+              },
+            }
+          );
+          setAnswers(
+            Object.fromEntries(
+              saved.data.answers.map((a) => [a.question_id, a.selected_option_id.toString()])
+            )
+          );
+        } catch (error) {
+          console.error("Failed to load autosaved answers:", error);
+          setAnswers({});
+        }
       } catch (error) {
         if (error.response?.data?.error === "You have already completed this quiz.") {
           toast({
@@ -66,6 +87,23 @@ function QuizPage() {
       ...prev,
       [questionId]: selectedOptionId,
     }));
+
+    // Best effort: the final submission carries every answer anyway
+    axios
+      .post(
+        `${import.meta.env.VITE_API_BASE_URL}/api/quiz/${quizId}/answers`,
+        {
+          answers: [
+            { question_id: questionId, selected_option_id: parseInt(selectedOptionId) },
+          ],
+        },
+        {
+          headers: {
+            Authorization: `Bearer ${localStorage.getItem("access")}`,
+          },
+        }
+      )
+      .catch(() => {});
   };
 
   const handleSubmit = async () => {
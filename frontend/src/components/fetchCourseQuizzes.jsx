@@ -0,0 +1,18 @@
+import axios from "axios";
+
+// The course quiz listing is cursor-paginated: follow `next` until the
+// last page so courses with many quizzes are listed in full
+export const fetchCourseQuizzes = async (courseCode) => {
+  const quizzes = [];
+  let url = `${import.meta.env.VITE_API_BASE_URL}/api/quizzes/${courseCode}?view=summary`;
+  while (url) {
+    const response = await axios.get(url, {
+      headers: {
+        Authorization: `Bearer ${localStorage.getItem("access")}`,
+      },
+    });
+    quizzes.push(...response.data.results);
+    url = response.data.next;
+  }
+  return quizzes;
+};
@@ -30,7 +30,6 @@ import { FaBook, FaQuestionCircle, FaTrophy, FaClock } from 'react-icons/fa';
 function StudentDashboard() {
   const { user } = useContext(AuthContext);
   const [courses, setCourses] = useState([]);
-  const [recentQuizzes, setRecentQuizzes] = useState([]);
   const [stats, setStats] = useState({
     totalQuizzes: 0,
     completedQuizzes: 0,
@@ -46,45 +45,24 @@ function StudentDashboard() {
   useEffect(() => {
     const fetchDashboardData = async () => {
       try {
-        // Fetch enrolled courses
-        const coursesResponse = await axios.get(`${import.meta.env.VITE_API_BASE_URL}/api/courses`, {
+        // Courses, their quizzes and our attempts in one request
+        const response = await axios.get(`${import.meta.env.VITE_API_BASE_URL}/api/dashboard`, {
           headers: {
             Authorization: `Bearer ${localStorage.getItem("access")}`,
           },
         });
-        setCourses(coursesResponse.data);
+        const enrolled = response.data.courses;
+        setCourses(enrolled);
 
-        // Fetch recent quiz attempts (you may need to create this endpoint)
-        try {
-          const quizzesResponse = await axios.get(`${import.meta.env.VITE_API_BASE_URL}/api/student/recent-quizzes`, {
-            headers: {
-              Authorization: `Bearer ${localStorage.getItem("access")}`,
-            },
-          });
-          setRecentQuizzes(quizzesResponse.data || []);
-        } catch (err) {
-          console.log("Recent quizzes endpoint not available");
-          setRecentQuizzes([]);
-        }
-
-        // Fetch student statistics
-        try {
-          const statsResponse = await axios.get(`${import.meta.env.VITE_API_BASE_URL}/api/student/stats`, {
-            headers: {
-              Authorization: `Bearer ${localStorage.getItem("access")}`,
-            },
-          });
-          setStats(statsResponse.data);
-        } catch (err) {
-          console.log("Stats endpoint not available");
-          setStats({
-            totalQuizzes: coursesResponse.data.length * 3, // Estimated
-            completedQuizzes: 0,
-            averageScore: 0,
-            totalCourses: coursesResponse.data.length
-          });
-        }
-        
+        const quizzes = enrolled.flatMap((course) => course.quizzes);
+        const completed = quizzes.filter((quiz) => quiz.completed);
+        const totalScore = completed.reduce((sum, quiz) => sum + (quiz.score || 0), 0);
+        setStats({
+          totalQuizzes: quizzes.length,
+          completedQuizzes: completed.length,
+          averageScore: completed.length ? Math.round(totalScore / completed.length) : 0,
+          totalCourses: enrolled.length
+        });
       } catch (error) {
         console.error("Failed to fetch dashboard data:", error);
       } finally {
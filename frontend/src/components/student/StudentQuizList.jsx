@@ -1,6 +1,6 @@
 import { useEffect, useState, useContext } from "react";
 import { AuthContext } from "../../AuthContext";
-import axios from "axios";
+import { fetchCourseQuizzes } from "../fetchCourseQuizzes";
 import { useNavigate } from "react-router-dom";
 import {
   Box,
@@ -45,15 +45,8 @@ function StudentQuizList() {
         // Fetch all quizzes from enrolled courses
         const promises = user.coursesEnrolled.map(async (courseCode) => {
           try {
-            const response = await axios.get(
-              `${import.meta.env.VITE_API_BASE_URL}/api/quizzes/${courseCode}`,
-              {
-                headers: {
-                  Authorization: `Bearer ${localStorage.getItem("access")}`,
-                },
-              }
-            );
-            return response.data.map(quiz => ({
+            const quizzes = await fetchCourseQuizzes(courseCode);
+            return quizzes.map(quiz => ({
               ...quiz,
               courseCode,
               courseName: courseCode // You might want to get actual course names
@@ -225,7 +218,7 @@ function StudentQuizList() {
                       <HStack>
                         <Icon as={FaQuestionCircle} color="gray.500" w={4} h={4} />
                         <Text fontSize="sm" color="gray.600">
-                          <Text as="span" fontWeight="semibold">Questions:</Text> {quiz.questions?.length || 0}
+                          <Text as="span" fontWeight="semibold">Questions:</Text> {quiz.question_count || 0}
                         </Text>
                       </HStack>
                     </VStack>
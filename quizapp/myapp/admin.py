@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import User, Course, Quiz, Question, Option, QuizAttempt, StudentAnswer
+from .models import User, Course, Quiz, Question, Option, QuizAttempt, StudentAnswer, AttemptReview, QuizScoreBucket
 admin.site.register(User)
 admin.site.register(Course)
 admin.site.register(Quiz)
@@ -7,4 +7,6 @@ admin.site.register(Question)
 admin.site.register(Option)
 admin.site.register(QuizAttempt)
 admin.site.register(StudentAnswer)
+admin.site.register(AttemptReview)
+admin.site.register(QuizScoreBucket)
 # Register your models here.
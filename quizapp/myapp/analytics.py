@@ -0,0 +1,130 @@
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import IntegerField, Value
+from django.db.models.functions import Cast, Coalesce
+
+from .cacheversions import bump_version, versioned_key
+from .models import Option, Question, StudentAnswer
+
+
+def _nan_to_none(values):
+    return [None if np.isnan(v) else round(float(v), 4) for v in values]
+
+
+def _lookup(sorted_ids, values):
+    '''Column index of each value in ``sorted_ids`` and whether it was found.'''
+    if not len(sorted_ids):
+        return np.zeros(len(values), dtype=np.int64), np.zeros(len(values), dtype=bool)
+    idx = np.minimum(np.searchsorted(sorted_ids, values), len(sorted_ids) - 1)
+    return idx, sorted_ids[idx] == values
+
+
+def _column_correlation(x, y):
+    '''Pearson correlation of matching columns of two 2-D arrays.'''
+    xc = x - x.mean(axis=0)
+    yc = y - y.mean(axis=0)
+    denom = np.sqrt((xc ** 2).sum(axis=0) * (yc ** 2).sum(axis=0))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(denom > 0, (xc * yc).sum(axis=0) / denom, np.nan)
+
+
+def compute_item_analysis(quiz_id):
+    '''Classical item analysis over the completed attempts of a quiz.
+
+    The attempt x question response matrix is loaded with one query and
+    every statistic is computed on NumPy arrays:
+
+    * difficulty: proportion of attempts answering the item correctly (p-value)
+    * discrimination: point-biserial correlation between the item and the
+      rest score (total minus the item), so the item is not correlated
+      with itself
+    * option selection counts and shares per question
+    * KR-20 reliability of the whole quiz
+
+    Unanswered questions count as incorrect.
+    '''
+    questions = list(Question.objects.filter(quiz_id=quiz_id).order_by('id').values_list('id', 'text'))
+    options = list(
+        Option.objects.filter(question__quiz_id=quiz_id)
+        .order_by('id')
+        .values_list('id', 'question_id', 'text', 'is_correct')
+    )
+    responses = np.array(list(
+        StudentAnswer.objects.filter(attempt__quiz_id=quiz_id, attempt__completed=True)
+        .values_list(
+            'attempt_id',
+            'question_id',
+            Coalesce('selected_option_id', Value(0)),
+            Cast('is_correct', IntegerField()),
+        )),
+        dtype=np.int64,
+    ).reshape(-1, 4)
+
+    question_ids = np.array([q[0] for q in questions], dtype=np.int64)
+    option_ids = np.array([o[0] for o in options], dtype=np.int64)
+
+    attempt_ids, row = np.unique(responses[:, 0], return_inverse=True)
+    # Answers to questions or options deleted since grading are ignored
+    col, known = _lookup(question_ids, responses[:, 1])
+    n, k = len(attempt_ids), len(question_ids)
+
+    scores = np.zeros((n, k))
+    scores[row[known], col[known]] = responses[known, 3]
+    totals = scores.sum(axis=1)
+
+    difficulty = scores.mean(axis=0) if n else np.full(k, np.nan)
+    discrimination = _column_correlation(scores, totals[:, None] - scores) if n else np.full(k, np.nan)
+
+    kr20 = None
+    if n > 1 and k > 1 and totals.var() > 0:
+        kr20 = round(float(k / (k - 1) * (1 - (difficulty * (1 - difficulty)).sum() / totals.var())), 4)
+
+    opt_col, selected = _lookup(option_ids, responses[:, 2])
+    option_counts = np.bincount(opt_col[selected], minlength=len(option_ids))
+    answered = np.bincount(col[known], minlength=k)
+
+    by_question = {qid: [] for qid, _ in questions}
+    for (option_id, question_id, text, is_correct), count in zip(options, option_counts.tolist()):
+        by_question[question_id].append({
+            'option_id': option_id,
+            'text': text,
+            'is_correct': is_correct,
+            'count': count,
+            'share': round(count / n, 4) if n else None,
+        })
+
+    return {
+        'quiz_id': quiz_id,
+        'attempts': n,
+        'questions_count': k,
+        'mean_score': round(float(totals.mean() / k * 100), 2) if n and k else None,
+        'kr20': kr20,
+        'questions': [
+            {
+                'question_id': qid,
+                'text': text,
+                'answered': answered_count,
+                'difficulty': p,
+                'discrimination': r,
+                'options': by_question[qid],
+            }
+            for (qid, text), answered_count, p, r in zip(
+                questions, answered.tolist(), _nan_to_none(difficulty), _nan_to_none(discrimination)
+            )
+        ],
+    }
+
+
+def get_item_analysis(quiz_id):
+    '''Cached item analysis; dropped whenever an attempt of the quiz completes.'''
+    key = versioned_key('item-analysis', quiz_id)
+    report = cache.get(key)
+    if report is None:
+        report = compute_item_analysis(quiz_id)
+        cache.set(key, report, getattr(settings, 'ITEM_ANALYSIS_CACHE_TIMEOUT', 24 * 3600))
+    return report
+
+
+def invalidate_item_analysis(quiz_id):
+    bump_version('item-analysis', quiz_id)
@@ -0,0 +1,104 @@
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .cacheversions import bump_version, get_version
+from .models import Option
+
+
+class AnswerKey(dict):
+    '''{question_id: (correct_option_id, frozenset(option_ids))}, plus the
+    quiz's ``questions_per_attempt`` so grading can redo a student's draw.'''
+    questions_per_attempt = None
+
+
+def load_answer_key(quiz_id):
+    '''Answer key for a quiz, loaded with a single query.
+
+    Questions without options never appear in the key.
+    '''
+    key = {}
+    per_attempt = None
+    rows = Option.objects.filter(question__quiz_id=quiz_id).values_list(
+        'question_id', 'id', 'is_correct', 'question__quiz__questions_per_attempt',
+    )
+    for question_id, option_id, is_correct, per_attempt in rows:
+        entry = key.setdefault(question_id, [None, set()])
+        entry[1].add(option_id)
+        if is_correct:
+            entry[0] = option_id
+    answer_key = AnswerKey((qid, (correct, frozenset(options))) for qid, (correct, options) in key.items())
+    answer_key.questions_per_attempt = per_attempt
+    return answer_key
+
+
+class AnswerKeyCache:
+    '''Bounded, thread-safe LRU of answer keys keyed by quiz id.
+
+    The cache lives in the process; every process keeps its own copy and
+    relies on the Question/Option signals in ``myapp.signals`` to drop
+    entries when the underlying rows change. Each entry is stamped with
+    the quiz's 'answer-key' version from the shared cache, which
+    invalidation bumps, so the other processes reload a key changed
+    elsewhere on their next lookup.
+    '''
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped on every invalidation so a key loaded concurrently with
+        # an edit is returned to its caller but never stored.
+        self._generation = 0
+
+    def get(self, quiz_id):
+        version = get_version('answer-key', quiz_id)
+        with self._lock:
+            entry = self._data.get(quiz_id)
+            if entry is not None and entry[0] == version:
+                self._data.move_to_end(quiz_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            generation = self._generation
+        key = load_answer_key(quiz_id)
+        with self._lock:
+            if generation != self._generation:
+                return key
+            self._data[quiz_id] = (version, key)
+            self._data.move_to_end(quiz_id)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return key
+
+    def invalidate(self, quiz_id):
+        bump_version('answer-key', quiz_id)
+        with self._lock:
+            self._generation += 1
+            self._data.pop(quiz_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+answer_keys = AnswerKeyCache(getattr(settings, 'ANSWER_KEY_CACHE_SIZE', 256))
+
+
+def get_answer_key(quiz_id):
+    return answer_keys.get(quiz_id)
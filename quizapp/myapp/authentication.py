@@ -0,0 +1,30 @@
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from .membership import claims_user
+
+
+class MembershipJWTAuthentication(JWTAuthentication):
+    '''JWT authentication that trusts current membership claims.
+
+    Tokens minted by MembershipTokenObtainPairSerializer authenticate as a
+    ClaimsUser without loading the user row. Tokens without claims, or
+    whose membership version is out of date, load the user as usual.
+    '''
+
+    def get_user(self, validated_token):
+        return claims_user(validated_token) or super().get_user(validated_token)
+
+
+class QueryTokenAuthentication(MembershipJWTAuthentication):
+    '''Also accepts the access token in the ``access_token`` query
+    parameter, for clients that cannot set headers such as EventSource.'''
+
+    def authenticate(self, request):
+        result = super().authenticate(request)
+        if result is not None:
+            return result
+        raw_token = request.GET.get('access_token')
+        if not raw_token:
+            return None
+        validated_token = self.get_validated_token(raw_token.encode())
+        return self.get_user(validated_token), validated_token
@@ -0,0 +1,124 @@
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import QuizAttempt, StudentAnswer
+
+logger = logging.getLogger(__name__)
+
+
+class AutosaveBuffer:
+    '''In-process buffer of autosaved answers, flushed to the database in batches.
+
+    Only the last answer per (attempt, question) is kept, so a student
+    changing their mind ten times between flushes costs one row. A daemon
+    thread flushes every AUTOSAVE_FLUSH_INTERVAL seconds, and a save that
+    brings the buffer to AUTOSAVE_MAX_PENDING answers flushes at once.
+    Each flush is one transaction with a single upsert, and answers of
+    attempts completed in the meantime are dropped. The batch being
+    written stays visible to ``take`` and ``peek`` until it commits, so a
+    submission racing a flush finds every answer either here or in the
+    table.
+
+    The buffer is per process: answers not yet flushed when a process dies
+    are lost, which is the window the client's final submission covers.
+    '''
+
+    def __init__(self):
+        self._pending = {}
+        self._inflight = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+
+    def save(self, attempt_id, answers):
+        '''Buffer {question_id: option_id} for an attempt.'''
+        with self._lock:
+            buffered = self._pending.setdefault(attempt_id, {})
+            self._size -= len(buffered)
+            buffered.update(answers)
+            self._size += len(buffered)
+            size = self._size
+            self._start()
+        if size >= getattr(settings, 'AUTOSAVE_MAX_PENDING', 1000):
+            self.flush()
+
+    def take(self, attempt_id):
+        '''Remove and return the buffered answers of an attempt as {question_id: option_id}.'''
+        with self._lock:
+            answers = self._pending.pop(attempt_id, {})
+            self._size -= len(answers)
+            return {**self._inflight.get(attempt_id, {}), **answers}
+
+    def peek(self, attempt_id):
+        with self._lock:
+            return {**self._inflight.get(attempt_id, {}), **self._pending.get(attempt_id, {})}
+
+    def flush(self):
+        '''Write every buffered answer; returns the number of rows written.'''
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending, self._size = self._pending, {}, 0
+                self._inflight = pending
+            if not pending:
+                return 0
+            try:
+                with transaction.atomic():
+                    open_attempts = QuizAttempt.objects.filter(
+                        pk__in=list(pending), completed=False,
+                    ).values_list('pk', flat=True)
+                    rows = [
+                        StudentAnswer(attempt_id=attempt_id, question_id=question_id, selected_option_id=option_id)
+                        for attempt_id in open_attempts
+                        for question_id, option_id in pending[attempt_id].items()
+                    ]
+                    StudentAnswer.objects.bulk_create(
+                        rows,
+                        update_conflicts=True,
+                        unique_fields=['attempt', 'question'],
+                        update_fields=['selected_option'],
+                    )
+            except Exception:
+                # Keep the answers for the next flush, behind any newer saves
+                with self._lock:
+                    self._inflight = {}
+                    for attempt_id, answers in pending.items():
+                        buffered = self._pending.setdefault(attempt_id, {})
+                        self._size -= len(buffered)
+                        self._pending[attempt_id] = {**answers, **buffered}
+                        self._size += len(self._pending[attempt_id])
+                raise
+            with self._lock:
+                self._inflight = {}
+            return len(rows)
+
+    def clear(self):
+        with self._lock:
+            self._pending.clear()
+            self._inflight = {}
+            self._size = 0
+
+    def _start(self):
+        interval = getattr(settings, 'AUTOSAVE_FLUSH_INTERVAL', 2.0)
+        if self._thread is None and interval:
+            self._thread = threading.Thread(target=self._run, args=(interval,), name='autosave-flush', daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+
+    def _run(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Autosave flush failed; retrying with the next one')
+            finally:
+                connection.close()
+
+
+autosaves = AutosaveBuffer()
@@ -0,0 +1,38 @@
+import time
+
+from django.core.cache import cache
+
+
+# Derived data is cached under a key that embeds a version counter, and
+# invalidation bumps the counter instead of deleting the entry. A render
+# that raced with a change is then stored under a version nobody reads
+# any more. Counters start from the clock so an evicted counter never
+# resurrects an old entry.
+VERSION_KEY = 'version:{}:{}'
+
+
+def get_version(namespace, object_id):
+    return cache.get_or_set(VERSION_KEY.format(namespace, object_id), time.time_ns, timeout=None)
+
+
+def get_versions(namespace, object_ids):
+    '''{object_id: version} for many objects with one cache round trip.'''
+    keys = {VERSION_KEY.format(namespace, object_id): object_id for object_id in object_ids}
+    found = cache.get_many(keys)
+    versions = {keys[key]: version for key, version in found.items()}
+    for key, object_id in keys.items():
+        if key not in found:
+            versions[object_id] = cache.get_or_set(key, time.time_ns, timeout=None)
+    return versions
+
+
+def bump_version(namespace, object_id):
+    key = VERSION_KEY.format(namespace, object_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=None)
+
+
+def versioned_key(namespace, object_id):
+    return f'{namespace}:{object_id}:{get_version(namespace, object_id)}'
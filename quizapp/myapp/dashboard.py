@@ -0,0 +1,84 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import OuterRef, Prefetch, Subquery
+from django.utils import timezone
+
+from .cacheversions import bump_version, get_version, get_versions
+from .models import Course, Quiz, QuizAttempt
+from .serializers import DashboardCourseSerializer
+
+
+# A student's dashboard is cached under a key built from the student's
+# own version (bumped when an attempt is graded) and the version of every
+# enrolled course (bumped when the course, its teachers or its quizzes
+# change). Enrolling or leaving a course changes the course list, and so
+# the key, without any invalidation.
+
+
+def dashboard_key(user):
+    course_ids = sorted(user.enrolled_course_ids)
+    versions = get_versions('dashboard-course', course_ids)
+    stamp = ','.join(f'{course_id}:{versions[course_id]}' for course_id in course_ids)
+    digest = hashlib.sha1(stamp.encode()).hexdigest()
+    return f"dashboard:{user.pk}:{get_version('dashboard-student', user.pk)}:{digest}"
+
+
+def render_dashboard(user, now):
+    '''(data, next_change) for a student, in three queries.
+
+    ``data`` lists the enrolled courses with teachers and published
+    quizzes; ``next_change`` is when the first quiz opens or closes, and
+    so when the quiz states in ``data`` go stale, or None.
+    '''
+    attempt = QuizAttempt.objects.filter(quiz=OuterRef('pk'), student=user)
+    quizzes = Quiz.objects.filter(is_published=True).annotate(
+        attempt_completed=Subquery(attempt.values('completed')[:1]),
+        attempt_score=Subquery(attempt.values('score')[:1]),
+    ).order_by('start_time', 'id')
+    courses = list(Course.objects.filter(pk__in=user.enrolled_course_ids).order_by('code').prefetch_related(
+        'teachers',
+        Prefetch('quizzes', queryset=quizzes, to_attr='dashboard_quizzes'),
+    ))
+    next_change = min((
+        moment
+        for course in courses for quiz in course.dashboard_quizzes
+        for moment in (quiz.start_time, quiz.end_time) if moment > now
+    ), default=None)
+    return DashboardCourseSerializer(courses, many=True, context={'now': now}).data, next_change
+
+
+def get_dashboard(user):
+    '''The cached dashboard of a student, rendered on first use.
+
+    Entries expire when a quiz opens or closes so the quiz states are
+    never stale, and after DASHBOARD_CACHE_SECONDS at the latest.
+    '''
+    key = dashboard_key(user)
+    data = cache.get(key)
+    if data is None:
+        now = timezone.now()
+        data, next_change = render_dashboard(user, now)
+        timeout = getattr(settings, 'DASHBOARD_CACHE_SECONDS', 300)
+        if next_change is not None:
+            timeout = max(1, min(timeout, int((next_change - now).total_seconds()) + 1))
+        cache.set(key, data, timeout)
+    return data
+
+
+def invalidate_course_dashboards(course_ids):
+    '''Drop the dashboards of every student of the courses, now and on commit.'''
+    course_ids = set(course_ids)
+
+    def bump():
+        for course_id in course_ids:
+            bump_version('dashboard-course', course_id)
+    bump()
+    transaction.on_commit(bump)
+
+
+def invalidate_student_dashboards(student_ids):
+    for student_id in set(student_ids):
+        bump_version('dashboard-student', student_id)
@@ -0,0 +1,98 @@
+from functools import partial
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count, Exists, OuterRef, Q
+from django.utils import timezone
+
+from .dashboard import invalidate_student_dashboards
+from .grading import attempts_completed, percent_correct
+from .leaderboard import record_scores
+from .models import Option, QuizAttempt, StudentAnswer
+from .reviews import write_reviews
+
+
+def attempt_deadline(quiz, start):
+    '''When an attempt started at ``start`` runs out: its duration, capped at the quiz's end.'''
+    return min(start + timezone.timedelta(minutes=quiz.duration_minutes), quiz.end_time)
+
+
+def grace():
+    '''Slack for requests in flight and autosaves not yet flushed.'''
+    return timezone.timedelta(seconds=getattr(settings, 'ATTEMPT_GRACE_SECONDS', 30))
+
+
+def start_attempt(student, quiz):
+    '''The student's attempt at ``quiz``, started now if there is none.
+
+    Returns (attempt, created). Read from the default database even in
+    ``read_replica`` views, since a lagging replica would miss the row.
+    '''
+    attempt, created = QuizAttempt.objects.using(DEFAULT_DB_ALIAS).get_or_create(
+        student=student, quiz=quiz,
+        defaults={'deadline': attempt_deadline(quiz, timezone.now())},
+    )
+    if created:
+        invalidate_student_dashboards([student.id])
+    return attempt, created
+
+
+def is_expired(attempt, quiz, now=None):
+    '''Whether it is too late to answer: past the attempt's deadline, or the
+    quiz's end for an attempt never started, allowing for ``grace``.'''
+    deadline = attempt.deadline if attempt is not None and attempt.deadline else quiz.end_time
+    return (now or timezone.now()) > deadline + grace()
+
+
+def expire_attempts(now=None, limit=500):
+    '''Finalize up to ``limit`` attempts whose deadline has passed.
+
+    Expired attempts are found through the partial (deadline) index and
+    graded on whatever answers were saved, in one transaction of bulk
+    statements: one UPDATE marks the answers, one query counts the correct
+    and graded answers per attempt, the scores are computed by
+    ``percent_correct`` as at submission and written back in bulk, then
+    the reviews and leaderboard histograms are written as for a
+    submission. Returns the number of attempts finalized.
+    '''
+    cutoff = (now or timezone.now()) - grace()
+    with transaction.atomic():
+        attempts = list(
+            QuizAttempt.objects.filter(completed=False, deadline__lt=cutoff)
+            .order_by('deadline').values_list('id', 'quiz_id', 'student_id')[:limit]
+        )
+        if not attempts:
+            return 0
+        ids = [attempt_id for attempt_id, _, _ in attempts]
+
+        StudentAnswer.objects.filter(attempt_id__in=ids).update(is_correct=Exists(
+            Option.objects.filter(pk=OuterRef('selected_option_id'), is_correct=True)
+        ))
+        scores = {
+            attempt_id: percent_correct(correct, total)
+            for attempt_id, correct, total in (
+                StudentAnswer.objects.filter(attempt_id__in=ids).order_by()
+                .values('attempt_id')
+                .annotate(total=Count('id'), correct=Count('id', filter=Q(is_correct=True)))
+                .values_list('attempt_id', 'correct', 'total')
+            )
+        }
+        QuizAttempt.objects.bulk_update(
+            [QuizAttempt(pk=attempt_id, completed=True, score=scores.get(attempt_id, 0.0)) for attempt_id in ids],
+            ['completed', 'score'],
+        )
+
+        write_reviews(ids)
+        by_quiz = {}
+        for attempt_id, quiz_id, student_id in attempts:
+            by_quiz.setdefault(quiz_id, []).append((attempt_id, student_id, scores.get(attempt_id, 0.0)))
+        for quiz_id, quiz_attempts in by_quiz.items():
+            record_scores(quiz_id, [score for _, _, score in quiz_attempts])
+            transaction.on_commit(partial(
+                attempts_completed.send,
+                sender=QuizAttempt, quiz_id=quiz_id,
+                attempt_ids=[attempt_id for attempt_id, _, _ in quiz_attempts],
+                student_ids=[student_id for _, student_id, _ in quiz_attempts],
+                scores=[score for _, _, score in quiz_attempts],
+            ))
+    return len(ids)
@@ -0,0 +1,282 @@
+import re
+import zlib
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from .models import Option, Question, QuestionBand
+
+
+# 128 hash functions in 16 bands of 8: two questions become candidates
+# when a whole band agrees, which is likely above a Jaccard similarity of
+# about (1/16) ** (1/8) = 0.71 and unlikely well below it
+NUM_PERM = 128
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 5
+
+# Universal hashing modulo a Mersenne prime; shingle hashes and the
+# coefficients stay below 2**31 so a * x + b fits in 64 bits. The seeds
+# are fixed: stored signatures must match the ones computed later.
+_PRIME = (1 << 31) - 1
+_rng = np.random.RandomState(0x51A7)
+_A = _rng.randint(1, _PRIME, NUM_PERM).astype(np.uint64)
+_B = _rng.randint(0, _PRIME, NUM_PERM).astype(np.uint64)
+_BAND_MULTIPLIERS = _rng.randint(1, 1 << 62, ROWS, dtype=np.int64).astype(np.uint64) | np.uint64(1)
+_BAND_SALTS = _rng.randint(0, 1 << 62, BANDS, dtype=np.int64).astype(np.uint64)
+
+# Shingle hashes handled per NumPy step, bounding the (shingles x NUM_PERM) matrix
+_CHUNK = 1 << 15
+
+_WORD = re.compile(r'\w+')
+
+
+def question_document(text, options):
+    '''The text a question is compared on: its text and its options, in any order.'''
+    return ' '.join([text, *sorted(options)])
+
+
+def _shingle_hashes(document):
+    normalized = ' '.join(_WORD.findall(document.lower()))
+    if len(normalized) <= SHINGLE_SIZE:
+        shingles = {normalized}
+    else:
+        shingles = {normalized[i:i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1)}
+    return [zlib.crc32(shingle.encode()) & 0x7FFFFFFF for shingle in shingles]
+
+
+def minhash_signatures(documents):
+    '''MinHash signatures of ``documents`` as an (n, NUM_PERM) uint32 array.
+
+    Documents are cut into character shingles; every shingle hash of a
+    chunk of documents is permuted by all NUM_PERM hash functions in one
+    NumPy expression and reduced to per-document minimums.
+    '''
+    signatures = np.empty((len(documents), NUM_PERM), dtype=np.uint32)
+    start = 0
+    while start < len(documents):
+        hashes, offsets = [], []
+        end = start
+        while end < len(documents) and (not hashes or len(hashes) < _CHUNK):
+            offsets.append(len(hashes))
+            hashes.extend(_shingle_hashes(documents[end]))
+            end += 1
+        values = np.array(hashes, dtype=np.uint64)[:, None]
+        permuted = (values * _A + _B) % np.uint64(_PRIME)
+        signatures[start:end] = np.minimum.reduceat(permuted, offsets, axis=0)
+        start = end
+    return signatures
+
+
+def band_buckets(signatures):
+    '''The LSH bucket of every band of every signature, as an (n, BANDS) int64 array.'''
+    bands = signatures.reshape(len(signatures), BANDS, ROWS).astype(np.uint64)
+    # Wraps modulo 2**64, which is all a hash needs
+    mixed = (bands * _BAND_MULTIPLIERS).sum(axis=2) ^ _BAND_SALTS
+    return mixed.view(np.int64)
+
+
+def signature_bytes(signature):
+    return signature.astype('<u4').tobytes()
+
+
+def _signature(value):
+    return np.frombuffer(bytes(value), dtype='<u4')
+
+
+def index_questions(questions, documents):
+    '''Set the signatures of unsaved ``questions`` from their ``documents``.
+
+    Returns the QuestionBand rows to create once the questions have ids,
+    as a function of the saved questions.
+    '''
+    signatures = minhash_signatures(documents)
+    for question, signature in zip(questions, signatures):
+        question.minhash = signature_bytes(signature)
+    buckets = band_buckets(signatures)
+
+    def bands():
+        return [
+            QuestionBand(question_id=question.pk, bucket=int(bucket))
+            for question, row in zip(questions, buckets)
+            for bucket in row
+        ]
+    return bands
+
+
+def reindex_questions(question_ids):
+    '''Recompute the signatures and bands of saved questions, e.g. after an edit.'''
+    documents = {
+        question_id: (text, [])
+        for question_id, text in Question.objects.filter(pk__in=question_ids).values_list('id', 'text')
+    }
+    for question_id, text in Option.objects.filter(question_id__in=list(documents)).values_list('question_id', 'text'):
+        documents[question_id][1].append(text)
+    if not documents:
+        return
+    questions = [Question(pk=question_id) for question_id in documents]
+    QuestionBand.objects.filter(question_id__in=list(documents)).delete()
+    _store(questions, minhash_signatures([question_document(*documents[q.pk]) for q in questions]))
+
+
+def find_duplicates(quiz_ids, course_ids, threshold=None):
+    '''Near-duplicates of the questions of ``quiz_ids`` among the
+    questions of ``course_ids``, those quizzes included.
+
+    Candidates come from one query joining the quizzes' LSH buckets to
+    every question sharing one, so the cost follows the number of
+    collisions rather than the size of the bank. Candidates are kept
+    when their estimated Jaccard similarity reaches ``threshold``
+    (DUPLICATE_SIMILARITY). Each pair is reported once, on the newer
+    question. Returns {quiz_id: [{question_id, index, matches}]}, where
+    ``index`` is the question's position in its quiz.
+    '''
+    if threshold is None:
+        threshold = getattr(settings, 'DUPLICATE_SIMILARITY', 0.8)
+    quiz_ids = set(quiz_ids)
+    rows = QuestionBand.objects.filter(
+        bucket__in=QuestionBand.objects.filter(question__quiz_id__in=quiz_ids).values('bucket'),
+        question__quiz__course_id__in=course_ids,
+    ).values_list('bucket', 'question_id', 'question__quiz_id', 'question__minhash')
+
+    in_bucket, buckets_of, quiz_of, signatures = {}, {}, {}, {}
+    for bucket, question_id, quiz_id, minhash in rows:
+        in_bucket.setdefault(bucket, set()).add(question_id)
+        quiz_of[question_id] = quiz_id
+        if question_id not in signatures:
+            signatures[question_id] = _signature(minhash)
+        if quiz_id in quiz_ids:
+            buckets_of.setdefault(question_id, set()).add(bucket)
+
+    found = {}
+    positions = {}
+    for question_id in sorted(buckets_of):
+        quiz_id = quiz_of[question_id]
+        index = positions[quiz_id] = positions.get(quiz_id, -1) + 1
+        candidates = sorted({
+            other for bucket in buckets_of[question_id] for other in in_bucket[bucket] if other < question_id
+        })
+        if not candidates:
+            continue
+        similarity = (np.stack([signatures[c] for c in candidates]) == signatures[question_id]).mean(axis=1)
+        matches = [
+            {'question_id': other, 'quiz_id': quiz_of[other], 'similarity': round(float(score), 3)}
+            for other, score in zip(candidates, similarity) if score >= threshold
+        ]
+        if matches:
+            matches.sort(key=lambda match: -match['similarity'])
+            found.setdefault(quiz_id, []).append({'question_id': question_id, 'index': index, 'matches': matches})
+    return found
+
+
+def bank_signatures(batch_size=20000, reindex=False):
+    '''Signatures of every question in the bank, computed afresh in batches.
+
+    Returns (question_ids, signatures) as NumPy arrays. With ``reindex``,
+    questions stored without a signature (created before signatures were
+    kept) get theirs, and their bands, on the way.
+    '''
+    ids, chunks = [], []
+    last_id = 0
+    while True:
+        batch = list(
+            Question.objects.filter(pk__gt=last_id).order_by('pk')
+            .values_list('id', 'text', 'minhash')[:batch_size]
+        )
+        if not batch:
+            break
+        last_id = batch[-1][0]
+        options = {}
+        for question_id, text in (
+            Option.objects.filter(question_id__gte=batch[0][0], question_id__lte=last_id)
+            .values_list('question_id', 'text')
+        ):
+            options.setdefault(question_id, []).append(text)
+        signatures = minhash_signatures([question_document(text, options.get(pk, [])) for pk, text, _ in batch])
+        if reindex:
+            missing = [n for n, (_, _, minhash) in enumerate(batch) if minhash is None]
+            _store([Question(pk=batch[n][0]) for n in missing], signatures[missing])
+        ids.extend(pk for pk, _, _ in batch)
+        chunks.append(signatures)
+    if not chunks:
+        return np.empty(0, dtype=np.int64), np.empty((0, NUM_PERM), dtype=np.uint32)
+    return np.array(ids, dtype=np.int64), np.concatenate(chunks)
+
+
+def _store(questions, signatures):
+    if not questions:
+        return
+    for question, signature in zip(questions, signatures):
+        question.minhash = signature_bytes(signature)
+    with transaction.atomic():
+        Question.objects.bulk_update(questions, ['minhash'], batch_size=1000)
+        QuestionBand.objects.bulk_create([
+            QuestionBand(question_id=question.pk, bucket=int(bucket))
+            for question, row in zip(questions, band_buckets(signatures))
+            for bucket in row
+        ], batch_size=5000)
+
+
+def candidate_pairs(buckets):
+    '''Index pairs (left, right) of rows sharing a bucket in some band.
+
+    Each band is sorted once; every row of a run of equal buckets is
+    paired with the run's first row and with its predecessor, which
+    connects the whole run without enumerating all of its pairs.
+    '''
+    lefts, rights = [], []
+    for band in range(buckets.shape[1]):
+        order = np.argsort(buckets[:, band], kind='stable')
+        keys = buckets[order, band]
+        if len(keys) < 2:
+            continue
+        same = np.flatnonzero(keys[1:] == keys[:-1]) + 1
+        starts = np.ones(len(keys), dtype=bool)
+        starts[same] = False
+        run_start = np.maximum.accumulate(np.where(starts, np.arange(len(keys)), 0))
+        lefts += [order[run_start[same]], order[same - 1]]
+        rights += [order[same], order[same]]
+    if not lefts:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    pairs = np.unique(np.stack([np.concatenate(lefts), np.concatenate(rights)], axis=1), axis=0)
+    pairs = pairs[pairs[:, 0] != pairs[:, 1]]
+    return pairs[:, 0], pairs[:, 1]
+
+
+def cluster_duplicates(question_ids, signatures, threshold=None, chunk=100000):
+    '''Group near-duplicate questions: the connected components of
+    candidate pairs whose estimated similarity reaches ``threshold``.
+
+    Returns clusters of two or more question ids, largest first.
+    '''
+    if threshold is None:
+        threshold = getattr(settings, 'DUPLICATE_SIMILARITY', 0.8)
+    left, right = candidate_pairs(band_buckets(signatures))
+    keep = np.zeros(len(left), dtype=bool)
+    for start in range(0, len(left), chunk):
+        end = start + chunk
+        keep[start:end] = (signatures[left[start:end]] == signatures[right[start:end]]).mean(axis=1) >= threshold
+
+    parent = {}
+
+    def root(n):
+        while parent.get(n, n) != n:
+            parent[n] = parent.get(parent[n], parent[n])
+            n = parent[n]
+        return n
+
+    for a, b in zip(left[keep].tolist(), right[keep].tolist()):
+        parent.setdefault(a, a)
+        parent.setdefault(b, b)
+        ra, rb = root(a), root(b)
+        if ra != rb:
+            parent[max(ra, rb)] = min(ra, rb)
+
+    clusters = {}
+    for n in parent:
+        clusters.setdefault(root(n), []).append(n)
+    return sorted(
+        (sorted(int(question_ids[n]) for n in members) for members in clusters.values()),
+        key=lambda members: (-len(members), members[0]),
+    )
@@ -0,0 +1,249 @@
+import hashlib
+import json
+import logging
+import random
+import threading
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import GeneratedQuestionSet, GenerationJob
+from .quizbuilder import QuizPayloadError, clean_questions, create_quizzes
+from .quizpayload import prewarm_quiz_payload
+
+logger = logging.getLogger(__name__)
+
+
+DIFFICULTIES = ('easy', 'medium', 'hard')
+
+
+class QuizGenerator:
+    '''Produces multiple-choice questions on a topic.
+
+    Implementations set ``name``, which is part of the cache key: change it
+    whenever the same inputs would give different questions, so question
+    sets of the old version are no longer served. Configured with
+    QUIZ_GENERATOR.
+    '''
+
+    name = None
+
+    def generate(self, topic, difficulty, count):
+        '''``count`` questions as {"text", "options", "correct_option"} dicts,
+        the format create_quiz accepts. ``topic`` and ``difficulty`` are
+        normalized (see ``normalize_request``).'''
+        raise NotImplementedError
+
+
+class LocalGenerator(QuizGenerator):
+    '''Deterministic stand-in: placeholder questions seeded by the inputs,
+    for tests and development without a model to call.'''
+
+    name = 'local-1'
+
+    OPTIONS = {'easy': 3, 'medium': 4, 'hard': 5}
+
+    def generate(self, topic, difficulty, count):
+        rng = random.Random(hashlib.sha256(f'{topic}\0{difficulty}'.encode()).digest())
+        questions = []
+        for n in range(1, count + 1):
+            num_options = self.OPTIONS[difficulty]
+            questions.append({
+                'text': f'{topic.capitalize()}, question {n} of {count} ({difficulty}): which statement is true?',
+                'options': [f'Statement {n}.{m} about {topic}' for m in range(1, num_options + 1)],
+                'correct_option': rng.randrange(num_options),
+            })
+        return questions
+
+
+_generators = {}
+
+
+def get_generator():
+    '''The QUIZ_GENERATOR instance, one per process.'''
+    path = getattr(settings, 'QUIZ_GENERATOR', 'myapp.generation.LocalGenerator')
+    if path not in _generators:
+        _generators[path] = import_string(path)()
+    return _generators[path]
+
+
+def normalize_request(topic, difficulty, count):
+    '''Inputs as they are generated and cached: the topic in NFKC with
+    single spaces and no case, so requests worded alike share a question
+    set. Raises QuizPayloadError.'''
+    topic = ' '.join(unicodedata.normalize('NFKC', str(topic or '')).split()).casefold()
+    difficulty = str(difficulty or '').strip().lower()
+    if not topic:
+        raise QuizPayloadError('topic is required.')
+    if len(topic) > GeneratedQuestionSet._meta.get_field('topic').max_length:
+        raise QuizPayloadError('topic is too long.')
+    if difficulty not in DIFFICULTIES:
+        raise QuizPayloadError(f"difficulty must be one of {', '.join(DIFFICULTIES)}.")
+    max_questions = getattr(settings, 'GENERATION_MAX_QUESTIONS', 50)
+    if isinstance(count, bool) or not isinstance(count, int) or not 0 < count <= max_questions:
+        raise QuizPayloadError(f'num_questions must be between 1 and {max_questions}.')
+    return topic, difficulty, count
+
+
+def clean_generation_request(data):
+    '''Validate a generate_quiz payload; returns GenerationJob fields
+    (without ``created_by``). Raises QuizPayloadError.'''
+    course_id = data.get('course_id')
+    title = data.get('title')
+    num_questions = data.get('num_questions')
+    duration_minutes = data.get('duration_minutes')
+
+    if not (course_id and title and num_questions and duration_minutes):
+        raise QuizPayloadError('Missing required fields.')
+    try:
+        course_id = int(course_id)
+        duration_minutes = int(duration_minutes)
+        num_questions = int(num_questions)
+    except (TypeError, ValueError):
+        raise QuizPayloadError('Invalid course_id, duration_minutes or num_questions.')
+    if not isinstance(title, str) or len(title) > GenerationJob._meta.get_field('title').max_length:
+        raise QuizPayloadError('Invalid title.')
+
+    topic, difficulty, num_questions = normalize_request(data.get('topic'), data.get('difficulty'), num_questions)
+    return {
+        'course_id': course_id,
+        'title': title,
+        'topic': topic,
+        'difficulty': difficulty,
+        'num_questions': num_questions,
+        'duration_minutes': duration_minutes,
+    }
+
+
+def cache_key(generator, topic, difficulty, count):
+    '''The content address of a question set: a hash of the generator and its normalized inputs.'''
+    inputs = json.dumps([generator.name, topic, difficulty, count], separators=(',', ':'))
+    return hashlib.sha256(inputs.encode()).hexdigest()
+
+
+_generating = {}  # cache key -> [lock, holders]
+_generating_lock = threading.Lock()
+
+
+@contextmanager
+def _generating_once(key):
+    # Threads of this process wanting the same question set take turns, so
+    # the first generates it and the others find it stored
+    with _generating_lock:
+        entry = _generating.setdefault(key, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _generating_lock:
+            entry[1] -= 1
+            if not entry[1]:
+                del _generating[key]
+
+
+def question_set_for(topic, difficulty, count, generator=None):
+    '''The question set for normalized inputs, generating it on a miss.
+
+    Returns (question_set, cached). Generated questions are validated like
+    a create_quiz payload before they are stored; a generator returning
+    anything else raises QuizPayloadError.
+    '''
+    generator = generator or get_generator()
+    key = cache_key(generator, topic, difficulty, count)
+    with _generating_once(key):
+        question_set = GeneratedQuestionSet.objects.filter(pk=key).first()
+        if question_set is not None:
+            return question_set, True
+        questions = generator.generate(topic, difficulty, count)
+        if not isinstance(questions, list) or len(questions) != count:
+            raise QuizPayloadError(f'The generator returned {len(questions or [])} of {count} questions.')
+        questions = [
+            {'text': text, 'options': options, 'correct_option': correct_index}
+            for text, options, correct_index in clean_questions(questions)
+        ]
+        # Another process may have stored the same set meanwhile; keep theirs
+        question_set, created = GeneratedQuestionSet.objects.get_or_create(pk=key, defaults={
+            'generator': generator.name, 'topic': topic, 'difficulty': difficulty, 'count': count,
+            'questions': questions,
+        })
+        return question_set, not created
+
+
+def run_job(job_id):
+    '''Run a queued job: fetch or generate its questions and create its quiz
+    through ``create_quizzes``. Jobs already claimed are left alone.'''
+    if not GenerationJob.objects.filter(pk=job_id, status='queued').update(status='running'):
+        return
+    job = GenerationJob.objects.select_related('created_by').get(pk=job_id)
+    try:
+        question_set, job.cached = question_set_for(job.topic, job.difficulty, job.num_questions)
+        with transaction.atomic():
+            [job.quiz] = create_quizzes([{
+                'course_id': job.course_id,
+                'title': job.title,
+                'duration_minutes': job.duration_minutes,
+                'questions': [(q['text'], q['options'], q['correct_option']) for q in question_set.questions],
+                'created_by': job.created_by,
+            }])
+            job.question_set = question_set
+            job.status = 'succeeded'
+            job.finished_at = timezone.now()
+            job.save(update_fields=['status', 'cached', 'question_set', 'quiz', 'finished_at'])
+    except Exception as exc:
+        logger.exception('Generation job %s failed', job_id)
+        GenerationJob.objects.filter(pk=job_id).update(
+            status='failed', error=str(exc) or type(exc).__name__, finished_at=timezone.now(),
+        )
+        return
+    prewarm_quiz_payload(job.quiz.id)
+
+
+class GenerationQueue:
+    '''Runs generation jobs on a bounded pool of threads.
+
+    At most GENERATION_WORKERS jobs run at once; later ones wait in the
+    pool's queue. The pool starts on first use. Jobs are rows, so jobs
+    still queued when a process stops are picked up by
+    ``manage.py process_generation_jobs``. With GENERATION_WORKERS = 0
+    jobs run inline, in the caller's thread.
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def submit(self, job_id):
+        workers = getattr(settings, 'GENERATION_WORKERS', 4)
+        if not workers:
+            run_job(job_id)
+            return None
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='generation')
+        return self._pool.submit(self._run, job_id)
+
+    def _run(self, job_id):
+        try:
+            run_job(job_id)
+        finally:
+            connection.close()
+
+    def close(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown()
+
+
+generation_queue = GenerationQueue()
+
+
+def enqueue(job):
+    '''Queue ``job`` once the current transaction commits.'''
+    transaction.on_commit(lambda: generation_queue.submit(job.pk))
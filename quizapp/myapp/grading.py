@@ -0,0 +1,172 @@
+from collections import namedtuple
+from functools import partial
+
+from django.db import transaction
+from django.dispatch import Signal
+
+from .answerkey import get_answer_key
+from .layout import drawn_questions
+from .leaderboard import record_scores
+from .models import QuizAttempt, StudentAnswer
+from .reviews import write_reviews
+
+
+GradedAnswer = namedtuple('GradedAnswer', ['question_id', 'option_id', 'is_correct'])
+
+# Sent once the transaction completing one or more attempts of a quiz has
+# committed, with ``quiz_id``, ``attempt_ids``, ``student_ids`` and their
+# ``scores``.
+attempts_completed = Signal()
+
+
+def grade_answers(key, answers, drawn=None):
+    '''Validate and grade submitted answers in memory.
+
+    Answers pointing at a question outside the quiz, or outside ``drawn``
+    when the student was dealt a subset of it, or at an option that does
+    not belong to the question, are skipped. If a question is answered
+    more than once the last answer wins.
+    '''
+    graded = {}
+    for ans in answers:
+        question_id = ans['question_id']
+        option_id = ans['selected_option_id']
+        entry = key.get(question_id)
+        if entry is None or option_id not in entry[1]:
+            continue
+        if drawn is not None and question_id not in drawn:
+            continue
+        graded[question_id] = GradedAnswer(question_id, option_id, option_id == entry[0])
+    return list(graded.values())
+
+
+def drawn_question_ids(key, quiz_id, student_id):
+    '''The questions ``student_id`` was dealt, or None if they got them all.'''
+    if not key.questions_per_attempt:
+        return None
+    return frozenset(drawn_questions(quiz_id, student_id, key, key.questions_per_attempt, False))
+
+
+def autosaved_answers(submissions):
+    '''Answers autosaved to the attempts in progress of the submitting
+    students, as {(student_id, quiz_id): [answer]}, with one query.'''
+    saved = {}
+    rows = StudentAnswer.objects.filter(
+        attempt__student_id__in={student_id for student_id, _, _ in submissions},
+        attempt__quiz_id__in={quiz_id for _, quiz_id, _ in submissions},
+        attempt__completed=False,
+    ).values_list('attempt__student_id', 'attempt__quiz_id', 'question_id', 'selected_option_id')
+    for student_id, quiz_id, question_id, option_id in rows:
+        saved.setdefault((student_id, quiz_id), []).append(
+            {'question_id': question_id, 'selected_option_id': option_id}
+        )
+    return saved
+
+
+def compute_score(graded):
+    return percent_correct(sum(1 for g in graded if g.is_correct), len(graded))
+
+
+def percent_correct(correct_count, total):
+    return round((correct_count / total) * 100, 2) if total else 0
+
+
+def save_graded_answers(graded_attempts):
+    '''Write graded answers and final scores with a fixed number of queries.
+
+    ``graded_attempts`` is a list of (attempt, graded) pairs. Each
+    attempt's previous answers are replaced by the graded set.
+    '''
+    attempts = [attempt for attempt, _ in graded_attempts]
+    StudentAnswer.objects.filter(attempt__in=attempts).delete()
+    StudentAnswer.objects.bulk_create([
+        StudentAnswer(
+            attempt=attempt,
+            question_id=g.question_id,
+            selected_option_id=g.option_id,
+            is_correct=g.is_correct,
+        )
+        for attempt, graded in graded_attempts
+        for g in graded
+    ])
+    for attempt, graded in graded_attempts:
+        attempt.score = compute_score(graded)
+        attempt.completed = True
+    QuizAttempt.objects.bulk_update(attempts, ['score', 'completed'])
+    return attempts
+
+
+def submit_attempts(submissions):
+    '''Grade a batch of submissions and complete the students' attempts.
+
+    ``submissions`` is a list of (student_id, quiz_id, answers). Returns
+    a list of (attempt, accepted) in the same order; ``accepted`` is False
+    when the attempt was already completed, or completed by an earlier
+    submission in the same batch, and was left untouched. Answers
+    autosaved to an attempt are graded too, unless the submission
+    answers the same question.
+
+    Answer keys are read before the transaction starts so the SQLite
+    write lock is only held for the autosaved answers and the writes: the
+    answers, the scores, the materialized reviews and the leaderboard
+    histograms. Autosaved answers are read inside the transaction, so an
+    autosave flush either committed before them or finds the attempt
+    completed. The query count does not depend on the number of
+    submissions or questions.
+    '''
+    keys = {quiz_id: get_answer_key(quiz_id) for quiz_id in {quiz_id for _, quiz_id, _ in submissions}}
+    drawn = [drawn_question_ids(keys[quiz_id], quiz_id, student_id) for student_id, quiz_id, _ in submissions]
+
+    with transaction.atomic():
+        saved = autosaved_answers(submissions)
+        graded = [
+            grade_answers(keys[quiz_id], saved.get((student_id, quiz_id), []) + list(answers), drawn[index])
+            for index, (student_id, quiz_id, answers) in enumerate(submissions)
+        ]
+        existing = {
+            (a.student_id, a.quiz_id): a
+            for a in QuizAttempt.objects.filter(
+                student_id__in={student_id for student_id, _, _ in submissions},
+                quiz_id__in=list(keys),
+            )
+        }
+        missing = {
+            (student_id, quiz_id) for student_id, quiz_id, _ in submissions
+        }.difference(existing)
+        created = QuizAttempt.objects.bulk_create([
+            QuizAttempt(student_id=student_id, quiz_id=quiz_id) for student_id, quiz_id in sorted(missing)
+        ])
+        existing.update(((a.student_id, a.quiz_id), a) for a in created)
+
+        # As with inline submissions, the first submission for an attempt wins
+        first = {}
+        for index, (student_id, quiz_id, _) in enumerate(submissions):
+            first.setdefault((student_id, quiz_id), index)
+        results = []
+        to_save = []
+        for index, (student_id, quiz_id, _) in enumerate(submissions):
+            attempt = existing[(student_id, quiz_id)]
+            accepted = not attempt.completed and first[(student_id, quiz_id)] == index
+            results.append((attempt, accepted))
+            if accepted:
+                to_save.append((attempt, graded[index]))
+
+        save_graded_answers(to_save)
+        write_reviews([attempt.id for attempt, _ in to_save])
+        by_quiz = {}
+        for attempt, _ in to_save:
+            by_quiz.setdefault(attempt.quiz_id, []).append(attempt)
+        for quiz_id, attempts in by_quiz.items():
+            record_scores(quiz_id, [a.score for a in attempts])
+            transaction.on_commit(partial(
+                attempts_completed.send,
+                sender=QuizAttempt, quiz_id=quiz_id, attempt_ids=[a.id for a in attempts],
+                student_ids=[a.student_id for a in attempts], scores=[a.score for a in attempts],
+            ))
+    return results
+
+
+def submit_attempt(student, quiz, answers):
+    '''Grade a single submission; see ``submit_attempts``.'''
+    [(attempt, _)] = submit_attempts([(student.id, quiz.id, answers)])
+    return attempt
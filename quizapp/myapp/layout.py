@@ -0,0 +1,53 @@
+import hashlib
+import hmac
+import random
+
+from django.conf import settings
+
+
+# What a student sees of a quiz, the questions drawn from the pool and the
+# order of questions and options, is derived from a PRNG seeded on
+# (quiz, student). Nothing is stored per student: take_quiz, grading and
+# the review all recompute the same layout from the same inputs. Seeds
+# are keyed with SECRET_KEY so students cannot work out each other's draw.
+
+
+def _rng(*parts):
+    message = ':'.join(str(part) for part in parts).encode()
+    digest = hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).digest()
+    return random.Random(int.from_bytes(digest[:8], 'big'))
+
+
+def is_personalized(questions_per_attempt, shuffle):
+    return bool(questions_per_attempt) or shuffle
+
+
+def drawn_questions(quiz_id, student_id, question_ids, questions_per_attempt, shuffle):
+    '''Ids of the questions a student gets, in the order they are shown.
+
+    ``question_ids`` is the pool: the quiz's questions that have options.
+    Without a draw or shuffle, every question in id order.
+    '''
+    ids = sorted(question_ids)
+    if questions_per_attempt and questions_per_attempt < len(ids):
+        return _rng(quiz_id, student_id).sample(ids, questions_per_attempt)
+    if shuffle:
+        _rng(quiz_id, student_id).shuffle(ids)
+    return ids
+
+
+def arrange(quiz_id, student_id, questions, questions_per_attempt, shuffle):
+    '''A student's layout of ``{question_id: [option_id, ...]}``.
+
+    Returns [(question_id, [option_id, ...])] in display order. Options
+    keep their given order unless the quiz shuffles.
+    '''
+    pool = [question_id for question_id, options in questions.items() if options]
+    layout = []
+    for question_id in drawn_questions(quiz_id, student_id, pool, questions_per_attempt, shuffle):
+        options = list(questions[question_id])
+        if shuffle:
+            _rng(quiz_id, student_id, question_id).shuffle(options)
+        layout.append((question_id, options))
+    return layout
+
@@ -0,0 +1,87 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from .models import QuizAttempt, QuizScoreBucket
+
+
+def record_scores(quiz_id, added, removed=()):
+    '''Apply completed-attempt scores to a quiz's score histogram.
+
+    ``removed`` holds previous scores of attempts that were re-graded.
+    Must run inside the transaction that completes the attempts. Two
+    queries however many distinct scores change: the affected buckets
+    are read, then written back with one upsert.
+    '''
+    deltas = Counter(added)
+    deltas.subtract(removed)
+    deltas = {score: delta for score, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    counts = dict(
+        QuizScoreBucket.objects.filter(quiz_id=quiz_id, score__in=list(deltas)).values_list('score', 'count')
+    )
+    QuizScoreBucket.objects.bulk_create(
+        [
+            QuizScoreBucket(quiz_id=quiz_id, score=score, count=max(counts.get(score, 0) + delta, 0))
+            for score, delta in deltas.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['quiz', 'score'],
+        update_fields=['count'],
+    )
+
+
+def rebuild_distribution(quiz_ids=None):
+    '''Recompute score histograms from the attempts table, set-based.'''
+    attempts = QuizAttempt.objects.filter(completed=True, score__isnull=False)
+    buckets = QuizScoreBucket.objects.all()
+    if quiz_ids is not None:
+        attempts = attempts.filter(quiz_id__in=quiz_ids)
+        buckets = buckets.filter(quiz_id__in=quiz_ids)
+    rows = attempts.values('quiz_id', 'score').annotate(n=Count('id')).order_by()
+    with transaction.atomic():
+        buckets.delete()
+        QuizScoreBucket.objects.bulk_create(
+            [QuizScoreBucket(quiz_id=row['quiz_id'], score=row['score'], count=row['n']) for row in rows],
+            batch_size=1000,
+        )
+
+
+def score_position(quiz_id, score):
+    '''Rank and percentile of ``score`` among completed attempts of a quiz.
+
+    One aggregate over the quiz's histogram, whose size is bounded by the
+    number of distinct scores rather than the number of attempts. Ranks
+    use competition ranking (ties share a rank); the percentile is the
+    share of attempts below the score, counting ties as half.
+    '''
+    totals = QuizScoreBucket.objects.filter(quiz_id=quiz_id).aggregate(
+        total=Sum('count'),
+        above=Sum('count', filter=Q(score__gt=score)),
+        equal=Sum('count', filter=Q(score=score)),
+    )
+    total = totals['total'] or 0
+    above = totals['above'] or 0
+    equal = totals['equal'] or 0
+    below = total - above - equal
+    return {
+        'total': total,
+        'rank': above + 1,
+        'percentile': round((below + equal / 2) / total * 100, 2) if total else None,
+    }
+
+
+def top_attempts(quiz_id, limit):
+    '''Top ``limit`` completed attempts, read through the (quiz, completed, score) index.'''
+    rows = (
+        QuizAttempt.objects.filter(quiz_id=quiz_id, completed=True, score__isnull=False)
+        .order_by('-score', 'id')
+        .values_list('student_id', 'student__username', 'score')[:limit]
+    )
+    leaders = []
+    for position, (student_id, username, score) in enumerate(rows, start=1):
+        rank = leaders[-1]['rank'] if leaders and leaders[-1]['score'] == score else position
+        leaders.append({'rank': rank, 'student_id': student_id, 'username': username, 'score': score})
+    return leaders
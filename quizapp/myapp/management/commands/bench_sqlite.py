@@ -0,0 +1,180 @@
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+SCHEMA = '''
+CREATE TABLE attempt (id INTEGER PRIMARY KEY, quiz_id INTEGER, score REAL, completed INTEGER);
+CREATE TABLE answer (
+    id INTEGER PRIMARY KEY, attempt_id INTEGER, question_id INTEGER, option_id INTEGER, is_correct INTEGER
+);
+CREATE INDEX answer_attempt ON answer (attempt_id, question_id);
+'''
+
+
+class Profile:
+    '''How the connections of one benchmark run are opened and used.'''
+
+    def __init__(self, name, pragmas, persistent, immediate, read_only_readers):
+        self.name = name
+        self.pragmas = pragmas
+        self.persistent = persistent
+        self.immediate = immediate
+        self.read_only_readers = read_only_readers
+
+
+def profiles():
+    return [
+        # What the project ran before: rollback journal, Python's default 5s
+        # timeout, deferred transactions and a fresh connection per request.
+        Profile('baseline', [], persistent=False, immediate=False, read_only_readers=False),
+        # settings.SQLITE_PRAGMAS, persistent connections, BEGIN IMMEDIATE
+        # writers and readers on a separate read-only connection.
+        Profile('tuned', settings.SQLITE_PRAGMAS, persistent=True, immediate=True, read_only_readers=True),
+    ]
+
+
+class Command(BaseCommand):
+    help = "Compare SQLite throughput under mixed read/write load with default and tuned connection settings"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--seconds', type=float, default=5.0)
+        parser.add_argument('--attempts', type=int, default=2000, help="Rows preloaded before the run")
+        parser.add_argument('--questions', type=int, default=20)
+        parser.add_argument('--json', action='store_true', help="Print the results as JSON")
+
+    def handle(self, *args, **options):
+        results = []
+        for profile in profiles():
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, 'bench.sqlite3')
+                self.prepare(path, options['attempts'], options['questions'])
+                results.append(self.run(profile, path, options))
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for r in results:
+            self.stdout.write(
+                f"{r['profile']:>9}: {r['reads_per_sec']:>9.1f} reads/s  {r['writes_per_sec']:>8.1f} writes/s  "
+                f"{r['read_errors']} read errors  {r['write_errors']} write errors"
+            )
+        base, tuned = results
+        if base['reads_per_sec'] and base['writes_per_sec']:
+            self.stdout.write(
+                f"speedup: reads x{tuned['reads_per_sec'] / base['reads_per_sec']:.2f}, "
+                f"writes x{tuned['writes_per_sec'] / base['writes_per_sec']:.2f}"
+            )
+
+    def prepare(self, path, attempts, questions):
+        conn = sqlite3.connect(path)
+        conn.executescript(SCHEMA)
+        conn.executemany(
+            'INSERT INTO attempt (id, quiz_id, score, completed) VALUES (?, 1, 0, 1)',
+            [(n,) for n in range(1, attempts + 1)],
+        )
+        conn.executemany(
+            'INSERT INTO answer (attempt_id, question_id, option_id, is_correct) VALUES (?, ?, ?, ?)',
+            [(a, q, q * 4, q % 2) for a in range(1, attempts + 1) for q in range(questions)],
+        )
+        conn.commit()
+        conn.close()
+
+    def connect(self, profile, path, read_only=False):
+        if read_only:
+            conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True, isolation_level=None, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        for pragma in profile.pragmas:
+            if read_only and 'journal_mode' in pragma:
+                continue
+            conn.execute(pragma)
+        return conn
+
+    def run(self, profile, path, options):
+        if profile.pragmas:
+            # journal_mode is persistent; set it once before readers open the file read-only
+            self.connect(profile, path).close()
+        questions = options['questions']
+        deadline = time.perf_counter() + options['seconds']
+        counts = {'reads': 0, 'writes': 0, 'read_errors': 0, 'write_errors': 0}
+        lock = threading.Lock()
+        next_attempt = [options['attempts']]
+
+        def reader():
+            conn = self.connect(profile, path, read_only=profile.read_only_readers) if profile.persistent else None
+            rng = random.Random()
+            done = errors = 0
+            while time.perf_counter() < deadline:
+                c = conn or self.connect(profile, path)
+                try:
+                    c.execute(
+                        'SELECT a.score, s.question_id, s.option_id, s.is_correct FROM attempt a '
+                        'JOIN answer s ON s.attempt_id = a.id WHERE a.id = ?',
+                        (rng.randint(1, options['attempts']),),
+                    ).fetchall()
+                    done += 1
+                except sqlite3.OperationalError:
+                    errors += 1
+                finally:
+                    if conn is None:
+                        c.close()
+            with lock:
+                counts['reads'] += done
+                counts['read_errors'] += errors
+
+        def writer():
+            conn = self.connect(profile, path) if profile.persistent else None
+            done = errors = 0
+            while time.perf_counter() < deadline:
+                with lock:
+                    next_attempt[0] += 1
+                    attempt_id = next_attempt[0]
+                c = conn or self.connect(profile, path)
+                try:
+                    c.execute('BEGIN IMMEDIATE' if profile.immediate else 'BEGIN')
+                    c.execute('INSERT INTO attempt (id, quiz_id, score, completed) VALUES (?, 1, NULL, 0)', (attempt_id,))
+                    c.executemany(
+                        'INSERT INTO answer (attempt_id, question_id, option_id, is_correct) VALUES (?, ?, ?, ?)',
+                        [(attempt_id, q, q * 4, q % 2) for q in range(questions)],
+                    )
+                    c.execute('UPDATE attempt SET score = 50, completed = 1 WHERE id = ?', (attempt_id,))
+                    c.execute('COMMIT')
+                    done += 1
+                except sqlite3.OperationalError:
+                    errors += 1
+                    if c.in_transaction:
+                        c.execute('ROLLBACK')
+                finally:
+                    if conn is None:
+                        c.close()
+            with lock:
+                counts['writes'] += done
+                counts['write_errors'] += errors
+
+        threads = [threading.Thread(target=reader) for _ in range(options['readers'])]
+        threads += [threading.Thread(target=writer) for _ in range(options['writers'])]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+
+        return {
+            'profile': profile.name,
+            'seconds': round(elapsed, 2),
+            'reads_per_sec': round(counts['reads'] / elapsed, 1),
+            'writes_per_sec': round(counts['writes'] / elapsed, 1),
+            'read_errors': counts['read_errors'],
+            'write_errors': counts['write_errors'],
+        }
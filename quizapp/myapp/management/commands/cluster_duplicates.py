@@ -0,0 +1,50 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from myapp.duplicates import bank_signatures, cluster_duplicates
+from myapp.models import Question
+
+
+class Command(BaseCommand):
+    help = (
+        "Cluster near-duplicate questions across the whole bank with MinHash and LSH; "
+        "prints one JSON line per cluster. Needs about 640 bytes of memory per question."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threshold', type=float, help="Estimated Jaccard similarity (default: DUPLICATE_SIMILARITY)")
+        parser.add_argument('--batch-size', type=int, default=20000, help="Questions read and hashed per step")
+        parser.add_argument('--reindex', action='store_true',
+                            help="Also store signatures and LSH bands of questions that have none")
+        parser.add_argument('--output', help="Write the clusters to this file instead of stdout")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        question_ids, signatures = bank_signatures(options['batch_size'], options['reindex'])
+        clusters = cluster_duplicates(question_ids, signatures, options['threshold'])
+
+        quiz_of = {}
+        members = [question_id for cluster in clusters for question_id in cluster]
+        for start in range(0, len(members), options['batch_size']):
+            quiz_of.update(
+                Question.objects.filter(pk__in=members[start:start + options['batch_size']]).values_list('id', 'quiz_id')
+            )
+
+        out = open(options['output'], 'w') if options['output'] else self.stdout
+        try:
+            for cluster in clusters:
+                out.write(json.dumps({
+                    'size': len(cluster),
+                    'question_ids': cluster,
+                    'quiz_ids': sorted({quiz_of[question_id] for question_id in cluster}),
+                }) + '\n')
+        finally:
+            if out is not self.stdout:
+                out.close()
+
+        self.stderr.write(
+            f"{len(clusters)} clusters covering {len(members)} of {len(question_ids)} questions "
+            f"in {time.perf_counter() - started:.1f}s."
+        )
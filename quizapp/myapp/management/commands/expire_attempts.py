@@ -0,0 +1,35 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, close_old_connections
+
+from myapp.deadlines import expire_attempts
+
+
+class Command(BaseCommand):
+    help = "Finalize attempts whose deadline has passed, grading the answers saved so far"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Attempts finalized per transaction")
+        parser.add_argument('--interval', type=float, default=getattr(settings, 'ATTEMPT_SWEEP_INTERVAL', 15.0),
+                            help="Seconds between sweeps")
+        parser.add_argument('--once', action='store_true', help="Finalize every expired attempt and exit")
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            try:
+                expired = expire_attempts(limit=options['batch_size'])
+            except OperationalError as exc:
+                # Most likely the database is locked; sweep again later
+                self.stderr.write(f"Sweep deferred: {exc}")
+                expired = 0
+            if expired:
+                self.stdout.write(f"Finalized {expired} expired attempts.")
+                # A full batch means more may be waiting
+                if expired >= options['batch_size']:
+                    continue
+            if options['once']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.gradebook import gradebook_rows
+from myapp.models import Course
+
+
+class Command(BaseCommand):
+    help = "Stream a course gradebook (students x quizzes) as CSV"
+
+    def add_arguments(self, parser):
+        parser.add_argument('course_code')
+        parser.add_argument('-o', '--output', help="Write to this file instead of stdout")
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        try:
+            course = Course.objects.get(code=options['course_code'])
+        except Course.DoesNotExist:
+            raise CommandError(f"Course '{options['course_code']}' does not exist.")
+
+        rows = gradebook_rows(course, chunk_size=options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'w', newline='') as out:
+                out.writelines(rows)
+        else:
+            for row in rows:
+                self.stdout.write(row, ending='')
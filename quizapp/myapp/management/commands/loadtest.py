@@ -0,0 +1,326 @@
+import json
+import math
+import random
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from myapp.analytics import invalidate_item_analysis
+from myapp.leaderboard import rebuild_distribution
+from myapp.models import Quiz, QuizAttempt, User
+
+
+def percentile(sorted_values, pct):
+    '''Nearest-rank percentile of an already sorted list.'''
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)]
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+class InProcessTransport:
+    '''Requests through Django's WSGI handler, one test client per thread.'''
+
+    name = 'in-process'
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def request(self, method, path, body=None, token=None):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = Client(SERVER_NAME='localhost')
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        if method == 'GET':
+            response = client.get(path, headers=headers)
+        else:
+            response = client.post(path, json.dumps(body), content_type='application/json', headers=headers)
+        return response.status_code, response.content
+
+
+class HttpTransport:
+    '''Requests to a running server, e.g. ``runserver`` or gunicorn.'''
+
+    name = 'http'
+
+    def __init__(self, base_url, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def request(self, method, path, body=None, token=None):
+        request = urllib.request.Request(
+            self.base_url + path,
+            data=json.dumps(body).encode() if body is not None else None,
+            method=method,
+        )
+        request.add_header('Content-Type', 'application/json')
+        if token:
+            request.add_header('Authorization', f'Bearer {token}')
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as exc:
+            return exc.code, exc.read()
+
+
+class LockProbe:
+    '''Database execute wrapper measuring waits for SQLite's write lock.
+
+    Write transactions start with BEGIN IMMEDIATE, so the time spent in
+    BEGIN is the time spent queued behind another writer.
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.waits = []
+        self.locked_errors = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        except OperationalError as exc:
+            if 'locked' in str(exc):
+                with self._lock:
+                    self.locked_errors += 1
+            raise
+        finally:
+            if sql.startswith('BEGIN'):
+                with self._lock:
+                    self.waits.append(time.perf_counter() - started)
+
+    def report(self):
+        waits = sorted(self.waits)
+        return {
+            'transactions': len(waits),
+            'waits_over_10ms': sum(1 for w in waits if w > 0.01),
+            'total_wait_ms': _ms(sum(waits)),
+            'p95_wait_ms': _ms(percentile(waits, 95)),
+            'max_wait_ms': _ms(waits[-1] if waits else None),
+            'locked_errors': self.locked_errors,
+        }
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulate an exam: concurrent students log in, take a quiz, submit and view their score. "
+        "Prints a JSON report with throughput, latency percentiles, error rates and DB lock waits. "
+        "Uses seeded students (see the seed command) of the quiz's course."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--quiz', type=int, help="Quiz to take; defaults to the published quiz with most students")
+        parser.add_argument('--students', type=int, default=50)
+        parser.add_argument('--concurrency', type=int, default=20, help="Students in flight at once")
+        parser.add_argument('--ramp', type=float, default=0.0, help="Seconds over which students start")
+        parser.add_argument('--password', default='password', help="Password of the seeded students")
+        parser.add_argument('--url', help="Base URL of a running server; the app runs in-process when omitted")
+        parser.add_argument('--timeout', type=float, default=30.0, help="Per-request timeout in HTTP mode")
+        parser.add_argument('--poll-timeout', type=float, default=60.0,
+                            help="How long to wait for a queued submission to be graded")
+        parser.add_argument('--reset-attempts', action='store_true',
+                            help="Delete the students' previous attempts at the quiz before the run; "
+                                 "without it the run refuses to start when there are any")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed for the chosen answers")
+        parser.add_argument('--output', help="Write the JSON report to this file instead of stdout")
+
+    def handle(self, *args, **options):
+        quiz = self.pick_quiz(options['quiz'])
+        students = list(
+            User.objects.filter(role='student', enrolled_courses=quiz.course_id)
+            .order_by('id').values_list('username', flat=True)[:options['students']]
+        )
+        if len(students) < options['students']:
+            raise CommandError(
+                f"Course {quiz.course_id} has {len(students)} students; seed more or lower --students."
+            )
+        previous = QuizAttempt.objects.filter(quiz=quiz, student__username__in=students)
+        if options['reset_attempts']:
+            previous.delete()
+            rebuild_distribution([quiz.id])
+            invalidate_item_analysis(quiz.id)
+        elif previous.exists():
+            raise CommandError(
+                f"{previous.count()} of the chosen students already attempted quiz {quiz.id}; "
+                "pass --reset-attempts to delete their attempts and answers first."
+            )
+
+        if options['url']:
+            transport = HttpTransport(options['url'], options['timeout'])
+            probe = None
+        else:
+            transport = InProcessTransport()
+            probe = LockProbe()
+
+        self.timings = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.failures = Counter()
+        self._lock = threading.Lock()
+        rng = random.Random(options['seed'])
+        seeds = [rng.random() for _ in students]
+        step = options['ramp'] / len(students) if students else 0
+
+        started_at = timezone.now()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            flows = [
+                pool.submit(self.run_flow, transport, probe, quiz.id, username, options,
+                            random.Random(seed), started + n * step)
+                for n, (username, seed) in enumerate(zip(students, seeds))
+            ]
+            completed = sum(1 for flow in flows if flow.result())
+        elapsed = time.perf_counter() - started
+
+        report = self.report(transport, quiz, students, options, started_at, elapsed, completed, probe)
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+            self.stderr.write(f"Report written to {options['output']}")
+        else:
+            self.stdout.write(output)
+
+    def pick_quiz(self, quiz_id):
+        quizzes = Quiz.objects.filter(is_published=True)
+        if quiz_id is not None:
+            quiz = quizzes.filter(pk=quiz_id).first()
+        else:
+            quiz = quizzes.annotate(students=Count('course__students')).order_by('-students', '-id').first()
+        if quiz is None:
+            raise CommandError("No published quiz to take; run the seed command first.")
+        return quiz
+
+    def call(self, transport, name, method, path, body=None, token=None):
+        started = time.perf_counter()
+        try:
+            status, content = transport.request(method, path, body, token)
+        except Exception as exc:
+            status, content = type(exc).__name__, b''
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.timings[name].append(elapsed)
+            self.statuses[name][status] += 1
+        if not isinstance(status, int) or status >= 400:
+            return None
+        return json.loads(content) if content else {}
+
+    def run_flow(self, transport, probe, quiz_id, username, options, rng, start_at):
+        delay = start_at - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        if probe is None:
+            return self.flow(transport, quiz_id, username, options, rng)
+        try:
+            with connection.execute_wrapper(probe):
+                return self.flow(transport, quiz_id, username, options, rng)
+        finally:
+            connection.close()
+
+    def flow(self, transport, quiz_id, username, options, rng):
+        '''One student's exam; returns whether every step succeeded.'''
+        tokens = self.call(transport, 'token', 'POST', reverse('token_obtain_pair'),
+                           {'username': username, 'password': options['password']})
+        if tokens is None:
+            return self.fail('token')
+        access = tokens['access']
+
+        quiz = self.call(transport, 'take_quiz', 'GET', reverse('take-quiz', args=[quiz_id]), token=access)
+        if quiz is None:
+            return self.fail('take_quiz')
+        answers = [
+            {'question_id': question['id'], 'selected_option_id': rng.choice(question['options'])['id']}
+            for question in quiz['questions'] if question['options']
+        ]
+
+        submitted = self.call(transport, 'submit_quiz', 'POST', reverse('submit-quiz'),
+                              {'quiz_id': quiz_id, 'answers': answers}, token=access)
+        if submitted is None:
+            return self.fail('submit_quiz')
+        if 'receipt' in submitted and not self.wait_until_graded(transport, submitted['receipt'], access, options):
+            return self.fail('submission_status')
+
+        if self.call(transport, 'view_score', 'GET', reverse('view-score', args=[quiz_id]), token=access) is None:
+            return self.fail('view_score')
+        return True
+
+    def wait_until_graded(self, transport, receipt, access, options):
+        deadline = time.perf_counter() + options['poll_timeout']
+        while time.perf_counter() < deadline:
+            entry = self.call(transport, 'submission_status', 'GET',
+                              reverse('submission-status', args=[receipt]), token=access)
+            if entry is None:
+                return False
+            if entry['status'] == 'graded':
+                return True
+            if entry['status'] == 'rejected':
+                return False
+            time.sleep(0.25)
+        return False
+
+    def fail(self, step):
+        with self._lock:
+            self.failures[step] += 1
+        return False
+
+    def report(self, transport, quiz, students, options, started_at, elapsed, completed, probe):
+        endpoints = {}
+        for name, timings in self.timings.items():
+            timings = sorted(timings)
+            statuses = self.statuses[name]
+            errors = sum(n for status, n in statuses.items() if not isinstance(status, int) or status >= 400)
+            endpoints[name] = {
+                'requests': len(timings),
+                'errors': errors,
+                'error_rate': round(errors / len(timings), 4),
+                'mean_ms': _ms(sum(timings) / len(timings)),
+                'p50_ms': _ms(percentile(timings, 50)),
+                'p95_ms': _ms(percentile(timings, 95)),
+                'p99_ms': _ms(percentile(timings, 99)),
+                'max_ms': _ms(timings[-1]),
+                'statuses': {str(status): n for status, n in sorted(statuses.items(), key=str)},
+            }
+        requests = sum(e['requests'] for e in endpoints.values())
+        return {
+            'started_at': started_at.isoformat(),
+            'commit': self.git_commit(),
+            'mode': transport.name,
+            'target': options['url'],
+            'submission_mode': settings.QUIZ_SUBMISSION_MODE,
+            'quiz_id': quiz.id,
+            'students': len(students),
+            'concurrency': options['concurrency'],
+            'ramp_seconds': options['ramp'],
+            'elapsed_seconds': round(elapsed, 3),
+            'flows': {'completed': completed, 'failed': len(students) - completed, 'failed_at': dict(self.failures)},
+            'throughput': {
+                'flows_per_sec': round(completed / elapsed, 2) if elapsed else None,
+                'requests_per_sec': round(requests / elapsed, 2) if elapsed else None,
+            },
+            'endpoints': endpoints,
+            # Lock waits are only visible when the app runs in this process
+            'db_locks': probe.report() if probe else None,
+        }
+
+    def git_commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, timeout=5,
+            ).stdout.strip() or None
+        except (OSError, subprocess.SubprocessError):
+            return None
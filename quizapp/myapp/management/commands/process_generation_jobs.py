@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.db.models import Count
+
+from myapp.generation import generation_queue
+from myapp.models import GenerationJob
+
+
+class Command(BaseCommand):
+    help = "Run queued quiz generation jobs, e.g. those left queued by a process that stopped"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help="Jobs handed to the workers at a time")
+        parser.add_argument('--interval', type=float, default=5.0, help="Seconds to sleep when no job is queued")
+        parser.add_argument('--once', action='store_true', help="Run every queued job and exit")
+        parser.add_argument('--requeue', action='store_true',
+                            help="First queue again the jobs marked running; only when no other process runs jobs")
+
+    def handle(self, *args, **options):
+        if options['requeue']:
+            requeued = GenerationJob.objects.filter(status='running').update(status='queued')
+            if requeued:
+                self.stdout.write(f"Requeued {requeued} unfinished jobs.")
+
+        try:
+            while True:
+                close_old_connections()
+                job_ids = list(
+                    GenerationJob.objects.filter(status='queued').order_by('created_at')
+                    .values_list('id', flat=True)[:options['batch_size']]
+                )
+                if job_ids:
+                    futures = [generation_queue.submit(job_id) for job_id in job_ids]
+                    for future in futures:
+                        if future is not None:
+                            future.result()
+                    statuses = dict(
+                        GenerationJob.objects.filter(pk__in=job_ids).values('status')
+                        .annotate(count=Count('id')).values_list('status', 'count')
+                    )
+                    self.stdout.write(
+                        f"Ran {len(job_ids)} jobs: {statuses.get('succeeded', 0)} succeeded, "
+                        f"{statuses.get('failed', 0)} failed."
+                    )
+                elif options['once']:
+                    break
+                else:
+                    time.sleep(options['interval'])
+        finally:
+            generation_queue.close()
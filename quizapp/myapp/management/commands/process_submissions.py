@@ -0,0 +1,71 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, OperationalError, close_old_connections
+
+from myapp.grading import submit_attempts
+from myapp.spool import get_spool
+
+
+class Command(BaseCommand):
+    help = "Grade spooled quiz submissions in batches (QUIZ_SUBMISSION_MODE='queued')"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--interval', type=float, default=0.5, help="Seconds to sleep when the spool is empty")
+        parser.add_argument('--once', action='store_true', help="Drain the spool and exit")
+
+    def handle(self, *args, **options):
+        spool = get_spool()
+        requeued = spool.requeue_processing()
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} unfinished submissions.")
+
+        while True:
+            close_old_connections()
+            batch = spool.claim(options['batch_size'])
+            if batch:
+                self.process(spool, batch)
+            elif options['once']:
+                break
+            else:
+                time.sleep(options['interval'])
+
+    def process(self, spool, batch):
+        try:
+            results = self.grade(batch)
+        except OperationalError as exc:
+            # Most likely the database is locked; try the batch again later
+            spool.release([row['id'] for row in batch])
+            self.stderr.write(f"Batch of {len(batch)} deferred: {exc}")
+            time.sleep(1)
+            return
+        except Exception:
+            # Isolate the submission that breaks the batch
+            results = []
+            deferred = []
+            for row in batch:
+                try:
+                    results.extend(self.grade([row]))
+                except (IntegrityError, ValidationError, LookupError, TypeError, ValueError) as exc:
+                    results.append((row['id'], 'rejected', None, str(exc)))
+                except OperationalError as exc:
+                    # Not the submission's fault; try it again later
+                    deferred.append(row['id'])
+                    error = exc
+            if deferred:
+                spool.release(deferred)
+                self.stderr.write(f"{len(deferred)} submissions deferred: {error}")
+                time.sleep(1)
+        spool.finish(results)
+        graded = sum(1 for _, status, _, _ in results if status == 'graded')
+        self.stdout.write(f"Graded {graded} of {len(batch)} submissions.")
+
+    def grade(self, batch):
+        attempts = submit_attempts([(row['student_id'], row['quiz_id'], row['answers']) for row in batch])
+        return [
+            (row['id'], 'graded', attempt.score, None) if accepted
+            else (row['id'], 'rejected', None, 'Quiz already submitted.')
+            for row, (attempt, accepted) in zip(batch, attempts)
+        ]
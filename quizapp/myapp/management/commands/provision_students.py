@@ -0,0 +1,34 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.provisioning import create_students, read_roster, report_lines, roster_format
+
+
+class Command(BaseCommand):
+    help = "Create student accounts from a CSV or JSONL roster; prints one JSON result per row"
+
+    def add_arguments(self, parser):
+        parser.add_argument('roster', help="Path to a .csv (with header) or .jsonl roster")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="Override the format implied by the extension")
+        parser.add_argument('--workers', type=int, help="Password hashing processes (default: one per core)")
+        parser.add_argument('--batch-size', type=int, help="Accounts inserted per transaction")
+        parser.add_argument('--report', help="Write the results to this file instead of stdout")
+
+    def handle(self, *args, **options):
+        fmt = roster_format(options['roster'], options['format'])
+        if fmt is None:
+            raise CommandError("Cannot tell the roster format; use a .csv or .jsonl file or pass --format.")
+
+        out = open(options['report'], 'w') if options['report'] else self.stdout
+        try:
+            with open(options['roster'], encoding='utf-8-sig', newline='') as roster:
+                results = create_students(read_roster(roster, fmt), options['batch_size'], options['workers'])
+                for line in report_lines(results):
+                    out.write(line)
+        finally:
+            if out is not self.stdout:
+                out.close()
+
+        counts = json.loads(line)['summary']
+        self.stderr.write(f"{counts['created']} students created, {counts['errors']} rows rejected.")
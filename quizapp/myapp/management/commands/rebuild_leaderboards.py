@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from myapp.leaderboard import rebuild_distribution
+
+
+class Command(BaseCommand):
+    help = "Rebuild per-quiz score histograms from the quiz attempts table"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--quiz', type=int, action='append', help="Only rebuild this quiz id (repeatable)")
+
+    def handle(self, *args, **options):
+        rebuild_distribution(options['quiz'])
+        self.stdout.write(self.style.SUCCESS("Leaderboards rebuilt."))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from myapp.models import QuizAttempt
+from myapp.reviews import write_reviews
+
+
+class Command(BaseCommand):
+    help = "Rebuild the materialized review document of completed quiz attempts"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--quiz', type=int, help="Only rebuild attempts of this quiz id")
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        attempts = QuizAttempt.objects.filter(completed=True).order_by('id')
+        if options['quiz']:
+            attempts = attempts.filter(quiz_id=options['quiz'])
+
+        batch_size = options['batch_size']
+        total = 0
+        batch = []
+        for attempt_id in attempts.values_list('id', flat=True).iterator(chunk_size=batch_size):
+            batch.append(attempt_id)
+            if len(batch) >= batch_size:
+                total += self._write(batch)
+                batch = []
+        if batch:
+            total += self._write(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {total} attempt reviews."))
+
+    def _write(self, attempt_ids):
+        with transaction.atomic():
+            count = len(write_reviews(attempt_ids))
+        self.stdout.write(f"  {count} reviews written")
+        return count
@@ -1,110 +1,224 @@
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
 from django.core.management.base import BaseCommand
+from django.db import connection, transaction
 from django.utils import timezone
-from faker import Faker
-import random
-from myapp.models import User, Course, Quiz, Question, Option, QuizAttempt, StudentAnswer
 
-fake = Faker()
+from myapp.answerkey import answer_keys
+from myapp.duplicates import reindex_questions
+from myapp.leaderboard import rebuild_distribution
+from myapp.questionbank import FTS_TABLE
+from myapp.models import (
+    User, Course, Quiz, Question, QuestionBand, Option, QuizAttempt, StudentAnswer, AttemptReview, QuizScoreBucket,
+    GeneratedQuestionSet, GenerationJob,
+)
+
+WORDS = (
+    'array algebra binary cache compiler data delta entropy function graph hash index integral kernel '
+    'lambda matrix network object pointer query queue recursion scope stack string syntax thread tree '
+    'variable vector'
+).split()
+
+# Child tables first; raw deletes skip the per-row signals and cascades
+# that make QuerySet.delete() crawl on large tables
+CLEAR_ORDER = [
+    StudentAnswer, AttemptReview, QuizScoreBucket, QuizAttempt, Option, QuestionBand, Question,
+    GenerationJob, GeneratedQuestionSet, Quiz, Course.students.through, Course.teachers.through, Course,
+]
+
+# Questions per reindex_questions call, which filters on lists of ids
+INDEX_CHUNK = 5000
+
 
 class Command(BaseCommand):
-    help = "Seed the database with fake data"
+    help = "Seed the database with generated data; every size is configurable for performance testing"
 
-    def handle(self, *args, **kwargs):
+    def add_arguments(self, parser):
+        parser.add_argument('--teachers', type=int, default=5)
+        parser.add_argument('--students', type=int, default=10)
+        parser.add_argument('--courses', type=int, default=3)
+        parser.add_argument('--teachers-per-course', type=int, default=2)
+        parser.add_argument('--students-per-course', type=int, default=6)
+        parser.add_argument('--quizzes', type=int, default=2, help="Quizzes per course")
+        parser.add_argument('--questions', type=int, default=5, help="Questions per quiz")
+        parser.add_argument('--options', type=int, default=4, help="Options per question")
+        parser.add_argument('--attempts', type=int, default=3, help="Completed attempts per student")
+        parser.add_argument('--password', default='password', help="Password of every seeded user")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed; the same seed gives the same data")
+        parser.add_argument('--batch-size', type=int, default=20000, help="Rows per bulk insert transaction")
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.verbosity = options['verbosity']
+        self.started = time.perf_counter()
         self.stdout.write(self.style.SUCCESS("Seeding started..."))
 
-        # Clear existing data
-        Option.objects.all().delete()
-        Question.objects.all().delete()
-        StudentAnswer.objects.all().delete()
-        QuizAttempt.objects.all().delete()
-        Quiz.objects.all().delete()
-        Course.objects.all().delete()
+        self.clear()
+        # One hash for everyone: the password hasher is deliberately slow
+        password = make_password(options['password'])
+
+        teachers = self.create_users('teacher', options['teachers'], password)
+        students = self.create_users('student', options['students'], password)
+        courses, enrolled = self.create_courses(options, teachers, students)
+        quizzes = self.create_quizzes(options, courses)
+        self.create_attempts(options, students, enrolled, quizzes)
+
+        rebuild_distribution()
+        # Ids restart after the clear; drop anything cached for the old rows
+        cache.clear()
+        answer_keys.clear()
+        self.progress("Score histograms rebuilt")
+        self.stdout.write(self.style.SUCCESS("✅ Seeding completed successfully!"))
+
+    def progress(self, message):
+        if self.verbosity >= 1:
+            self.stdout.write(f"[{time.perf_counter() - self.started:7.1f}s] {message}")
+
+    def words(self, k):
+        return ' '.join(self.rng.choices(WORDS, k=k))
+
+    def clear(self):
+        with transaction.atomic(), connection.cursor() as cursor:
+            # Emptied first, so the triggers that keep the search index in
+            # step find nothing to update as options and questions go
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            for model in CLEAR_ORDER:
+                cursor.execute(f'DELETE FROM {connection.ops.quote_name(model._meta.db_table)}')
         User.objects.exclude(is_superuser=True).delete()
+        self.progress("Existing data cleared")
 
-        # Create teachers
-        teachers = []
-        for _ in range(5):
-            teacher = User.objects.create_user(
-                username=fake.unique.user_name(),
-                email=fake.email(),
-                password="password",
-                role='teacher'
-            )
-            teachers.append(teacher)
-
-        # Create students
-        students = []
-        for _ in range(10):
-            student = User.objects.create_user(
-                username=fake.unique.user_name(),
-                email=fake.email(),
-                password="password",
-                role='student'
-            )
-            students.append(student)
-
-        # Create courses
-        courses = []
-        for i in range(3):
-            course = Course.objects.create(
-                name=fake.word().capitalize() + " Course",
-                code=f"COURSE{i+1}"
-            )
-            course.teachers.set(random.sample(teachers, k=2))
-            course.students.set(random.sample(students, k=6))
-            courses.append(course)
+    def bulk_create(self, model, objs):
+        with transaction.atomic():
+            created = model.objects.bulk_create(objs, batch_size=self.batch_size)
+        return created
 
-        # Create quizzes
+    def create_users(self, role, count, password):
+        users = []
+        for start in range(0, count, self.batch_size):
+            users += self.bulk_create(User, [
+                User(username=f'{role}{n:06d}', email=f'{role}{n:06d}@example.com', password=password, role=role)
+                for n in range(start + 1, min(start + self.batch_size, count) + 1)
+            ])
+        self.progress(f"{len(users)} {role}s created")
+        return [user.pk for user in users]
+
+    def create_courses(self, options, teachers, students):
+        courses = self.bulk_create(Course, [
+            Course(name=f'{self.rng.choice(WORDS).capitalize()} Course', code=f'COURSE{n + 1}')
+            for n in range(options['courses'])
+        ])
+        teaching = {}
+        enrolled = {student: [] for student in students}
+        memberships = []
         for course in courses:
-            for _ in range(2):  # 2 quizzes per course
-                quiz = Quiz.objects.create(
-                    title=fake.sentence(nb_words=4),
-                    course=course,
-                    created_by=random.choice(course.teachers.all()),
-                    start_time=timezone.now(),
-                    end_time=timezone.now() + timezone.timedelta(days=2),
-                    duration_minutes=random.randint(10, 60),
-                    is_published=True
-                )
+            teaching[course.pk] = self.rng.sample(teachers, min(options['teachers_per_course'], len(teachers)))
+            for student in self.rng.sample(students, min(options['students_per_course'], len(students))):
+                enrolled[student].append(course.pk)
+                memberships.append(Course.students.through(course_id=course.pk, user_id=student))
+        self.bulk_create(Course.teachers.through, [
+            Course.teachers.through(course_id=course_id, user_id=teacher)
+            for course_id, course_teachers in teaching.items() for teacher in course_teachers
+        ])
+        for start in range(0, len(memberships), self.batch_size):
+            self.bulk_create(Course.students.through, memberships[start:start + self.batch_size])
+        self.progress(f"{len(courses)} courses created, {len(memberships)} enrollments")
+        return teaching, enrolled
 
-                # Create questions
-                for _ in range(5):  # 5 questions per quiz
-                    question = Question.objects.create(
-                        quiz=quiz,
-                        text=fake.sentence(nb_words=8)
-                    )
-
-                    correct_index = random.randint(0, 3)
-                    for i in range(4):  # 4 options
-                        Option.objects.create(
-                            question=question,
-                            text=fake.word().capitalize(),
-                            is_correct=(i == correct_index)
-                        )
-
-        # Create attempts
+    def create_quizzes(self, options, courses):
+        '''Returns {course_id: [(quiz_id, [(question_id, [(option_id, is_correct)])])]}.'''
+        now = timezone.now()
+        quizzes = self.bulk_create(Quiz, [
+            Quiz(
+                title=f'{self.words(3).capitalize()} quiz',
+                course_id=course_id,
+                created_by_id=self.rng.choice(teachers),
+                start_time=now,
+                end_time=now + timezone.timedelta(days=2),
+                duration_minutes=self.rng.randint(10, 60),
+                is_published=True,
+            )
+            for course_id, teachers in courses.items() if teachers
+            for _ in range(options['quizzes'])
+        ])
+        questions = self.bulk_create(Question, [
+            Question(quiz_id=quiz.pk, text=f'{self.words(8).capitalize()}?')
+            for quiz in quizzes for _ in range(options['questions'])
+        ])
+        correct = {question.pk: self.rng.randrange(options['options']) for question in questions}
+        created = []
+        pending = []
+        for question in questions:
+            pending += [
+                Option(question_id=question.pk, text=self.rng.choice(WORDS).capitalize(), is_correct=(i == correct[question.pk]))
+                for i in range(options['options'])
+            ]
+            if len(pending) >= self.batch_size:
+                created += self.bulk_create(Option, pending)
+                pending = []
+        created += self.bulk_create(Option, pending)
+        # bulk_create skips the signals that index questions for duplicate detection
+        for start in range(0, len(questions), INDEX_CHUNK):
+            reindex_questions([question.pk for question in questions[start:start + INDEX_CHUNK]])
+
+        by_question = {}
+        for option in created:
+            by_question.setdefault(option.question_id, []).append((option.pk, option.is_correct))
+        by_quiz = {}
+        for question in questions:
+            by_quiz.setdefault(question.quiz_id, []).append((question.pk, by_question.get(question.pk, [])))
+        by_course = {}
+        for quiz in quizzes:
+            by_course.setdefault(quiz.course_id, []).append((quiz.pk, by_quiz.get(quiz.pk, [])))
+        self.progress(f"{len(quizzes)} quizzes, {len(questions)} questions, {len(created)} options created")
+        return by_course
+
+    def create_attempts(self, options, students, enrolled, quizzes):
+        '''Completed attempts with one answer per question, in chunks of about ``batch_size`` answers.'''
+        self.attempt_count = self.answer_count = 0
+        chunk = []
+        chunk_answers = 0
         for student in students:
-            for quiz in Quiz.objects.order_by('?')[:3]:  # 3 random quizzes per student
-                attempt = QuizAttempt.objects.create(
-                    student=student,
-                    quiz=quiz,
+            eligible = [quiz for course_id in enrolled[student] for quiz in quizzes.get(course_id, [])]
+            for quiz_id, questions in self.rng.sample(eligible, min(options['attempts'], len(eligible))):
+                picks = [(question_id, self.rng.choice(choices)) for question_id, choices in questions if choices]
+                chunk.append((student, quiz_id, picks))
+                chunk_answers += len(picks)
+                if chunk_answers >= self.batch_size:
+                    self.flush_attempts(chunk)
+                    chunk, chunk_answers = [], 0
+        self.flush_attempts(chunk)
+
+    def flush_attempts(self, chunk):
+        if not chunk:
+            return
+        table = connection.ops.quote_name(StudentAnswer._meta.db_table)
+        columns = ', '.join(
+            connection.ops.quote_name(StudentAnswer._meta.get_field(name).column)
+            for name in ('attempt', 'question', 'selected_option', 'is_correct')
+        )
+        with transaction.atomic():
+            attempts = QuizAttempt.objects.bulk_create([
+                QuizAttempt(
+                    student_id=student,
+                    quiz_id=quiz_id,
                     completed=True,
-                    score=0
+                    score=round(sum(is_correct for _, (_, is_correct) in picks) / len(picks) * 100, 2) if picks else 0.0,
                 )
-
-                total_correct = 0
-                for question in quiz.questions.all():
-                    selected = random.choice(question.options.all())
-                    StudentAnswer.objects.create(
-                        attempt=attempt,
-                        question=question,
-                        selected_option=selected,
-                        is_correct=selected.is_correct
-                    )
-                    if selected.is_correct:
-                        total_correct += 1
-
-                attempt.score = total_correct
-                attempt.save()
-
-        self.stdout.write(self.style.SUCCESS("✅ Seeding completed successfully!"))
+                for student, quiz_id, picks in chunk
+            ], batch_size=self.batch_size)
+            # Answers are most of the data and need no ids back, so they
+            # skip model instances: one prepared INSERT over plain tuples
+            answers = [
+                (attempt.pk, question_id, option_id, is_correct)
+                for attempt, (_, _, picks) in zip(attempts, chunk)
+                for question_id, (option_id, is_correct) in picks
+            ]
+            with connection.cursor() as cursor:
+                cursor.executemany(f'INSERT INTO {table} ({columns}) VALUES (%s, %s, %s, %s)', answers)
+        self.attempt_count += len(attempts)
+        self.answer_count += len(answers)
+        self.progress(f"{self.attempt_count} attempts, {self.answer_count} answers")
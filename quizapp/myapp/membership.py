@@ -0,0 +1,89 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import ClaimsUser, User
+
+
+# Access tokens carry the user's role and course ids together with the
+# user's membership_version at the time they were minted. A request whose
+# token still matches the current version is authenticated from the
+# claims alone; any change to the role or to the user's courses stamps a
+# new version, so older tokens fall back to loading the user until the
+# client refreshes them.
+VERSION_KEY = 'membership-version:{}'
+
+
+def new_membership_version():
+    # A fresh stamp rather than a counter: a save from a stale instance
+    # still produces a version no token has seen
+    return time.time_ns()
+
+
+def current_membership_version(user_id):
+    '''The user's membership_version, or None if the user no longer exists.'''
+    key = VERSION_KEY.format(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = User.objects.filter(pk=user_id).values_list('membership_version', flat=True).first()
+        if version is not None:
+            cache.set(key, version, getattr(settings, 'MEMBERSHIP_VERSION_CACHE_SECONDS', 60))
+    return version
+
+
+def forget_membership_versions(user_ids):
+    '''Drop cached versions now and again once the transaction commits.'''
+    keys = [VERSION_KEY.format(user_id) for user_id in user_ids]
+    if keys:
+        cache.delete_many(keys)
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def bump_membership_versions(user_ids):
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    User.objects.filter(pk__in=user_ids).update(membership_version=new_membership_version())
+    forget_membership_versions(user_ids)
+
+
+def add_membership_claims(token, user):
+    '''Stamp role, flags and course ids of ``user`` into a token.
+
+    ``user`` must have been loaded from the database: its version is read
+    before the memberships, so a change racing with this call leaves the
+    token with an outdated version rather than outdated memberships.
+    '''
+    token['mv'] = user.membership_version
+    token['username'] = user.username
+    token['role'] = user.role
+    token['staff'] = user.is_staff
+    token['superuser'] = user.is_superuser
+    token['teaching'] = sorted(user.teaching_courses.values_list('id', flat=True))
+    token['enrolled'] = sorted(user.enrolled_courses.values_list('id', flat=True))
+    return token
+
+
+def claims_user(token):
+    '''A ClaimsUser from an access token whose claims are current, else None.'''
+    if 'mv' not in token:
+        return None
+    user_id = int(token[api_settings.USER_ID_CLAIM])
+    if current_membership_version(user_id) != token['mv']:
+        return None
+    user = ClaimsUser(
+        id=user_id,
+        username=token['username'],
+        role=token['role'],
+        is_staff=token['staff'],
+        is_superuser=token['superuser'],
+        is_active=True,
+        membership_version=token['mv'],
+    )
+    user._state.adding = False
+    user.teaching_course_ids = frozenset(token['teaching'])
+    user.enrolled_course_ids = frozenset(token['enrolled'])
+    return user
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0003_attemptreview'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuizScoreBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='quizattempt',
+            index=models.Index(fields=['quiz', 'completed', 'score'], name='attempt_quiz_completed_score'),
+        ),
+        migrations.AddField(
+            model_name='quizscorebucket',
+            name='quiz',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='score_buckets', to='myapp.quiz'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='quizscorebucket',
+            unique_together={('quiz', 'score')},
+        ),
+    ]
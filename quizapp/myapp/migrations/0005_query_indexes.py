@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0004_leaderboard'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='quiz',
+            index=models.Index(fields=['course', 'start_time'], name='quiz_course_start'),
+        ),
+        migrations.AddIndex(
+            model_name='studentanswer',
+            index=models.Index(fields=['attempt', 'question'], name='answer_attempt_question'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:25
+
+import myapp.managers
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0005_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClaimsUser',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('myapp.user',),
+            managers=[
+                ('objects', myapp.managers.CustomUserManager()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='membership_version',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:32
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def drop_duplicate_answers(apps, schema_editor):
+    # Keep the latest answer per question so the unique constraint applies
+    StudentAnswer = apps.get_model('myapp', 'StudentAnswer')
+    latest = (
+        StudentAnswer.objects.values('attempt_id', 'question_id')
+        .annotate(keep=Max('id')).values_list('keep', flat=True)
+    )
+    StudentAnswer.objects.exclude(id__in=latest).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0007_question_pool'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='studentanswer',
+            name='answer_attempt_question',
+        ),
+        migrations.RunPython(drop_duplicate_answers, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='studentanswer',
+            constraint=models.UniqueConstraint(fields=('attempt', 'question'), name='answer_attempt_question_unique'),
+        ),
+    ]
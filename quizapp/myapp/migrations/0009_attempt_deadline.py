@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:35
+
+from datetime import timedelta
+
+from django.db import migrations, models
+
+
+def set_open_deadlines(apps, schema_editor):
+    # Attempts already in progress get the deadline they would have had
+    QuizAttempt = apps.get_model('myapp', 'QuizAttempt')
+    attempts = list(QuizAttempt.objects.filter(completed=False).select_related('quiz'))
+    for attempt in attempts:
+        quiz = attempt.quiz
+        attempt.deadline = min(attempt.start_time + timedelta(minutes=quiz.duration_minutes), quiz.end_time)
+    QuizAttempt.objects.bulk_update(attempts, ['deadline'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0008_answer_upsert'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizattempt',
+            name='deadline',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='quizattempt',
+            index=models.Index(condition=models.Q(('completed', False)), fields=['deadline'], name='attempt_open_deadline'),
+        ),
+        migrations.RunPython(set_open_deadlines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,79 @@
+from django.db import migrations
+
+
+# Full-text index of the question bank (myapp.questionbank): one row per
+# question, keyed by the question id, holding its text and the text of its
+# options. Triggers keep it in step with every write, bulk and raw ones
+# included. Prefix indexes make short prefix queries cheap.
+CREATE_INDEX = [
+    """
+    CREATE VIRTUAL TABLE myapp_question_fts USING fts5(
+        question_text, option_text, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )
+    """,
+    """
+    INSERT INTO myapp_question_fts (rowid, question_text, option_text)
+    SELECT q.id, q.text, COALESCE((SELECT group_concat(o.text, ' ') FROM myapp_option o WHERE o.question_id = q.id), '')
+    FROM myapp_question q
+    """,
+    """
+    CREATE TRIGGER myapp_question_fts_insert AFTER INSERT ON myapp_question BEGIN
+        INSERT INTO myapp_question_fts (rowid, question_text, option_text) VALUES (new.id, new.text, '');
+    END
+    """,
+    """
+    CREATE TRIGGER myapp_question_fts_update AFTER UPDATE OF text ON myapp_question BEGIN
+        UPDATE myapp_question_fts SET question_text = new.text WHERE rowid = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER myapp_question_fts_delete AFTER DELETE ON myapp_question BEGIN
+        DELETE FROM myapp_question_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER myapp_option_fts_insert AFTER INSERT ON myapp_option BEGIN
+        UPDATE myapp_question_fts SET option_text = (
+            SELECT group_concat(text, ' ') FROM myapp_option WHERE question_id = new.question_id
+        ) WHERE rowid = new.question_id;
+    END
+    """,
+    """
+    CREATE TRIGGER myapp_option_fts_update AFTER UPDATE OF text, question_id ON myapp_option BEGIN
+        UPDATE myapp_question_fts SET option_text = COALESCE((
+            SELECT group_concat(text, ' ') FROM myapp_option WHERE question_id = old.question_id
+        ), '') WHERE rowid = old.question_id;
+        UPDATE myapp_question_fts SET option_text = (
+            SELECT group_concat(text, ' ') FROM myapp_option WHERE question_id = new.question_id
+        ) WHERE rowid = new.question_id;
+    END
+    """,
+    """
+    CREATE TRIGGER myapp_option_fts_delete AFTER DELETE ON myapp_option BEGIN
+        UPDATE myapp_question_fts SET option_text = COALESCE((
+            SELECT group_concat(text, ' ') FROM myapp_option WHERE question_id = old.question_id
+        ), '') WHERE rowid = old.question_id;
+    END
+    """,
+]
+
+DROP_INDEX = [
+    'DROP TRIGGER myapp_option_fts_delete',
+    'DROP TRIGGER myapp_option_fts_update',
+    'DROP TRIGGER myapp_option_fts_insert',
+    'DROP TRIGGER myapp_question_fts_delete',
+    'DROP TRIGGER myapp_question_fts_update',
+    'DROP TRIGGER myapp_question_fts_insert',
+    'DROP TABLE myapp_question_fts',
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0009_attempt_deadline'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_INDEX, DROP_INDEX),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0010_question_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='minhash',
+            field=models.BinaryField(null=True),
+        ),
+        migrations.CreateModel(
+            name='QuestionBand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.BigIntegerField(db_index=True)),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bands', to='myapp.question')),
+            ],
+        ),
+    ]
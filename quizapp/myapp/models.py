@@ -8,6 +8,7 @@ from django.utils import timezone
 
 from django.contrib.auth.models import AbstractUser, Group, Permission
 from django.db import models
+from django.utils.functional import cached_property
 from .managers import CustomUserManager
 class User(AbstractUser):
     objects = CustomUserManager()
@@ -16,6 +17,10 @@ class User(AbstractUser):
         ('teacher', 'Teacher'),
     )
     role = models.CharField(max_length=10, choices=ROLE_CHOICES)
+    # Stamped into access tokens with the role and course memberships;
+    # changed whenever those change, so tokens carrying old claims are no
+    # longer trusted (see myapp.membership)
+    membership_version = models.BigIntegerField(default=0, editable=False)
 
     # Fix conflict by overriding and specifying unique related names
     groups = models.ManyToManyField(
@@ -37,6 +42,27 @@ class User(AbstractUser):
     def __str__(self):
         return f"{self.username} ({self.role})"
 
+    @cached_property
+    def teaching_course_ids(self):
+        return frozenset(self.teaching_courses.values_list('id', flat=True))
+
+    @cached_property
+    def enrolled_course_ids(self):
+        return frozenset(self.enrolled_courses.values_list('id', flat=True))
+
+
+class ClaimsUser(User):
+    """A user rebuilt from access token claims rather than loaded from the database.
+
+    Only the fields carried in the token are set, so it is never saved.
+    """
+
+    class Meta:
+        proxy = True
+
+    def save(self, *args, **kwargs):
+        raise TypeError('ClaimsUser is built from token claims and cannot be saved.')
+
 
 # ------------------------------------------
 # Course Model
@@ -64,6 +90,19 @@ class Quiz(models.Model):
     end_time = models.DateTimeField()
     duration_minutes = models.PositiveIntegerField()
     is_published = models.BooleanField(default=False)
+    # Draw this many questions per student from the quiz's questions;
+    # null gives every student every question (see myapp.layout)
+    questions_per_attempt = models.PositiveIntegerField(null=True, blank=True)
+    # Show each student the questions and options in their own order
+    shuffle = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            # Course listings and gradebook columns: a course's quizzes by start
+            # time. is_published is left out: Django renders the boolean as a
+            # bare column test on SQLite, which cannot seek into an index.
+            models.Index(fields=['course', 'start_time'], name='quiz_course_start'),
+        ]
 
     def __str__(self):
         return f"{self.title} ({self.course.code})"
@@ -76,11 +115,22 @@ class Quiz(models.Model):
 class Question(models.Model):
     quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='questions')
     text = models.TextField()
+    # MinHash signature of the text and options (myapp.duplicates)
+    minhash = models.BinaryField(null=True, editable=False)
 
     def __str__(self):
         return self.text[:50]
 
 
+class QuestionBand(models.Model):
+    """LSH index of question signatures: one row per band, keyed by the band's hash."""
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='bands')
+    bucket = models.BigIntegerField(db_index=True)
+
+    def __str__(self):
+        return f"{self.question_id}: {self.bucket}"
+
+
 class Option(models.Model):
     question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='options')
     text = models.CharField(max_length=255)
@@ -100,9 +150,19 @@ class QuizAttempt(models.Model):
     start_time = models.DateTimeField(auto_now_add=True)
     completed = models.BooleanField(default=False)
     score = models.FloatField(null=True, blank=True)
+    # start_time + duration, capped at the quiz's end_time; set when the
+    # attempt is started (see myapp.deadlines)
+    deadline = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         unique_together = ('student', 'quiz')
+        indexes = [
+            # Leaderboard top-N: completed attempts of a quiz by score
+            models.Index(fields=['quiz', 'completed', 'score'], name='attempt_quiz_completed_score'),
+            # Expiry sweep: open attempts by deadline. Partial, so it only
+            # holds attempts in progress and the sweep never reads past them
+            models.Index(fields=['deadline'], condition=models.Q(completed=False), name='attempt_open_deadline'),
+        ]
 
     def __str__(self):
         return f"{self.student.username} - {self.quiz.title}"
@@ -114,5 +174,91 @@ class StudentAnswer(models.Model):
     selected_option = models.ForeignKey(Option, on_delete=models.CASCADE, null=True, blank=True)
     is_correct = models.BooleanField(default=False)
 
+    class Meta:
+        constraints = [
+            # One answer per question: grading and reviews read an attempt's
+            # answers by question, and autosave upserts on it
+            models.UniqueConstraint(fields=['attempt', 'question'], name='answer_attempt_question_unique'),
+        ]
+
     def __str__(self):
         return f"{self.attempt.student.username} - {self.question.text[:30]}"
+
+
+class AttemptReview(models.Model):
+    """The score page of a completed attempt, rendered once as compact JSON."""
+    attempt = models.OneToOneField(QuizAttempt, on_delete=models.CASCADE, primary_key=True, related_name='review')
+    document = models.TextField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Review of attempt {self.attempt_id}"
+
+
+class QuizScoreBucket(models.Model):
+    """Histogram of completed-attempt scores for a quiz, one row per distinct score."""
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='score_buckets')
+    score = models.FloatField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('quiz', 'score')
+
+    def __str__(self):
+        return f"{self.quiz_id}: {self.score} x {self.count}"
+
+
+# ------------------------------------------
+# Quiz Generation Models
+# ------------------------------------------
+
+class GeneratedQuestionSet(models.Model):
+    """Questions a generator produced for a normalized (topic, difficulty, count),
+    stored under a hash of those inputs and shared by every request for them."""
+    key = models.CharField(max_length=64, primary_key=True)
+    generator = models.CharField(max_length=100)
+    topic = models.CharField(max_length=255)
+    difficulty = models.CharField(max_length=10)
+    count = models.PositiveIntegerField()
+    # [{"text", "options", "correct_option"}], as accepted by create_quiz
+    questions = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.topic} ({self.difficulty}, {self.count})"
+
+
+class GenerationJob(models.Model):
+    """A teacher's request to generate a quiz, run in the background (myapp.generation)."""
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    )
+    created_by = models.ForeignKey(
+        User, on_delete=models.CASCADE, limit_choices_to={'role': 'teacher'}, related_name='generation_jobs',
+    )
+    course = models.ForeignKey(Course, on_delete=models.CASCADE)
+    title = models.CharField(max_length=255)
+    topic = models.CharField(max_length=255)
+    difficulty = models.CharField(max_length=10)
+    num_questions = models.PositiveIntegerField()
+    duration_minutes = models.PositiveIntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    # Whether the questions came from an earlier request's question set
+    cached = models.BooleanField(default=False)
+    question_set = models.ForeignKey(GeneratedQuestionSet, on_delete=models.SET_NULL, null=True, blank=True)
+    quiz = models.ForeignKey(Quiz, on_delete=models.SET_NULL, null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # process_generation_jobs: queued jobs, oldest first
+            models.Index(fields=['created_at'], condition=models.Q(status='queued'), name='generation_job_queued'),
+        ]
+
+    def __str__(self):
+        return f"{self.topic} for {self.course_id} ({self.status})"
@@ -0,0 +1,223 @@
+import asyncio
+import json
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Count, Q
+
+from .models import QuizAttempt, QuizScoreBucket
+
+
+HISTOGRAM_BINS = 10
+
+
+def _bin(score):
+    # Ten-point bins; a perfect score goes in the last one
+    return min(int(score // (100 / HISTOGRAM_BINS)), HISTOGRAM_BINS - 1)
+
+
+class QuizCounters:
+    '''Live counters of one quiz's attempts.'''
+
+    def __init__(self, started=0, submitted=0, score_total=0.0, histogram=None):
+        self.started = started
+        self.submitted = submitted
+        self.score_total = score_total
+        self.histogram = histogram or [0] * HISTOGRAM_BINS
+
+    @classmethod
+    def load(cls, quiz_id):
+        '''Counters read from the database: one aggregate over the quiz's
+        attempts, and its score histogram (myapp.leaderboard).'''
+        counts = QuizAttempt.objects.filter(quiz_id=quiz_id).aggregate(
+            started=Count('id'), submitted=Count('id', filter=Q(completed=True)),
+        )
+        # Buckets and attempts are written in the same transaction
+        counters = cls(started=counts['started'], submitted=counts['submitted'])
+        for score, count in QuizScoreBucket.objects.filter(quiz_id=quiz_id, count__gt=0).values_list('score', 'count'):
+            counters.score_total += (score or 0.0) * count
+            counters.histogram[_bin(score or 0.0)] += count
+        return counters
+
+    def add_scores(self, scores):
+        for score in scores:
+            score = score or 0.0
+            self.submitted += 1
+            self.score_total += score
+            self.histogram[_bin(score)] += 1
+        # Attempts created and completed by one submission never sent a start
+        self.started = max(self.started, self.submitted)
+
+    def as_dict(self, quiz_id):
+        return {
+            'quiz_id': quiz_id,
+            'started': self.started,
+            'in_progress': self.started - self.submitted,
+            'submitted': self.submitted,
+            'average_score': round(self.score_total / self.submitted, 2) if self.submitted else None,
+            'histogram': [
+                {'from': n * 100 // HISTOGRAM_BINS, 'to': (n + 1) * 100 // HISTOGRAM_BINS, 'count': count}
+                for n, count in enumerate(self.histogram)
+            ],
+        }
+
+
+class _Channel:
+    def __init__(self):
+        self.watchers = 0
+        self.counters = None
+        self.changed = False
+        self.loaded_at = 0.0
+        self.snapshot = None
+        self.sequence = 0
+        self.published = None  # asyncio.Event, set and replaced on every publish
+        self.loading = None  # asyncio.Lock
+
+
+class MonitorHub:
+    '''Fans live quiz counters out to every connected watcher.
+
+    Counters of watched quizzes are kept in memory and updated from the
+    attempt signals of this process. A single task per event loop ticks
+    every MONITOR_TICK_SECONDS and publishes the counters that changed
+    since the last tick, so a burst of submissions is one event and the
+    cost of a tick does not depend on the number of watchers. Counters are
+    reloaded from the database every MONITOR_RESYNC_SECONDS to pick up
+    attempts changed by other processes (workers, process_submissions,
+    expire_attempts): one aggregation per watched quiz, however many
+    watch it.
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()  # guards counters, updated from sync threads
+        self._channels = {}
+        self._loop = None
+        self._ticker = None
+
+    # Called from signal handlers, in any thread
+
+    def attempt_started(self, quiz_id):
+        with self._lock:
+            channel = self._channels.get(quiz_id)
+            if channel is not None and channel.counters is not None:
+                channel.counters.started += 1
+                channel.changed = True
+
+    def attempts_completed(self, quiz_id, scores):
+        with self._lock:
+            channel = self._channels.get(quiz_id)
+            if channel is not None and channel.counters is not None:
+                channel.counters.add_scores(scores)
+                channel.changed = True
+
+    def resync(self, quiz_id):
+        '''Reload the quiz's counters on the next tick, e.g. after a regrade.'''
+        with self._lock:
+            channel = self._channels.get(quiz_id)
+            if channel is not None:
+                channel.loaded_at = 0.0
+
+    # Called on the event loop
+
+    async def snapshot(self, quiz_id):
+        '''The current counters: the live ones if the quiz is watched.'''
+        channel = self._channels.get(quiz_id) if self._loop is asyncio.get_running_loop() else None
+        if channel is not None and channel.snapshot is not None:
+            return channel.snapshot
+        counters = await sync_to_async(QuizCounters.load)(quiz_id)
+        return counters.as_dict(quiz_id)
+
+    async def watch(self, quiz_id):
+        '''Yield the quiz's counters now and after every change, as they are
+        published, or None every MONITOR_KEEPALIVE_SECONDS without one.'''
+        channel = await self._subscribe(quiz_id)
+        keepalive = getattr(settings, 'MONITOR_KEEPALIVE_SECONDS', 15.0)
+        try:
+            seen = channel.sequence
+            yield channel.snapshot
+            while True:
+                published = channel.published
+                if channel.sequence == seen:
+                    try:
+                        await asyncio.wait_for(published.wait(), keepalive)
+                    except asyncio.TimeoutError:
+                        yield None
+                        continue
+                seen = channel.sequence
+                yield channel.snapshot
+        finally:
+            self._unsubscribe(quiz_id, channel)
+
+    async def _subscribe(self, quiz_id):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Channels of a loop that has gone away, e.g. between test cases
+            with self._lock:
+                self._channels.clear()
+            self._loop, self._ticker = loop, None
+        with self._lock:
+            channel = self._channels.get(quiz_id)
+            if channel is None:
+                channel = self._channels[quiz_id] = _Channel()
+                channel.published = asyncio.Event()
+                channel.loading = asyncio.Lock()
+            channel.watchers += 1
+        if channel.snapshot is None:
+            await self._load(quiz_id, channel)
+        if self._ticker is None or self._ticker.done():
+            self._ticker = loop.create_task(self._tick())
+        return channel
+
+    def _unsubscribe(self, quiz_id, channel):
+        with self._lock:
+            channel.watchers -= 1
+            if channel.watchers <= 0 and self._channels.get(quiz_id) is channel:
+                del self._channels[quiz_id]
+
+    async def _load(self, quiz_id, channel):
+        async with channel.loading:
+            if channel.snapshot is not None and not self._resync_due(channel):
+                return  # another watcher loaded it while this one waited
+            counters = await sync_to_async(QuizCounters.load)(quiz_id)
+            with self._lock:
+                channel.counters = counters
+                channel.changed = True
+                channel.loaded_at = time.monotonic()
+            self._publish(quiz_id, channel)
+
+    def _resync_due(self, channel):
+        return time.monotonic() - channel.loaded_at >= getattr(settings, 'MONITOR_RESYNC_SECONDS', 5.0)
+
+    def _publish(self, quiz_id, channel):
+        with self._lock:
+            if not channel.changed:
+                return
+            channel.changed = False
+            snapshot = channel.counters.as_dict(quiz_id)
+        if snapshot == channel.snapshot:
+            return
+        channel.snapshot = snapshot
+        channel.sequence += 1
+        published, channel.published = channel.published, asyncio.Event()
+        published.set()
+
+    async def _tick(self):
+        while self._channels:
+            await asyncio.sleep(getattr(settings, 'MONITOR_TICK_SECONDS', 1.0))
+            for quiz_id, channel in list(self._channels.items()):
+                if self._resync_due(channel):
+                    await self._load(quiz_id, channel)
+                else:
+                    self._publish(quiz_id, channel)
+
+
+hub = MonitorHub()
+
+
+def format_event(snapshot):
+    '''A server-sent event carrying ``snapshot``, or a keepalive comment for None.'''
+    if snapshot is None:
+        return ': keepalive\n\n'
+    return f'event: counters\ndata: {json.dumps(snapshot)}\n\n'
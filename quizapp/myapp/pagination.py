@@ -0,0 +1,9 @@
+from rest_framework.pagination import CursorPagination
+
+
+class QuizCursorPagination(CursorPagination):
+    # Newest quizzes first; id breaks ties between quizzes sharing a start time
+    ordering = ('-start_time', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
@@ -0,0 +1,193 @@
+import csv
+import json
+import os
+import secrets
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+
+from .models import User
+
+
+class RosterError(ValueError):
+    pass
+
+
+ROSTER_FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl'}
+
+
+def roster_format(filename, requested=None):
+    ''''csv' or 'jsonl' from an explicit format or the file extension; None if unknown.'''
+    if requested:
+        return requested if requested in ('csv', 'jsonl') else None
+    return ROSTER_FORMATS.get(os.path.splitext(filename or '')[1].lower())
+
+
+def read_roster(lines, fmt):
+    '''Yield (line_no, row) from an iterable of text lines.
+
+    CSV needs a header row; JSONL has one object per line. Rows that
+    cannot be parsed are yielded as a RosterError instead of a dict.
+    '''
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        if 'username' not in (reader.fieldnames or []):
+            yield 1, RosterError('CSV header must include a username column.')
+            return
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line_no, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_no, RosterError('Invalid JSON.')
+            continue
+        yield line_no, row if isinstance(row, dict) else RosterError('Each line must be a JSON object.')
+
+
+def clean_roster_row(row):
+    '''Validate one roster row; rows without a password get a generated one.'''
+    username = str(row.get('username') or '').strip()
+    email = str(row.get('email') or '').strip()
+    password = str(row.get('password') or '')
+
+    if not username:
+        raise RosterError('username is required.')
+    if len(username) > User._meta.get_field('username').max_length:
+        raise RosterError('username is too long.')
+    try:
+        User.username_validator(username)
+        if email:
+            validate_email(email)
+    except ValidationError as exc:
+        raise RosterError(exc.messages[0])
+
+    generated = not password
+    if generated:
+        password = secrets.token_urlsafe(9)
+    return {'username': username, 'email': email, 'password': password, 'generated': generated}
+
+
+class PasswordHasher:
+    '''``make_password`` spread over a process pool, one worker per core.
+
+    The pool starts on first use and is reused for every batch until
+    ``close``. Workers run ``django.setup`` so they also work with the
+    spawn and forkserver start methods.
+    '''
+
+    def __init__(self, workers=None):
+        self.workers = workers or getattr(settings, 'PROVISIONING_HASH_WORKERS', None) or os.cpu_count() or 1
+        self._pool = None
+
+    def hash(self, passwords):
+        if self.workers == 1 or len(passwords) < 2:
+            return [make_password(password) for password in passwords]
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=django.setup)
+        chunksize = max(1, len(passwords) // (self.workers * 4))
+        return list(self._pool.map(make_password, passwords, chunksize=chunksize))
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _create_batch(batch, hasher):
+    usernames = [spec['username'] for _, spec in batch]
+    taken = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+    fresh = []
+    for line_no, spec in batch:
+        if spec['username'] in taken:
+            yield {'line': line_no, 'username': spec['username'], 'status': 'error', 'detail': 'username already exists.'}
+        else:
+            fresh.append((line_no, spec))
+    if not fresh:
+        return
+
+    hashes = hasher.hash([spec['password'] for _, spec in fresh])
+    users = [
+        User(username=spec['username'], email=spec['email'], password=hashed, role='student')
+        for (_, spec), hashed in zip(fresh, hashes)
+    ]
+    with transaction.atomic():
+        User.objects.bulk_create(users, ignore_conflicts=True)
+    # ignore_conflicts returns no ids and hides usernames taken since the
+    # check above; the salted hash tells our rows apart
+    stored = {
+        username: (pk, password)
+        for username, pk, password in User.objects.filter(username__in=[u.username for u in users])
+        .values_list('username', 'pk', 'password')
+    }
+    for (line_no, spec), user in zip(fresh, users):
+        pk, password = stored.get(user.username, (None, None))
+        if password != user.password:
+            yield {'line': line_no, 'username': user.username, 'status': 'error', 'detail': 'username already exists.'}
+            continue
+        result = {'line': line_no, 'username': user.username, 'status': 'created', 'id': pk}
+        if spec['generated']:
+            result['password'] = spec['password']
+        yield result
+
+
+def create_students(rows, batch_size=None, workers=None):
+    '''Create student accounts from ``read_roster`` rows, yielding one result per row.
+
+    Rows are validated as they are read and inserted with ``bulk_create``
+    in batches, each in its own transaction, so memory stays bounded and
+    results stream out while the roster is still being read. Rejected rows
+    are reported at once and created ones when their batch is written, so
+    results carry their roster line rather than arriving in file order.
+    Generated passwords appear once, in the row's result.
+    '''
+    batch_size = batch_size or getattr(settings, 'PROVISIONING_BATCH_SIZE', 1000)
+    seen = set()
+    batch = []
+    with PasswordHasher(workers) as hasher:
+        for line_no, row in rows:
+            try:
+                if isinstance(row, RosterError):
+                    raise row
+                spec = clean_roster_row(row)
+                if spec['username'] in seen:
+                    raise RosterError('Duplicate username in roster.')
+            except RosterError as exc:
+                username = row.get('username') if isinstance(row, dict) else None
+                yield {'line': line_no, 'username': username, 'status': 'error', 'detail': str(exc)}
+                continue
+            seen.add(spec['username'])
+            batch.append((line_no, spec))
+            if len(batch) >= batch_size:
+                yield from _create_batch(batch, hasher)
+                batch = []
+        if batch:
+            yield from _create_batch(batch, hasher)
+
+
+def report_lines(results):
+    '''Results as JSON lines, followed by a summary line.'''
+    created = errors = 0
+    for result in results:
+        if result['status'] == 'created':
+            created += 1
+        else:
+            errors += 1
+        yield json.dumps(result) + '\n'
+    yield json.dumps({'summary': {'created': created, 'errors': errors}}) + '\n'
@@ -0,0 +1,74 @@
+import re
+
+from django.db import connections, router
+
+from .models import Option, Question
+
+
+FTS_TABLE = 'myapp_question_fts'
+MAX_TERMS = 10
+# bm25 weights of question_text and option_text
+QUESTION_WEIGHT, OPTION_WEIGHT = 2.0, 1.0
+
+_TERM = re.compile(r'\w+')
+
+
+def match_expression(query):
+    '''An FTS5 MATCH expression for free text: every word must match, as a
+    prefix. Words are quoted, so FTS5 syntax in the input is inert.
+    Returns None when the query has no words.'''
+    terms = _TERM.findall(query)[:MAX_TERMS]
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def search_questions(query, course_ids, limit, offset=0):
+    '''Questions of ``course_ids`` matching ``query``, best match first.
+
+    Ranks with bm25 over the full-text index (migration 0010) and joins
+    only the page of matches it returns; options are loaded for that page
+    in a second query. Returns a list of dicts.
+    '''
+    expression = match_expression(query)
+    course_ids = list(course_ids)
+    if expression is None or not course_ids:
+        return []
+
+    connection = connections[router.db_for_read(Question)]
+    placeholders = ', '.join(['%s'] * len(course_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'''
+            SELECT q.id, q.text, z.id, z.title, c.code, bm25({FTS_TABLE}, %s, %s) AS score
+            FROM {FTS_TABLE}
+            JOIN myapp_question q ON q.id = {FTS_TABLE}.rowid
+            JOIN myapp_quiz z ON z.id = q.quiz_id
+            JOIN myapp_course c ON c.id = z.course_id
+            WHERE {FTS_TABLE} MATCH %s AND z.course_id IN ({placeholders})
+            ORDER BY score, q.id
+            LIMIT %s OFFSET %s
+            ''',
+            [QUESTION_WEIGHT, OPTION_WEIGHT, expression, *course_ids, limit, offset],
+        )
+        rows = cursor.fetchall()
+
+    options = {}
+    for option in (
+        Option.objects.filter(question_id__in=[row[0] for row in rows])
+        .order_by('id').values('id', 'question_id', 'text', 'is_correct')
+    ):
+        options.setdefault(option.pop('question_id'), []).append(option)
+
+    return [
+        {
+            'id': question_id,
+            'text': text,
+            'quiz': {'id': quiz_id, 'title': title},
+            'course_code': course_code,
+            # bm25 is lower for better matches; flip it so higher is better
+            'score': round(-score, 4),
+            'options': options.get(question_id, []),
+        }
+        for question_id, text, quiz_id, title, course_code, score in rows
+    ]
@@ -0,0 +1,119 @@
+from django.db import transaction
+from django.utils import timezone
+
+from .dashboard import invalidate_course_dashboards
+from .duplicates import index_questions, question_document
+from .models import Quiz, Question, Option, QuestionBand
+
+
+class QuizPayloadError(ValueError):
+    pass
+
+
+def clean_quiz_payload(data):
+    '''Validate a quiz payload in the format accepted by ``create_quiz``.
+
+    Nothing is written; the whole payload is checked up front so a
+    malformed question never leaves a half-built quiz behind. Returns a
+    spec dict for ``create_quizzes`` (without ``created_by``).
+    '''
+    course_id = data.get('course_id')
+    title = data.get('title')
+    num_questions = data.get('num_questions')
+    duration_minutes = data.get('duration_minutes')
+    questions_data = data.get('questions') or []
+
+    if not (course_id and title and num_questions and duration_minutes and questions_data):
+        raise QuizPayloadError('Missing required fields.')
+
+    try:
+        course_id = int(course_id)
+        duration_minutes = int(duration_minutes)
+        num_questions = int(num_questions)
+    except (TypeError, ValueError):
+        raise QuizPayloadError('Invalid course_id, duration_minutes or num_questions.')
+
+    if not isinstance(questions_data, list) or len(questions_data) != num_questions:
+        raise QuizPayloadError('Number of questions mismatch.')
+
+    questions = clean_questions(questions_data)
+
+    # Optional: deal each student a random subset and/or order
+    questions_per_attempt = data.get('questions_per_attempt')
+    if questions_per_attempt is not None:
+        if (isinstance(questions_per_attempt, bool) or not isinstance(questions_per_attempt, int)
+                or not 0 < questions_per_attempt <= num_questions):
+            raise QuizPayloadError('questions_per_attempt must be between 1 and num_questions.')
+    shuffle = data.get('shuffle', False)
+    if not isinstance(shuffle, bool):
+        raise QuizPayloadError('shuffle must be true or false.')
+
+    return {
+        'course_id': course_id,
+        'title': title,
+        'duration_minutes': duration_minutes,
+        'questions': questions,
+        'questions_per_attempt': questions_per_attempt,
+        'shuffle': shuffle,
+    }
+
+
+def clean_questions(questions_data):
+    '''Validate a list of {"text", "options", "correct_option"} dicts;
+    returns (text, options, correct_index) tuples.'''
+    questions = []
+    for q_data in questions_data:
+        if not isinstance(q_data, dict):
+            raise QuizPayloadError('Invalid question or options format.')
+        q_text = q_data.get('text')
+        options = q_data.get('options') or []
+        correct_index = q_data.get('correct_option')  # 0-based index
+
+        if (not (q_text and options and isinstance(correct_index, int))
+                or isinstance(correct_index, bool)
+                or not 0 <= correct_index < len(options)
+                or not all(isinstance(opt, str) and opt for opt in options)):
+            raise QuizPayloadError('Invalid question or options format.')
+        questions.append((q_text, list(options), correct_index))
+    return questions
+
+
+def create_quizzes(specs):
+    '''Insert cleaned quiz specs with four bulk inserts in one transaction.
+
+    Each spec is the output of ``clean_quiz_payload`` plus ``created_by``.
+    Questions are stored with their MinHash signatures and LSH bands, for
+    ``myapp.duplicates.find_duplicates``. Returns the created quizzes in
+    the order of ``specs``.
+    '''
+    now = timezone.now()
+    question_specs = [q for spec in specs for q in spec['questions']]
+    questions = [Question(text=q_text) for q_text, _, _ in question_specs]
+    bands = index_questions(questions, [question_document(q_text, options) for q_text, options, _ in question_specs])
+    with transaction.atomic():
+        quizzes = Quiz.objects.bulk_create([
+            Quiz(
+                title=spec['title'],
+                course_id=spec['course_id'],
+                created_by=spec['created_by'],
+                start_time=now,
+                end_time=now + timezone.timedelta(minutes=spec['duration_minutes']),
+                duration_minutes=spec['duration_minutes'],
+                questions_per_attempt=spec.get('questions_per_attempt'),
+                shuffle=spec.get('shuffle', False),
+                is_published=True,
+            )
+            for spec in specs
+        ])
+        owners = (quiz for quiz, spec in zip(quizzes, specs) for _ in spec['questions'])
+        for question, quiz in zip(questions, owners):
+            question.quiz = quiz
+        Question.objects.bulk_create(questions)
+        Option.objects.bulk_create([
+            Option(question=question, text=opt_text, is_correct=(idx == correct_index))
+            for question, (_, options, correct_index) in zip(questions, question_specs)
+            for idx, opt_text in enumerate(options)
+        ])
+        QuestionBand.objects.bulk_create(bands())
+    invalidate_course_dashboards({spec['course_id'] for spec in specs})
+    return quizzes
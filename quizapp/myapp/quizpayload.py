@@ -0,0 +1,67 @@
+import gzip
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .cacheversions import bump_version, versioned_key
+from .layout import arrange, is_personalized
+from .models import Quiz
+from .serializers import QuizDetailSerializer
+
+
+def render_quiz_payload(quiz_id):
+    '''Render the take_quiz body for a quiz as (etag, gzip-compressed JSON).'''
+    quiz = Quiz.objects.prefetch_related('questions__options').get(pk=quiz_id)
+    body = json.dumps(QuizDetailSerializer(quiz).data, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+    etag = '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+    return etag, gzip.compress(body)
+
+
+def get_quiz_payload(quiz_id):
+    '''Cached (etag, gzip body) for a quiz, rendered on first use.'''
+    key = versioned_key('quiz-payload', quiz_id)
+    payload = cache.get(key)
+    if payload is None:
+        payload = render_quiz_payload(quiz_id)
+        cache.set(key, payload, getattr(settings, 'QUIZ_PAYLOAD_CACHE_TIMEOUT', 24 * 3600))
+    return payload
+
+
+def get_student_quiz_payload(quiz, student_id):
+    '''(etag, gzip body) of ``quiz`` as ``student_id`` takes it.
+
+    Quizzes that draw from a pool or shuffle are cut from the shared
+    cached render, so only the reordering is done per request.
+    '''
+    etag, body = get_quiz_payload(quiz.id)
+    if not is_personalized(quiz.questions_per_attempt, quiz.shuffle):
+        return etag, body
+
+    document = json.loads(gzip.decompress(body))
+    questions = {question['id']: question for question in document['questions']}
+    layout = arrange(
+        quiz.id, student_id,
+        {question_id: [option['id'] for option in question['options']] for question_id, question in questions.items()},
+        quiz.questions_per_attempt, quiz.shuffle,
+    )
+    arranged = []
+    for question_id, option_ids in layout:
+        options = {option['id']: option for option in questions[question_id]['options']}
+        arranged.append({**questions[question_id], 'options': [options[option_id] for option_id in option_ids]})
+    document['questions'] = arranged
+    body = json.dumps(document, separators=(',', ':')).encode()
+    return '"%s"' % hashlib.sha256(body).hexdigest()[:32], gzip.compress(body)
+
+
+def prewarm_quiz_payload(quiz_id):
+    try:
+        get_quiz_payload(quiz_id)
+    except Quiz.DoesNotExist:
+        pass
+
+
+def invalidate_quiz_payload(quiz_id):
+    bump_version('quiz-payload', quiz_id)
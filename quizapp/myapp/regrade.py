@@ -0,0 +1,151 @@
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, Exists, OuterRef, Q, Value, When
+from django.dispatch import Signal
+
+from .analytics import invalidate_item_analysis
+from .answerkey import answer_keys
+from .grading import percent_correct
+from .leaderboard import record_scores
+from .models import Option, QuizAttempt, StudentAnswer
+from .reviews import write_reviews
+
+
+# Sent once each regraded chunk has committed, with ``quiz_id`` and the
+# ``attempt_ids`` and ``student_ids`` of the attempts whose score changed.
+scores_changed = Signal()
+
+
+class AnswerKeyError(ValueError):
+    pass
+
+
+def clean_corrections(quiz_id, data):
+    '''Validate answer key corrections against the quiz's options.
+
+    ``data`` is a list of {"question_id", "correct_option_id"}. Returns
+    {question_id: option_id} for the questions whose key actually
+    changes: another option was marked correct, or more than one was.
+    '''
+    if not isinstance(data, list) or not data:
+        raise AnswerKeyError('corrections must be a non-empty list.')
+    corrections = {}
+    for item in data:
+        question_id = item.get('question_id') if isinstance(item, dict) else None
+        option_id = item.get('correct_option_id') if isinstance(item, dict) else None
+        if not all(isinstance(value, int) and not isinstance(value, bool) for value in (question_id, option_id)):
+            raise AnswerKeyError('Each correction needs an integer question_id and correct_option_id.')
+        if question_id in corrections:
+            raise AnswerKeyError(f'Question {question_id} is corrected twice.')
+        corrections[question_id] = option_id
+
+    options = {}
+    for question_id, option_id, is_correct in Option.objects.filter(
+        question__quiz_id=quiz_id, question_id__in=list(corrections),
+    ).values_list('question_id', 'id', 'is_correct'):
+        options.setdefault(question_id, {})[option_id] = is_correct
+    for question_id, option_id in corrections.items():
+        if option_id not in options.get(question_id, {}):
+            raise AnswerKeyError(f'Option {option_id} is not an option of question {question_id} of this quiz.')
+
+    return {
+        question_id: option_id
+        for question_id, option_id in corrections.items()
+        if [o for o, is_correct in options[question_id].items() if is_correct] != [option_id]
+    }
+
+
+def regrade_quiz(quiz_id, corrections, chunk_size=None):
+    '''Apply answer key ``corrections`` ({question_id: option_id}) and regrade.
+
+    The options are updated in one statement, then the quiz's completed
+    attempts are regraded REGRADE_CHUNK_SIZE at a time, each chunk in its
+    own transaction so the write lock is released between chunks: one
+    UPDATE re-marks the answers to corrected questions against the new
+    key, one query counts the correct and graded answers of every attempt
+    that answered one, the scores that moved are written back in bulk,
+    and the chunk's reviews and the leaderboard histogram are rewritten.
+    Scores are rounded in Python by ``percent_correct``, exactly as at
+    submission, so an attempt whose answers did not change keeps its
+    score.
+
+    Returns {'attempts': regraded, 'changed': scores that changed,
+    'raised': ..., 'lowered': ...}.
+    '''
+    chunk_size = chunk_size or getattr(settings, 'REGRADE_CHUNK_SIZE', 500)
+    question_ids = list(corrections)
+    report = {'attempts': 0, 'changed': 0, 'raised': 0, 'lowered': 0}
+    if not question_ids:
+        return report
+
+    with transaction.atomic():
+        Option.objects.filter(question_id__in=question_ids).update(is_correct=Case(
+            *[When(question_id=question_id, pk=option_id, then=Value(True))
+              for question_id, option_id in corrections.items()],
+            default=Value(False),
+        ))
+        # Submissions from here on are graded with the new key; the chunks
+        # below catch up with those graded before
+        _key_changed(quiz_id)
+        transaction.on_commit(partial(_key_changed, quiz_id))
+
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            # Every review lists the options, so every completed attempt is
+            # rewritten; only the scores of those that answered a corrected
+            # question are recomputed
+            ids = list(
+                QuizAttempt.objects.filter(quiz_id=quiz_id, completed=True, pk__gt=last_id)
+                .order_by('pk').values_list('id', flat=True)[:chunk_size]
+            )
+            if not ids:
+                break
+            last_id = ids[-1]
+            StudentAnswer.objects.filter(attempt_id__in=ids, question_id__in=question_ids).update(is_correct=Exists(
+                Option.objects.filter(pk=OuterRef('selected_option_id'), is_correct=True)
+            ))
+            counts = (
+                StudentAnswer.objects.filter(attempt_id__in=ids).order_by()
+                .values('attempt_id', 'attempt__student_id', 'attempt__score')
+                .annotate(
+                    total=Count('id'),
+                    correct=Count('id', filter=Q(is_correct=True)),
+                    corrected=Count('id', filter=Q(question_id__in=question_ids)),
+                )
+                .filter(corrected__gt=0)
+                .values_list('attempt_id', 'attempt__student_id', 'attempt__score', 'correct', 'total')
+            )
+            changed = []
+            for attempt_id, student_id, old, correct, total in counts:
+                new = percent_correct(correct, total)
+                if new != old:
+                    changed.append((attempt_id, student_id, old, new))
+            QuizAttempt.objects.bulk_update(
+                [QuizAttempt(pk=attempt_id, score=new) for attempt_id, _, _, new in changed], ['score'],
+            )
+
+            write_reviews(ids)
+            record_scores(quiz_id, [new for *_, new in changed], [old for _, _, old, _ in changed])
+            if changed:
+                transaction.on_commit(partial(
+                    scores_changed.send,
+                    sender=QuizAttempt, quiz_id=quiz_id,
+                    attempt_ids=[attempt_id for attempt_id, *_ in changed],
+                    student_ids=[student_id for _, student_id, _, _ in changed],
+                ))
+
+        report['attempts'] += len(ids)
+        report['changed'] += len(changed)
+        report['raised'] += sum(1 for *_, old, new in changed if (new or 0) > (old or 0))
+        report['lowered'] += sum(1 for *_, old, new in changed if (new or 0) < (old or 0))
+    # The analysis may have been cached from a half-regraded quiz
+    invalidate_item_analysis(quiz_id)
+    return report
+
+
+def _key_changed(quiz_id):
+    answer_keys.invalidate(quiz_id)
+    invalidate_item_analysis(quiz_id)
@@ -0,0 +1,106 @@
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .layout import arrange, is_personalized
+from .models import AttemptReview, Option, QuizAttempt, StudentAnswer
+
+
+def _quiz_options(quiz_ids):
+    '''{quiz_id: {question_id: (question_text, [options])}} in one query.'''
+    quizzes = {}
+    rows = (
+        Option.objects.filter(question__quiz_id__in=quiz_ids)
+        .order_by('question_id', 'id')
+        .values_list('question__quiz_id', 'question_id', 'question__text', 'id', 'text', 'is_correct')
+    )
+    for quiz_id, question_id, question_text, option_id, text, is_correct in rows:
+        questions = quizzes.setdefault(quiz_id, {})
+        _, options = questions.setdefault(question_id, (question_text, []))
+        options.append({"option_id": option_id, "text": text, "is_correct": is_correct})
+    return quizzes
+
+
+def build_reviews(attempt_ids):
+    '''Review documents for a batch of attempts with three queries.
+
+    Returns {attempt_id: dict} in the shape served by ``view_score``.
+    '''
+    attempts = list(
+        QuizAttempt.objects.filter(pk__in=attempt_ids)
+        .values_list('id', 'quiz_id', 'quiz__title', 'score', 'completed',
+                     'student_id', 'quiz__questions_per_attempt', 'quiz__shuffle')
+    )
+    if not attempts:
+        return {}
+    questions = _quiz_options({attempt[1] for attempt in attempts})
+
+    reviews = {}
+    for attempt_id, quiz_id, title, score, completed, *_ in attempts:
+        reviews[attempt_id] = {
+            "quiz_title": title,
+            "score": score,
+            "completed": completed,
+            "questions": [],
+        }
+    answers = (
+        StudentAnswer.objects.filter(attempt_id__in=attempt_ids)
+        .order_by('attempt_id', 'id')
+        .values_list('attempt_id', 'attempt__quiz_id', 'question_id', 'selected_option_id', 'is_correct')
+    )
+    for attempt_id, quiz_id, question_id, selected_id, is_correct in answers:
+        question_text, options = questions.get(quiz_id, {}).get(question_id, ('', []))
+        selected = next((opt for opt in options if opt["option_id"] == selected_id), None)
+        reviews[attempt_id]["questions"].append({
+            "question_id": question_id,
+            "question_text": question_text,
+            "selected_option_id": selected_id,
+            "selected_option_text": selected["text"] if selected else None,
+            "is_correct": is_correct,
+            "options": options,
+        })
+
+    for attempt_id, quiz_id, _, _, _, student_id, per_attempt, shuffle in attempts:
+        if is_personalized(per_attempt, shuffle):
+            _arrange_review(reviews[attempt_id], quiz_id, student_id, questions.get(quiz_id, {}), per_attempt, shuffle)
+    return reviews
+
+
+def _arrange_review(review, quiz_id, student_id, quiz_questions, per_attempt, shuffle):
+    '''Put a review's questions and options in the order the student saw them.'''
+    layout = arrange(
+        quiz_id, student_id,
+        {question_id: [opt["option_id"] for opt in options] for question_id, (_, options) in quiz_questions.items()},
+        per_attempt, shuffle,
+    )
+    position = {question_id: (n, option_ids) for n, (question_id, option_ids) in enumerate(layout)}
+    entries = sorted(review["questions"], key=lambda entry: position.get(entry["question_id"], (len(layout),))[0])
+    for entry in entries:
+        _, option_ids = position.get(entry["question_id"], (None, None))
+        if option_ids:
+            by_id = {opt["option_id"]: opt for opt in entry["options"]}
+            entry["options"] = [by_id[option_id] for option_id in option_ids]
+    review["questions"] = entries
+
+
+def render_review(review):
+    return json.dumps(review, cls=DjangoJSONEncoder, separators=(',', ':'))
+
+
+def write_reviews(attempt_ids):
+    '''Materialize the review of each completed attempt in ``attempt_ids``.
+
+    Returns the built reviews, as ``build_reviews`` does.
+    '''
+    reviews = build_reviews(attempt_ids)
+    AttemptReview.objects.bulk_create(
+        [
+            AttemptReview(attempt_id=attempt_id, document=render_review(review))
+            for attempt_id, review in reviews.items()
+            if review["completed"]
+        ],
+        update_conflicts=True,
+        unique_fields=['attempt'],
+        update_fields=['document', 'updated_at'],
+    )
+    return reviews
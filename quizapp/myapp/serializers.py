@@ -1,6 +1,35 @@
 from rest_framework import serializers
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
 from .models import User , Course, Quiz, Question, Option, QuizAttempt, StudentAnswer
 from django.utils import timezone
+from .grading import submit_attempt
+from .membership import add_membership_claims
+
+
+class MembershipTokenObtainPairSerializer(TokenObtainPairSerializer):
+    '''Login that stamps role and course membership claims into the tokens.'''
+
+    @classmethod
+    def get_token(cls, user):
+        return add_membership_claims(super().get_token(user), user)
+
+
+class MembershipTokenRefreshSerializer(TokenRefreshSerializer):
+    '''Refresh that re-reads the claims, so a new access token is never older
+    than the user's current memberships.'''
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        user = User.objects.filter(
+            **{api_settings.USER_ID_FIELD: refresh.get(api_settings.USER_ID_CLAIM)}
+        ).first()
+        if not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+        add_membership_claims(refresh, user)
+        # The stock refresh derives the access token and handles rotation
+        return super().validate({'refresh': str(refresh)})
 
 class StudentRegistrationSerializer(serializers.ModelSerializer):
     class Meta:
@@ -53,6 +82,28 @@ class QuizDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = Quiz
         fields = ['id', 'title', 'duration_minutes', 'questions']
+
+class QuizSummarySerializer(serializers.ModelSerializer):
+    '''Course listing row; expects the annotations from ``annotate_quiz_summary``.'''
+    question_count = serializers.IntegerField(read_only=True)
+    attempt_status = serializers.SerializerMethodField()
+    completed = serializers.SerializerMethodField()
+    score = serializers.FloatField(source='attempt_score', read_only=True)
+
+    class Meta:
+        model = Quiz
+        fields = ['id', 'title', 'duration_minutes', 'start_time', 'end_time',
+                  'question_count', 'attempt_status', 'completed', 'score']
+
+    def get_attempt_status(self, obj):
+        if obj.attempt_completed is None:
+            return 'not_started'
+        return 'completed' if obj.attempt_completed else 'in_progress'
+
+    def get_completed(self, obj):
+        return bool(obj.attempt_completed)
+
+
 class StudentAnswerInputSerializer(serializers.Serializer):
     question_id = serializers.IntegerField()
     selected_option_id = serializers.IntegerField()
@@ -85,43 +136,19 @@ class SubmitQuizSerializer(serializers.Serializer):
 
     def create(self, validated_data):
         user = self.context['request'].user
-        quiz = validated_data['quiz']
-        answers = validated_data['answers']
-
-        attempt, _ = QuizAttempt.objects.get_or_create(student=user, quiz=quiz)
-
-        correct_count = 0
-        total = 0
-
-        for ans in answers:
-            try:
-                question = Question.objects.get(id=ans['question_id'], quiz=quiz)
-                selected_option = Option.objects.get(id=ans['selected_option_id'], question=question)
-            except (Question.DoesNotExist, Option.DoesNotExist):
-                continue
-
-            is_correct = selected_option.is_correct
-            StudentAnswer.objects.update_or_create(
-                attempt=attempt,
-                question=question,
-                defaults={
-                    'selected_option': selected_option,
-                    'is_correct': is_correct
-                }
-            )
-            total += 1
-            if is_correct:
-                correct_count += 1
-
-        score = round((correct_count / total) * 100, 2) if total else 0
-        attempt.score = score
-        attempt.completed = True
-        attempt.save()
-        return attempt
+        return submit_attempt(user, validated_data['quiz'], validated_data['answers'])
+class UserBasicSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = ['id', 'username', 'email']
+
 class CourseSerializer(serializers.ModelSerializer):
+    '''Course with its teachers; prefetch ``teachers`` when serializing many.'''
+    id = serializers.IntegerField(read_only=True)
+    teachers = UserBasicSerializer(many=True, read_only=True)
     class Meta:
         model = Course
-        fields = ['name', 'code']
+        fields = ['id', 'name', 'code' , 'teachers']
 
 class UserProfileSerializer(serializers.ModelSerializer):
     enrolled_courses = serializers.SerializerMethodField()
@@ -132,15 +159,29 @@ class UserProfileSerializer(serializers.ModelSerializer):
 
     def get_enrolled_courses(self, obj):
         if obj.role == 'student':
-            return CourseSerializer(obj.enrolled_courses.all(), many=True).data
+            return CourseSerializer(obj.enrolled_courses.prefetch_related('teachers'), many=True).data
         return None
-class UserBasicSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = User
-        fields = ['id', 'username', 'email']
-class CourseSerializer(serializers.ModelSerializer):
-    id = serializers.IntegerField(read_only=True)
-    teachers = UserBasicSerializer(many=True, read_only=True)
-    class Meta:
-        model = Course
-        fields = ['id', 'name', 'code' , 'teachers']
+
+
+class DashboardQuizSerializer(QuizSummarySerializer):
+    '''Dashboard row; ``state`` is relative to ``context['now']``.'''
+    question_count = None
+    state = serializers.SerializerMethodField()
+
+    class Meta(QuizSummarySerializer.Meta):
+        fields = ['id', 'title', 'duration_minutes', 'start_time', 'end_time',
+                  'state', 'attempt_status', 'completed', 'score']
+
+    def get_state(self, obj):
+        now = self.context['now']
+        if now < obj.start_time:
+            return 'upcoming'
+        return 'open' if now <= obj.end_time else 'closed'
+
+
+class DashboardCourseSerializer(CourseSerializer):
+    '''Expects ``teachers`` and ``dashboard_quizzes`` to be prefetched.'''
+    quizzes = DashboardQuizSerializer(source='dashboard_quizzes', many=True, read_only=True)
+
+    class Meta(CourseSerializer.Meta):
+        fields = CourseSerializer.Meta.fields + ['quizzes']
@@ -0,0 +1,165 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .analytics import invalidate_item_analysis
+from .answerkey import answer_keys
+from .dashboard import invalidate_course_dashboards, invalidate_student_dashboards
+from .duplicates import reindex_questions
+from .grading import attempts_completed
+from .membership import bump_membership_versions, forget_membership_versions, new_membership_version
+from .models import AttemptReview, Course, Option, Question, Quiz, QuizAttempt, User
+from .monitor import hub
+from .quizpayload import invalidate_quiz_payload, prewarm_quiz_payload
+from .regrade import scores_changed
+
+
+def invalidate_quiz(quiz_id):
+    '''Drop everything derived from a quiz's questions and options.
+
+    Caches are cleared immediately and again once the surrounding
+    transaction commits, so a concurrent reader cannot re-cache the
+    pre-commit rows. Materialized reviews are deleted and rebuilt lazily
+    by view_score.
+    '''
+    if quiz_id is None:
+        return
+    AttemptReview.objects.filter(attempt__quiz_id=quiz_id).delete()
+    _invalidate_quiz_now(quiz_id)
+    transaction.on_commit(lambda: _invalidate_quiz_now(quiz_id))
+
+
+def _invalidate_quiz_now(quiz_id):
+    answer_keys.invalidate(quiz_id)
+    invalidate_quiz_payload(quiz_id)
+    invalidate_item_analysis(quiz_id)
+
+
+def _quiz_id_for_option(option):
+    if Option.question.is_cached(option):
+        return option.question.quiz_id
+    return Question.objects.filter(pk=option.question_id).values_list('quiz_id', flat=True).first()
+
+
+@receiver(post_save, sender=Quiz)
+def quiz_saved(sender, instance, **kwargs):
+    invalidate_quiz(instance.pk)
+    invalidate_course_dashboards([instance.course_id])
+    if instance.is_published:
+        # Render the take_quiz payload once, before students ask for it
+        transaction.on_commit(lambda: prewarm_quiz_payload(instance.pk))
+
+
+@receiver(post_delete, sender=Quiz)
+def quiz_deleted(sender, instance, **kwargs):
+    invalidate_quiz(instance.pk)
+    invalidate_course_dashboards([instance.course_id])
+
+
+def _cascaded_from(kwargs, *models):
+    # Rows deleted as part of a quiz/question cascade are covered by the
+    # handler of the object the delete started from.
+    origin = kwargs.get('origin')
+    return isinstance(origin, models)
+
+
+@receiver([post_save, post_delete], sender=Question)
+def question_changed(sender, instance, **kwargs):
+    if _cascaded_from(kwargs, Quiz):
+        return
+    invalidate_quiz(instance.quiz_id)
+    if kwargs['signal'] is post_save:
+        reindex_questions([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=Option)
+def option_changed(sender, instance, **kwargs):
+    if _cascaded_from(kwargs, Quiz, Question):
+        return
+    invalidate_quiz(_quiz_id_for_option(instance))
+    reindex_questions([instance.question_id])
+
+
+@receiver(attempts_completed)
+def attempts_completed_handler(sender, quiz_id, attempt_ids, student_ids=(), scores=(), **kwargs):
+    invalidate_item_analysis(quiz_id)
+    invalidate_student_dashboards(student_ids)
+    hub.attempts_completed(quiz_id, scores)
+
+
+@receiver(scores_changed)
+def scores_changed_handler(sender, quiz_id, attempt_ids, student_ids=(), **kwargs):
+    invalidate_item_analysis(quiz_id)
+    invalidate_student_dashboards(student_ids)
+    hub.resync(quiz_id)
+
+
+@receiver(post_save, sender=QuizAttempt)
+def attempt_saved(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: hub.attempt_started(instance.quiz_id))
+
+
+def _changes_claims(instance, update_fields):
+    # Logins only touch last_login; every other save may change the role
+    # or flags carried in the token claims
+    return not instance._state.adding and update_fields != frozenset(['last_login'])
+
+
+@receiver(pre_save, sender=User)
+def user_saving(sender, instance, update_fields=None, **kwargs):
+    if _changes_claims(instance, update_fields):
+        instance.membership_version = new_membership_version()
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    if created or update_fields == frozenset(['last_login']):
+        return
+    if update_fields is not None and 'membership_version' not in update_fields:
+        User.objects.filter(pk=instance.pk).update(membership_version=instance.membership_version)
+    forget_membership_versions([instance.pk])
+    if instance.role == 'teacher':
+        # Student dashboards list the teachers of each course
+        invalidate_course_dashboards(instance.teaching_courses.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    forget_membership_versions([instance.pk])
+
+
+@receiver(m2m_changed, sender=Course.teachers.through)
+@receiver(m2m_changed, sender=Course.students.through)
+def course_membership_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # Sent inside the transaction that changes the rows, so the new
+    # versions commit together with the new memberships
+    if action in ('post_add', 'post_remove'):
+        bump_membership_versions([instance.pk] if reverse else pk_set)
+    elif action == 'pre_clear':
+        if reverse:
+            bump_membership_versions([instance.pk])
+        else:
+            members = sender.objects.filter(course=instance).values_list('user_id', flat=True)
+            bump_membership_versions(list(members))
+
+
+@receiver(pre_delete, sender=Course)
+def course_deleting(sender, instance, **kwargs):
+    members = set(Course.teachers.through.objects.filter(course=instance).values_list('user_id', flat=True))
+    members.update(Course.students.through.objects.filter(course=instance).values_list('user_id', flat=True))
+    bump_membership_versions(members)
+
+
+@receiver(post_save, sender=Course)
+def course_saved(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_course_dashboards([instance.pk])
+
+
+@receiver(m2m_changed, sender=Course.teachers.through)
+def course_teachers_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ('post_add', 'post_remove'):
+        invalidate_course_dashboards(pk_set if reverse else [instance.pk])
+    elif action == 'pre_clear':
+        invalidate_course_dashboards(instance.teaching_courses.values_list('id', flat=True) if reverse else [instance.pk])
@@ -0,0 +1,126 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+from django.conf import settings
+
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS submissions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    receipt TEXT NOT NULL UNIQUE,
+    student_id INTEGER NOT NULL,
+    quiz_id INTEGER NOT NULL,
+    answers TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    score REAL,
+    error TEXT,
+    created_at REAL NOT NULL,
+    processed_at REAL
+);
+CREATE INDEX IF NOT EXISTS submissions_status ON submissions (status, id);
+'''
+
+
+class SubmissionSpool:
+    '''Durable local queue of quiz submissions waiting to be graded.
+
+    The spool is its own SQLite file in WAL mode, so appending a
+    submission never waits on the application database's writer lock.
+    Rows move from ``pending`` to ``processing`` when a worker claims
+    them and end as ``graded`` (with a score) or ``rejected`` (with an
+    error).
+    '''
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            # FULL: an acknowledged receipt survives a power cut
+            conn.execute('PRAGMA synchronous=FULL')
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def append(self, student_id, quiz_id, answers):
+        receipt = uuid.uuid4().hex
+        self._connection().execute(
+            'INSERT INTO submissions (receipt, student_id, quiz_id, answers, created_at) VALUES (?, ?, ?, ?, ?)',
+            (receipt, student_id, quiz_id, json.dumps(answers, separators=(',', ':')), time.time()),
+        )
+        return receipt
+
+    def claim(self, limit):
+        '''Mark up to ``limit`` pending submissions as processing and return them.'''
+        rows = self._connection().execute(
+            '''UPDATE submissions SET status = 'processing'
+               WHERE id IN (SELECT id FROM submissions WHERE status = 'pending' ORDER BY id LIMIT ?)
+               RETURNING id, student_id, quiz_id, answers''',
+            (limit,),
+        ).fetchall()
+        return sorted(
+            ({'id': r['id'], 'student_id': r['student_id'], 'quiz_id': r['quiz_id'],
+              'answers': json.loads(r['answers'])} for r in rows),
+            key=lambda r: r['id'],
+        )
+
+    def finish(self, results):
+        '''Record outcomes as (id, status, score, error) tuples.'''
+        now = time.time()
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany(
+                'UPDATE submissions SET status = ?, score = ?, error = ?, processed_at = ? WHERE id = ?',
+                [(status, score, error, now, row_id) for row_id, status, score, error in results],
+            )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def release(self, ids):
+        '''Put claimed submissions back in the queue, e.g. after a lock timeout.'''
+        self._connection().executemany(
+            "UPDATE submissions SET status = 'pending' WHERE id = ?", [(row_id,) for row_id in ids]
+        )
+
+    def requeue_processing(self):
+        '''Return claimed but unfinished submissions to the queue (after a worker crash).'''
+        return self._connection().execute(
+            "UPDATE submissions SET status = 'pending' WHERE status = 'processing'"
+        ).rowcount
+
+    def get(self, receipt):
+        row = self._connection().execute(
+            'SELECT receipt, student_id, quiz_id, status, score, error FROM submissions WHERE receipt = ?',
+            (receipt,),
+        ).fetchone()
+        return dict(row) if row else None
+
+
+_spool = None
+_spool_lock = threading.Lock()
+
+
+def get_spool():
+    global _spool
+    path = str(settings.SUBMISSION_SPOOL_PATH)
+    with _spool_lock:
+        if _spool is None or _spool.path != path:
+            _spool = SubmissionSpool(path)
+        return _spool
@@ -1,3 +1,1855 @@
-from django.test import TestCase
+import json
+import os
+import re
+import tempfile
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection
+from django.db.models import Count, Q, Sum
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .answerkey import AnswerKeyCache, answer_keys, get_answer_key
+from .autosave import autosaves
+from .deadlines import expire_attempts
+from .duplicates import minhash_signatures, question_document
+from .generation import LocalGenerator
+from .gradebook import gradebook_rows
+from .management.commands import process_submissions
+from .grading import drawn_question_ids, submit_attempt
+from .membership import current_membership_version
+from .monitor import hub
+from .spool import get_spool
+from .urls import urlpatterns
+from .serializers import MembershipTokenObtainPairSerializer
+from .models import (
+    User, Course, Quiz, Question, QuestionBand, Option, QuizAttempt, StudentAnswer, AttemptReview, QuizScoreBucket,
+    GeneratedQuestionSet, GenerationJob,
+)
+
+
+def make_quiz(course, teacher, num_questions, num_options=4, title='Quiz', **fields):
+    now = timezone.now()
+    quiz = Quiz.objects.create(
+        title=title,
+        course=course,
+        created_by=teacher,
+        start_time=now - timedelta(minutes=5),
+        end_time=now + timedelta(hours=1),
+        duration_minutes=30,
+        is_published=True,
+        **fields,
+    )
+    for n in range(num_questions):
+        question = Question.objects.create(quiz=quiz, text=f'Question {n}')
+        for i in range(num_options):
+            Option.objects.create(question=question, text=f'Option {i}', is_correct=(i == 0))
+    return quiz
+
+
+def answers_for(quiz, correct=True):
+    answers = []
+    for question in quiz.questions.prefetch_related('options'):
+        option = next(o for o in question.options.all() if o.is_correct == correct)
+        answers.append({'question_id': question.id, 'selected_option_id': option.id})
+    return answers
+
+
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    # Autosaves are flushed explicitly, in the test's transaction
+    AUTOSAVE_FLUSH_INTERVAL=0,
+    # Generation jobs run inline, in the test's transaction
+    GENERATION_WORKERS=0,
+)
+class QuizTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = User.objects.create_user(username='teacher', password='pw', role='teacher')
+        cls.student = User.objects.create_user(username='student', password='pw', role='student')
+        cls.course = Course.objects.create(name='Python', code='PY101')
+        cls.course.teachers.add(cls.teacher)
+        cls.course.students.add(cls.student)
+
+    def setUp(self):
+        answer_keys.clear()
+        autosaves.clear()
+        cache.clear()
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user=user)
+        return client
+
+
+class SubmitQuizTests(QuizTestCase):
+    def submit(self, quiz, answers, user=None):
+        return self.client_for(user or self.student).post(
+            reverse('submit-quiz'), {'quiz_id': quiz.id, 'answers': answers}, format='json'
+        )
+
+    def test_scores_submission_and_skips_foreign_answers(self):
+        quiz = make_quiz(self.course, self.teacher, 4)
+        other = make_quiz(self.course, self.teacher, 1, title='Other')
+        answers = answers_for(quiz)
+        answers[0]['selected_option_id'] = answers_for(quiz, correct=False)[0]['selected_option_id']
+        answers += answers_for(other)
+
+        response = self.submit(quiz, answers)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['score'], 75.0)
+        attempt = QuizAttempt.objects.get(student=self.student, quiz=quiz)
+        self.assertTrue(attempt.completed)
+        self.assertEqual(attempt.answers.count(), 4)
+        self.assertEqual(attempt.answers.filter(is_correct=True).count(), 3)
+
+    def test_query_count_is_independent_of_question_count(self):
+        small = make_quiz(self.course, self.teacher, 5, title='Small')
+        large = make_quiz(self.course, self.teacher, 50, title='Large')
+        other = User.objects.create_user(username='student2', password='pw', role='student')
+
+        counts = []
+        for quiz, user in ((small, self.student), (large, other)):
+            answers = answers_for(quiz)
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.submit(quiz, answers, user=user)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data['score'], 100.0)
+            counts.append(len(ctx.captured_queries))
+
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(StudentAnswer.objects.filter(attempt__quiz=large).count(), 50)
+
+
+class AnswerKeyCacheTests(QuizTestCase):
+    def test_hits_misses_and_lru_eviction(self):
+        quizzes = [make_quiz(self.course, self.teacher, 2, title=f'Q{n}') for n in range(3)]
+        cache = AnswerKeyCache(maxsize=2)
+
+        key = cache.get(quizzes[0].id)
+        with self.assertNumQueries(0):
+            self.assertEqual(cache.get(quizzes[0].id), key)
+        cache.get(quizzes[1].id)
+        cache.get(quizzes[2].id)
+
+        self.assertEqual(cache.stats(), {'size': 2, 'maxsize': 2, 'hits': 1, 'misses': 3})
+        with self.assertNumQueries(1):
+            cache.get(quizzes[0].id)
+
+    def test_key_holds_correct_and_valid_options(self):
+        quiz = make_quiz(self.course, self.teacher, 1, num_options=3)
+        question = quiz.questions.get()
+        options = list(question.options.order_by('id'))
+
+        key = answer_keys.get(quiz.id)
+
+        self.assertEqual(key, {question.id: (options[0].id, frozenset(o.id for o in options))})
+
+    def test_option_and_question_changes_invalidate(self):
+        quiz = make_quiz(self.course, self.teacher, 1)
+        question = quiz.questions.get()
+        answer_keys.get(quiz.id)
+
+        option = question.options.get(is_correct=False, text='Option 2')
+        Option.objects.filter(question=question).update(is_correct=False)
+        option.is_correct = True
+        option.save()
+        self.assertEqual(answer_keys.get(quiz.id)[question.id][0], option.id)
+
+        option.delete()
+        self.assertNotIn(option.id, answer_keys.get(quiz.id)[question.id][1])
+
+        question.delete()
+        self.assertEqual(answer_keys.get(quiz.id), {})
+
+
+def quiz_payload(course, num_questions=2, title='Created'):
+    return {
+        'course_id': course.id,
+        'title': title,
+        'num_questions': num_questions,
+        'duration_minutes': 20,
+        'questions': [
+            {'text': f'Question {n}', 'options': ['a', 'b', 'c'], 'correct_option': n % 3}
+            for n in range(num_questions)
+        ],
+    }
+
+
+class CreateQuizTests(QuizTestCase):
+    def test_creates_quiz_with_bulk_inserts(self):
+        response = self.client_for(self.teacher).post(
+            reverse('create_quiz'), quiz_payload(self.course, 3), format='json'
+        )
+
+        self.assertEqual(response.status_code, 201)
+        quiz = Quiz.objects.get(pk=response.data['quiz_id'])
+        self.assertEqual(quiz.questions.count(), 3)
+        self.assertEqual(Option.objects.filter(question__quiz=quiz).count(), 9)
+        self.assertEqual(
+            list(Option.objects.filter(question__quiz=quiz, is_correct=True).order_by('id').values_list('text', flat=True)),
+            ['a', 'b', 'c'],
+        )
+
+    def test_malformed_question_creates_nothing(self):
+        payload = quiz_payload(self.course, 3)
+        payload['questions'][2]['correct_option'] = 7
+
+        response = self.client_for(self.teacher).post(reverse('create_quiz'), payload, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Quiz.objects.exists())
+        self.assertFalse(Question.objects.exists())
+
+    def test_import_streams_jsonl_and_reports_bad_lines(self):
+        other_course = Course.objects.create(name='Other', code='OT101')
+        lines = [
+            json.dumps(quiz_payload(self.course, 2, title='First')),
+            'not json',
+            json.dumps(quiz_payload(other_course, 1, title='Not mine')),
+            '',
+            json.dumps(quiz_payload(self.course, 3, title='Second')),
+        ]
+        upload = SimpleUploadedFile('bank.jsonl', '\n'.join(lines).encode(), content_type='application/jsonl')
+
+        with self.settings(QUIZ_IMPORT_BATCH_QUESTIONS=2):
+            response = self.client_for(self.teacher).post(reverse('import_quizzes'), {'file': upload})
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['quiz_ids']), 2)
+        self.assertEqual([e['line'] for e in response.data['errors']], [2, 3])
+        self.assertEqual(Question.objects.filter(quiz__title='Second').count(), 3)
+        self.assertFalse(Quiz.objects.filter(course=other_course).exists())
+
+
+class QuestionBankTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        self.quiz = make_quiz(self.course, self.teacher, 0, title='Bank')
+        self.client = self.client_for(self.teacher)
+
+    def add_question(self, text, options=(), quiz=None):
+        question = Question.objects.create(quiz=quiz or self.quiz, text=text)
+        for n, option in enumerate(options):
+            Option.objects.create(question=question, text=option, is_correct=n == 0)
+        return question
+
+    def search(self, q, **params):
+        response = self.client.get(reverse('search-questions'), {'q': q, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def ids(self, q, **params):
+        return [result['id'] for result in self.search(q, **params)['results']]
+
+    def test_ranks_question_text_matches_first_and_matches_prefixes(self):
+        in_option = self.add_question('Which language is this?', ['Python', 'Ruby'])
+        in_text = self.add_question('What does Python print?', ['Hello', 'Nothing'])
+        self.add_question('Unrelated', ['Java'])
+
+        self.assertEqual(self.ids('python'), [in_text.id, in_option.id])
+        self.assertEqual(self.ids('pyt'), [in_text.id, in_option.id])
+        self.assertEqual(self.ids('python hel'), [in_text.id])
+        result = self.search('python')['results'][0]
+        self.assertEqual(result['quiz'], {'id': self.quiz.id, 'title': 'Bank'})
+        self.assertEqual([o['text'] for o in result['options']], ['Hello', 'Nothing'])
+
+    def test_only_searches_the_teachers_courses(self):
+        other_teacher = User.objects.create_user(username='other-teacher', password='pw', role='teacher')
+        other_course = Course.objects.create(name='Other', code='OT101')
+        other_course.teachers.add(other_teacher)
+        other_quiz = make_quiz(other_course, other_teacher, 0)
+        mine = self.add_question('Recursion base case?')
+        self.add_question('Recursion depth?', quiz=other_quiz)
+
+        self.assertEqual(self.ids('recursion'), [mine.id])
+        self.assertEqual(self.ids('recursion', course='OT101'), [])
+        self.assertEqual(self.client_for(self.student).get(reverse('search-questions'), {'q': 'x'}).status_code, 403)
+        self.assertEqual(self.client.get(reverse('search-questions'), {'q': '"*'}).status_code, 400)
+
+    def test_index_follows_edits(self):
+        question = self.add_question('Stack or queue?', ['Stack', 'Queue'])
+        self.assertEqual(self.ids('queue'), [question.id])
+
+        question.text = 'Which structure is LIFO?'
+        question.save()
+        Option.objects.filter(question=question, text='Queue').update(text='Heap')
+        self.assertEqual(self.ids('queue'), [])
+        self.assertEqual(self.ids('lifo heap'), [question.id])
+
+        Option.objects.filter(question=question, text='Heap').delete()
+        self.assertEqual(self.ids('heap'), [])
+        question.delete()
+        self.assertEqual(self.ids('lifo'), [])
+
+    def test_pages(self):
+        questions = [self.add_question(f'Sorting question {n}') for n in range(5)]
+
+        first = self.search('sorting', page_size=2)
+        self.assertEqual(len(first['results']), 2)
+        self.assertIsNone(first['previous'])
+        last = self.client.get(first['next'].replace('page=2', 'page=3')).data
+        self.assertEqual(len(last['results']), 1)
+        self.assertIsNone(last['next'])
+        self.assertIn('page=2', last['previous'])
+        seen = self.ids('sorting', page_size=2) + self.ids('sorting', page_size=2, page=2) + self.ids('sorting', page_size=2, page=3)
+        self.assertEqual(sorted(seen), [q.id for q in questions])
+
+
+class DuplicateTests(QuizTestCase):
+    STEM = 'Which data structure serves elements in first in, first out order?'
+    OPTIONS = ['Queue', 'Stack', 'Heap', 'Tree']
+
+    def payload(self, questions, course=None, title='Created'):
+        return {
+            'course_id': (course or self.course).id,
+            'title': title,
+            'num_questions': len(questions),
+            'duration_minutes': 20,
+            'questions': [{'text': text, 'options': options, 'correct_option': 0} for text, options in questions],
+        }
+
+    def create(self, questions, user=None, course=None):
+        response = self.client_for(user or self.teacher).post(
+            reverse('create_quiz'), self.payload(questions, course), format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.data
+
+    def test_signatures_estimate_similarity(self):
+        same, reordered, reworded, other = minhash_signatures([
+            question_document(self.STEM, self.OPTIONS),
+            question_document(self.STEM, list(reversed(self.OPTIONS))),
+            question_document(self.STEM.replace('serves', 'serves its'), self.OPTIONS),
+            question_document('What is the derivative of x squared?', ['2x', 'x', 'x squared', '2']),
+        ])
+        self.assertTrue((same == reordered).all())
+        self.assertGreater((same == reworded).mean(), 0.8)
+        self.assertLess((same == other).mean(), 0.2)
+
+    def test_flags_duplicates_in_the_quiz_and_the_bank(self):
+        existing = self.create([(self.STEM, self.OPTIONS)])
+        self.assertEqual(existing['duplicates'], [])
+        [original] = Question.objects.filter(quiz_id=existing['quiz_id']).values_list('id', flat=True)
+
+        created = self.create([
+            ('What is the derivative of x squared?', ['2x', 'x', 'x squared', '2']),
+            (self.STEM.replace('serves', 'serves its'), self.OPTIONS),
+            ('What is the derivative of x squared ?', ['x', '2x', '2', 'x squared']),
+        ])
+
+        flagged = {d['index']: [m['question_id'] for m in d['matches']] for d in created['duplicates']}
+        first = Question.objects.filter(quiz_id=created['quiz_id']).order_by('id').first()
+        self.assertEqual(flagged, {1: [original], 2: [first.id]})
+        self.assertTrue(Quiz.objects.filter(pk=created['quiz_id'], questions__isnull=False).exists())
+
+    def test_only_matches_the_teachers_courses(self):
+        other_teacher = User.objects.create_user(username='other-teacher', password='pw', role='teacher')
+        other_course = Course.objects.create(name='Other', code='OT101')
+        other_course.teachers.add(other_teacher)
+        self.create([(self.STEM, self.OPTIONS)], user=other_teacher, course=other_course)
+
+        self.assertEqual(self.create([(self.STEM, self.OPTIONS)])['duplicates'], [])
+
+    def test_edits_are_reindexed_and_imports_flagged(self):
+        quiz = make_quiz(self.course, self.teacher, 1)
+        question = quiz.questions.get()
+        question.text = self.STEM
+        question.save()
+        for option, text in zip(question.options.order_by('id'), self.OPTIONS):
+            option.text = text
+            option.save()
+
+        upload = SimpleUploadedFile('bank.jsonl', json.dumps(self.payload([(self.STEM, self.OPTIONS)])).encode())
+        response = self.client_for(self.teacher).post(reverse('import_quizzes'), {'file': upload})
+
+        [flagged] = response.data['duplicates']
+        self.assertEqual(flagged['questions'][0]['matches'][0]['question_id'], question.id)
+
+    def test_command_clusters_the_bank(self):
+        self.create([(self.STEM, self.OPTIONS), ('What is the derivative of x squared?', ['2x', 'x', '2'])])
+        self.create([(self.STEM.replace('serves', 'serves its'), self.OPTIONS), ('Name a prime number.', ['2', '4'])])
+        self.create([(self.STEM, list(reversed(self.OPTIONS)))])
+        # Questions stored before signatures were kept
+        Question.objects.update(minhash=None)
+        QuestionBand.objects.all().delete()
+
+        out = StringIO()
+        call_command('cluster_duplicates', '--reindex', '--batch-size', '2', stdout=out, stderr=StringIO())
+
+        [cluster] = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(
+            cluster['question_ids'],
+            list(Question.objects.filter(text__startswith='Which').order_by('id').values_list('id', flat=True)),
+        )
+        self.assertEqual(QuestionBand.objects.count(), 5 * 16)
+        self.assertFalse(Question.objects.filter(minhash=None).exists())
+
+
+class CountingGenerator(LocalGenerator):
+    calls = 0
+
+    def generate(self, topic, difficulty, count):
+        type(self).calls += 1
+        return super().generate(topic, difficulty, count)
+
+
+class BrokenGenerator(LocalGenerator):
+    name = 'broken'
+
+    def generate(self, topic, difficulty, count):
+        return [{'text': 'No options', 'options': [], 'correct_option': 0}] * count
+
+
+@override_settings(QUIZ_GENERATOR='myapp.tests.CountingGenerator')
+class GenerationTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        CountingGenerator.calls = 0
+
+    def request(self, user=None, course=None, **fields):
+        payload = {
+            'course_id': (course or self.course).id,
+            'title': 'Generated',
+            'topic': 'Python lists',
+            'difficulty': 'medium',
+            'num_questions': 3,
+            'duration_minutes': 20,
+            **fields,
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client_for(user or self.teacher).post(reverse('generate-quiz'), payload, format='json')
+        return response
+
+    def job(self, response, user=None):
+        return self.client_for(user or self.teacher).get(reverse('generation-job', args=[response.data['job_id']])).data
+
+    def test_generates_and_creates_the_quiz(self):
+        response = self.request()
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], 'queued')
+        job = self.job(response)
+        self.assertEqual((job['status'], job['cached'], job['error']), ('succeeded', False, None))
+        quiz = Quiz.objects.get(pk=job['quiz_id'])
+        self.assertEqual((quiz.title, quiz.course_id, quiz.created_by_id), ('Generated', self.course.id, self.teacher.id))
+        self.assertEqual(quiz.questions.count(), 3)
+        self.assertEqual(Option.objects.filter(question__quiz=quiz, is_correct=True).count(), 3)
+        self.assertEqual(QuestionBand.objects.filter(question__quiz=quiz).count(), 3 * 16)
+
+    def test_identical_requests_share_the_question_set(self):
+        other_teacher = User.objects.create_user(username='other-teacher', password='pw', role='teacher')
+        other_course = Course.objects.create(name='Other', code='OT101')
+        other_course.teachers.add(other_teacher)
+
+        first = self.job(self.request())
+        second = self.job(self.request(user=other_teacher, course=other_course, topic='  python   LISTS'), other_teacher)
+        harder = self.job(self.request(difficulty='hard'))
+
+        self.assertEqual(CountingGenerator.calls, 2)
+        self.assertTrue(second['cached'])
+        self.assertFalse(harder['cached'])
+        self.assertEqual(
+            list(Question.objects.filter(quiz_id=first['quiz_id']).order_by('id').values_list('text', flat=True)),
+            list(Question.objects.filter(quiz_id=second['quiz_id']).order_by('id').values_list('text', flat=True)),
+        )
+        self.assertEqual(Quiz.objects.get(pk=second['quiz_id']).course_id, other_course.id)
+
+    @override_settings(QUIZ_GENERATOR='myapp.tests.BrokenGenerator')
+    def test_invalid_output_fails_the_job(self):
+        with self.assertLogs('myapp.generation', 'ERROR'):
+            response = self.request()
+        job = self.job(response)
+
+        self.assertEqual(job['status'], 'failed')
+        self.assertEqual(job['error'], 'Invalid question or options format.')
+        self.assertIsNone(job['quiz_id'])
+        self.assertFalse(Quiz.objects.exists())
+        self.assertFalse(GeneratedQuestionSet.objects.exists())
+
+    def test_rejects_invalid_requests(self):
+        other_course = Course.objects.create(name='Other', code='OT101')
+
+        self.assertEqual(self.request(difficulty='impossible').status_code, 400)
+        self.assertEqual(self.request(num_questions=51).status_code, 400)
+        self.assertEqual(self.request(topic=' ').status_code, 400)
+        self.assertEqual(self.request(course=other_course).status_code, 403)
+        self.assertEqual(self.request(user=self.student).status_code, 403)
+        self.assertFalse(GenerationJob.objects.exists())
+
+        response = self.request()
+        self.assertEqual(
+            self.client_for(self.student).get(reverse('generation-job', args=[response.data['job_id']])).status_code,
+            404,
+        )
+
+    def test_command_runs_queued_jobs(self):
+        response = self.client_for(self.teacher).post(reverse('generate-quiz'), {
+            'course_id': self.course.id, 'title': 'Left behind', 'topic': 'Sets', 'difficulty': 'easy',
+            'num_questions': 2, 'duration_minutes': 10,
+        }, format='json')
+        GenerationJob.objects.create(
+            created_by=self.teacher, course=self.course, title='Stuck', topic='sets', difficulty='easy',
+            num_questions=2, duration_minutes=10, status='running',
+        )
+
+        call_command('process_generation_jobs', '--once', '--requeue', stdout=StringIO())
+
+        self.assertEqual(self.job(response)['status'], 'succeeded')
+        self.assertEqual(GenerationJob.objects.filter(status='succeeded', cached=True).count(), 1)
+        self.assertEqual(CountingGenerator.calls, 1)
+
+
+class CourseQuizListTests(QuizTestCase):
+    def list_quizzes(self, params):
+        return self.client_for(self.student).get(reverse('quizzes_for_course', args=[self.course.code]), params)
+
+    def test_summary_reports_counts_and_attempt_status(self):
+        done = make_quiz(self.course, self.teacher, 3, title='Done')
+        make_quiz(self.course, self.teacher, 2, title='Open')
+        QuizAttempt.objects.create(student=self.student, quiz=done, completed=True, score=50.0)
+
+        response = self.list_quizzes({'view': 'summary'})
+
+        self.assertEqual(response.status_code, 200)
+        rows = {row['title']: row for row in response.data['results']}
+        self.assertEqual(rows['Done']['question_count'], 3)
+        self.assertEqual(rows['Done']['attempt_status'], 'completed')
+        self.assertEqual(rows['Done']['score'], 50.0)
+        self.assertEqual(rows['Open']['attempt_status'], 'not_started')
+        self.assertFalse(rows['Open']['completed'])
+        self.assertNotIn('questions', rows['Open'])
+
+    def test_query_count_is_independent_of_quiz_count(self):
+        for n in range(6):
+            make_quiz(self.course, self.teacher, 3, title=f'Quiz {n}')
+
+        for view in ('summary', 'detail'):
+            with self.assertNumQueries(2 if view == 'summary' else 4):
+                response = self.list_quizzes({'view': view})
+            self.assertEqual(len(response.data['results']), 6)
+        self.assertEqual(len(response.data['results'][0]['questions'][0]['options']), 4)
+
+    def test_cursor_pagination(self):
+        for n in range(3):
+            make_quiz(self.course, self.teacher, 1, title=f'Quiz {n}')
+
+        first = self.list_quizzes({'view': 'summary', 'page_size': 2})
+        second = self.client_for(self.student).get(first.data['next'])
+
+        self.assertEqual(len(first.data['results']), 2)
+        self.assertEqual(len(second.data['results']), 1)
+        self.assertIsNone(second.data['next'])
+
+    def test_drafts_are_hidden_from_students(self):
+        make_quiz(self.course, self.teacher, 1, title='Live')
+        Quiz.objects.filter(pk=make_quiz(self.course, self.teacher, 1, title='Draft').pk).update(is_published=False)
+
+        student = self.list_quizzes({'view': 'summary'})
+        teacher = self.client_for(self.teacher).get(
+            reverse('quizzes_for_course', args=[self.course.code]), {'view': 'summary'}
+        )
+
+        self.assertEqual([row['title'] for row in student.data['results']], ['Live'])
+        self.assertEqual(len(teacher.data['results']), 2)
+
+
+class TakeQuizTests(QuizTestCase):
+    def take(self, quiz, headers=None):
+        return self.client_for(self.student).get(reverse('take-quiz', args=[quiz.id]), headers=headers)
+
+    def test_serves_cached_payload_with_etag(self):
+        quiz = make_quiz(self.course, self.teacher, 3)
+
+        first = self.take(quiz)
+        self.assertEqual(first.status_code, 200)
+        body = json.loads(first.content)
+        self.assertEqual(len(body['questions']), 3)
+        self.assertNotIn('is_correct', body['questions'][0]['options'][0])
+
+        # Quiz lookup and the completed check; the body comes from the cache
+        with self.assertNumQueries(2):
+            second = self.take(quiz, headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(second['Content-Encoding'], 'gzip')
+        self.assertEqual(second['ETag'], first['ETag'])
+
+        not_modified = self.take(quiz, headers={'If-None-Match': first['ETag']})
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_option_edit_changes_etag(self):
+        quiz = make_quiz(self.course, self.teacher, 1)
+        etag = self.take(quiz)['ETag']
+
+        option = Option.objects.filter(question__quiz=quiz).first()
+        option.text = 'Edited'
+        option.save()
+
+        response = self.take(quiz, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Edited', response.content)
+
+    def test_completed_attempt_is_rejected(self):
+        quiz = make_quiz(self.course, self.teacher, 1)
+        QuizAttempt.objects.create(student=self.student, quiz=quiz, completed=True, score=0)
+
+        self.assertEqual(self.take(quiz).status_code, 400)
+
+
+class AutosaveTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        self.quiz = make_quiz(self.course, self.teacher, 3)
+        self.right = answers_for(self.quiz)
+        self.wrong = answers_for(self.quiz, correct=False)
+        self.client = self.client_for(self.student)
+
+    def autosave(self, *answers):
+        return self.client.post(reverse('quiz-answers', args=[self.quiz.id]), {'answers': list(answers)}, format='json')
+
+    def saved(self):
+        return dict(StudentAnswer.objects.filter(attempt__quiz=self.quiz).values_list('question_id', 'selected_option_id'))
+
+    def test_saves_are_coalesced_into_one_upsert(self):
+        for answer in [self.wrong[0], self.right[0], self.wrong[1], self.right[1]]:
+            self.assertEqual(self.autosave(answer).status_code, 202)
+        self.assertEqual(self.saved(), {})
+
+        with self.assertNumQueries(4):
+            self.assertEqual(autosaves.flush(), 2)
+        self.assertEqual(self.saved(), {a['question_id']: a['selected_option_id'] for a in self.right[:2]})
+
+        self.autosave(self.wrong[1])
+        autosaves.flush()
+        self.assertEqual(self.saved()[self.wrong[1]['question_id']], self.wrong[1]['selected_option_id'])
+        self.assertEqual(StudentAnswer.objects.filter(attempt__quiz=self.quiz).count(), 2)
+
+    def test_a_full_buffer_flushes_at_once(self):
+        with self.settings(AUTOSAVE_MAX_PENDING=2):
+            self.autosave(self.right[0])
+            self.assertEqual(self.saved(), {})
+            self.autosave(self.right[1])
+        self.assertEqual(len(self.saved()), 2)
+
+    def test_resume_reads_flushed_and_buffered_answers(self):
+        self.autosave(self.right[0])
+        autosaves.flush()
+        self.autosave(self.wrong[1])
+
+        response = self.client.get(reverse('quiz-answers', args=[self.quiz.id]))
+
+        self.assertFalse(response.data['completed'])
+        self.assertEqual(response.data['answers'], sorted([self.right[0], self.wrong[1]], key=lambda a: a['question_id']))
+
+    def test_submission_merges_saved_answers(self):
+        self.autosave(self.right[0], self.right[1])
+        autosaves.flush()
+        self.autosave(self.right[2])
+
+        # The submitted answer replaces the saved one for the same question
+        response = self.client.post(
+            reverse('submit-quiz'), {'quiz_id': self.quiz.id, 'answers': [self.wrong[1]]}, format='json'
+        )
+
+        self.assertEqual(response.data['score'], round(2 / 3 * 100, 2))
+        self.assertEqual(StudentAnswer.objects.filter(attempt__quiz=self.quiz, is_correct=True).count(), 2)
+        self.assertEqual(autosaves.peek(QuizAttempt.objects.get(quiz=self.quiz).id), {})
+
+    def test_answers_being_flushed_stay_visible(self):
+        self.autosave(self.right[0])
+        attempt = QuizAttempt.objects.get(quiz=self.quiz)
+        seen = []
+
+        def during_flush(execute, sql, params, many, context):
+            if sql.startswith('INSERT INTO "myapp_studentanswer"'):
+                seen.append(autosaves.peek(attempt.id))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(during_flush):
+            autosaves.flush()
+
+        self.assertEqual(seen, [{self.right[0]['question_id']: self.right[0]['selected_option_id']}])
+        self.assertEqual(autosaves.peek(attempt.id), {})
+
+    def test_no_saves_after_submission(self):
+        self.autosave(self.right[0])
+        attempt = QuizAttempt.objects.get(quiz=self.quiz)
+        autosaves.save(attempt.id, {self.right[1]['question_id']: self.right[1]['selected_option_id']})
+        submit_attempt(self.student, self.quiz, self.right)
+        # A buffer in another process flushing late leaves the graded answers alone
+        autosaves.save(attempt.id, {self.wrong[2]['question_id']: self.wrong[2]['selected_option_id']})
+        self.assertEqual(autosaves.flush(), 0)
+
+        self.assertEqual(self.autosave(self.wrong[0]).status_code, 403)
+        self.assertEqual(StudentAnswer.objects.filter(attempt=attempt, is_correct=True).count(), 3)
+
+    def test_rejects_foreign_options_and_hides_the_review(self):
+        other = make_quiz(self.course, self.teacher, 1)
+        self.assertEqual(self.autosave(answers_for(other)[0]).status_code, 400)
+
+        self.autosave(self.right[0])
+        self.assertEqual(self.client.get(reverse('view-score', args=[self.quiz.id])).status_code, 400)
+
+
+class DeadlineTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        self.quiz = make_quiz(self.course, self.teacher, 3)
+        self.right = answers_for(self.quiz)
+        self.wrong = answers_for(self.quiz, correct=False)
+        self.client = self.client_for(self.student)
+
+    def start(self, student=None):
+        response = self.client_for(student or self.student).get(reverse('take-quiz', args=[self.quiz.id]))
+        self.assertEqual(response.status_code, 200)
+        return QuizAttempt.objects.get(quiz=self.quiz, student=student or self.student)
+
+    def run_out(self, *attempts, seconds=60):
+        QuizAttempt.objects.filter(pk__in=[a.pk for a in attempts]).update(
+            deadline=timezone.now() - timedelta(seconds=seconds)
+        )
+
+    def test_opening_the_quiz_starts_the_clock(self):
+        attempt = self.start()
+        self.assertAlmostEqual(attempt.deadline, attempt.start_time + timedelta(minutes=30), delta=timedelta(seconds=1))
+
+        # A quiz closing first cuts the attempt short
+        Quiz.objects.filter(pk=self.quiz.pk).update(end_time=timezone.now() + timedelta(minutes=5))
+        other = User.objects.create_user(username='late', password='pw', role='student')
+        self.course.students.add(other)
+        self.assertEqual(self.start(other).deadline, Quiz.objects.get(pk=self.quiz.pk).end_time)
+
+    def test_late_answers_and_submissions_are_refused(self):
+        attempt = self.start()
+        self.run_out(attempt, seconds=5)
+        # Still within the grace period
+        self.assertEqual(self.client.post(
+            reverse('quiz-answers', args=[self.quiz.id]), {'answers': self.right[:1]}, format='json'
+        ).status_code, 202)
+
+        self.run_out(attempt)
+        self.assertEqual(self.client.post(
+            reverse('quiz-answers', args=[self.quiz.id]), {'answers': self.right[1:]}, format='json'
+        ).status_code, 403)
+        self.assertEqual(self.client.post(
+            reverse('submit-quiz'), {'quiz_id': self.quiz.id, 'answers': self.right}, format='json'
+        ).status_code, 403)
+        self.assertEqual(self.client.get(reverse('take-quiz', args=[self.quiz.id])).status_code, 403)
+
+    def test_sweep_grades_saved_answers_in_bulk(self):
+        students = [self.student]
+        for n in range(4):
+            student = User.objects.create_user(username=f'timed{n}', password='pw', role='student')
+            self.course.students.add(student)
+            students.append(student)
+        attempts = [self.start(student) for student in students]
+        for attempt in attempts[:3]:
+            autosaves.save(attempt.id, {a['question_id']: a['selected_option_id'] for a in self.right[:2] + self.wrong[2:]})
+        autosaves.flush()
+        self.run_out(*attempts[:4])
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(expire_attempts(), 4)
+        # One histogram upsert per distinct score; the rest is per batch
+        self.assertLessEqual(len(ctx.captured_queries), 14)
+        self.assertEqual(full_scans(ctx.captured_queries), [])
+
+        scores = dict(QuizAttempt.objects.filter(quiz=self.quiz, completed=True).values_list('student_id', 'score'))
+        self.assertEqual(scores, {
+            **{s.id: round(2 / 3 * 100, 2) for s in students[:3]}, students[3].id: 0.0,
+        })
+        self.assertEqual(StudentAnswer.objects.filter(attempt__quiz=self.quiz, is_correct=True).count(), 6)
+        self.assertEqual(AttemptReview.objects.filter(attempt__quiz=self.quiz).count(), 4)
+        self.assertEqual(
+            dict(QuizScoreBucket.objects.filter(quiz=self.quiz).values_list('score', 'count')),
+            {round(2 / 3 * 100, 2): 3, 0.0: 1},
+        )
+        # The attempt still running is left alone, and nothing is graded twice
+        self.assertFalse(QuizAttempt.objects.get(pk=attempts[4].pk).completed)
+        self.assertEqual(expire_attempts(), 0)
+
+        review = self.client.get(reverse('view-score', args=[self.quiz.id]))
+        self.assertEqual(review.status_code, 200)
+
+    def test_sweep_rounds_scores_as_at_submission(self):
+        quiz = make_quiz(self.course, self.teacher, 32, title='Long')
+        attempt = QuizAttempt.objects.create(
+            student=self.student, quiz=quiz, deadline=timezone.now() - timedelta(minutes=5),
+        )
+        right, wrong = answers_for(quiz), answers_for(quiz, correct=False)
+        StudentAnswer.objects.bulk_create([
+            StudentAnswer(attempt=attempt, question_id=a['question_id'], selected_option_id=a['selected_option_id'])
+            for a in right[:1] + wrong[1:]
+        ])
+
+        self.assertEqual(expire_attempts(), 1)
+
+        self.assertEqual(QuizAttempt.objects.get(pk=attempt.pk).score, 3.12)
+        self.assertEqual(QuizScoreBucket.objects.get(quiz=quiz).score, 3.12)
+
+    def test_sweep_reads_the_partial_index(self):
+        sql, params = QuizAttempt.objects.filter(
+            completed=False, deadline__lt=timezone.now()
+        ).order_by('deadline').values('id').query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        self.assertIn('attempt_open_deadline', plan)
+
+    def test_command_sweeps_in_batches(self):
+        attempts = []
+        for n in range(3):
+            student = User.objects.create_user(username=f'swept{n}', password='pw', role='student')
+            self.course.students.add(student)
+            attempts.append(self.start(student))
+        self.run_out(*attempts)
+
+        out = StringIO()
+        call_command('expire_attempts', '--once', '--batch-size', '2', stdout=out)
+
+        self.assertEqual(QuizAttempt.objects.filter(quiz=self.quiz, completed=True).count(), 3)
+        self.assertIn('Finalized 2', out.getvalue())
+        self.assertIn('Finalized 1', out.getvalue())
+
+
+class QuestionPoolTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        self.quiz = make_quiz(self.course, self.teacher, 6)
+        Quiz.objects.filter(pk=self.quiz.pk).update(questions_per_attempt=3, shuffle=True)
+        self.quiz.refresh_from_db()
+        self.others = []
+        for n in range(5):
+            other = User.objects.create_user(username=f'pooled{n}', password='pw', role='student')
+            self.course.students.add(other)
+            self.others.append(other)
+
+    def take(self, student):
+        response = self.client_for(student).get(reverse('take-quiz', args=[self.quiz.id]))
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def layout(self, questions, question_key='id', option_key='id'):
+        return [(q[question_key], [o[option_key] for o in q['options']]) for q in questions]
+
+    def test_each_student_gets_a_stable_draw(self):
+        first = self.take(self.student)
+        self.assertEqual(first.content, self.take(self.student).content)
+        self.assertEqual(first['ETag'], self.take(self.student)['ETag'])
+
+        layouts = [self.layout(json.loads(self.take(s).content)['questions']) for s in [self.student, *self.others]]
+        pool = set(self.quiz.questions.values_list('id', flat=True))
+        for layout in layouts:
+            self.assertEqual(len(layout), 3)
+            self.assertLessEqual({question_id for question_id, _ in layout}, pool)
+        self.assertGreater(len({tuple(question_id for question_id, _ in layout) for layout in layouts}), 1)
+        self.assertGreater(len({tuple(tuple(options) for _, options in layout) for layout in layouts}), 1)
+
+    def test_grading_and_review_follow_the_draw(self):
+        shown = self.layout(json.loads(self.take(self.student).content)['questions'])
+
+        # Answers to questions the student was not dealt are ignored
+        response = self.client_for(self.student).post(
+            reverse('submit-quiz'), {'quiz_id': self.quiz.id, 'answers': answers_for(self.quiz)}, format='json'
+        )
+        self.assertEqual(response.data['score'], 100.0)
+        self.assertEqual(
+            set(StudentAnswer.objects.filter(attempt__quiz=self.quiz).values_list('question_id', flat=True)),
+            {question_id for question_id, _ in shown},
+        )
+
+        review = self.client_for(self.student).get(reverse('view-score', args=[self.quiz.id]))
+        questions = json.loads(review.content)['questions']
+        self.assertEqual(self.layout(questions, 'question_id', 'option_id'), shown)
+
+    def test_create_quiz_validates_the_pool(self):
+        client = self.client_for(self.teacher)
+        payload = {**quiz_payload(self.course, 4), 'questions_per_attempt': 2, 'shuffle': True}
+        response = client.post(reverse('create_quiz'), payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        quiz = Quiz.objects.get(pk=response.data['quiz_id'])
+        self.assertEqual((quiz.questions_per_attempt, quiz.shuffle), (2, True))
+
+        payload['questions_per_attempt'] = 5
+        self.assertEqual(client.post(reverse('create_quiz'), payload, format='json').status_code, 400)
+
+
+class ViewScoreTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        self.quiz = make_quiz(self.course, self.teacher, 3)
+        answers = answers_for(self.quiz)
+        answers[1] = answers_for(self.quiz, correct=False)[1]
+        self.client_for(self.student).post(
+            reverse('submit-quiz'), {'quiz_id': self.quiz.id, 'answers': answers}, format='json'
+        )
+
+    def view_score(self):
+        return self.client_for(self.student).get(reverse('view-score', args=[self.quiz.id]))
+
+    def test_review_is_a_single_row_read(self):
+        with self.assertNumQueries(1):
+            response = self.view_score()
+
+        review = json.loads(response.content)
+        self.assertEqual(review['score'], 66.67)
+        self.assertTrue(review['completed'])
+        self.assertEqual([q['is_correct'] for q in review['questions']], [True, False, True])
+        first = review['questions'][0]
+        self.assertEqual(len(first['options']), 4)
+        self.assertEqual(
+            first['selected_option_id'],
+            next(o['option_id'] for o in first['options'] if o['is_correct']),
+        )
+
+    def test_question_edit_rebuilds_review(self):
+        question = self.quiz.questions.order_by('id').first()
+        question.text = 'Reworded'
+        question.save()
+
+        self.assertEqual(json.loads(self.view_score().content)['questions'][0]['question_text'], 'Reworded')
+        with self.assertNumQueries(1):
+            self.view_score()
+
+    def test_rebuild_command(self):
+        AttemptReview.objects.all().delete()
+
+        call_command('rebuild_reviews', stdout=StringIO())
+
+        self.assertEqual(AttemptReview.objects.count(), 1)
+
+
+class ItemAnalysisTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        self.quiz = make_quiz(self.course, self.teacher, 3)
+        right = answers_for(self.quiz)
+        wrong = answers_for(self.quiz, correct=False)
+        for n, pattern in enumerate(['111', '110', '100', '000']):
+            student = User.objects.create_user(username=f'ia{n}', password='pw', role='student')
+            answers = [right[i] if flag == '1' else wrong[i] for i, flag in enumerate(pattern)]
+            submit_attempt(student, self.quiz, answers)
+
+    def report(self):
+        return self.client_for(self.teacher).get(reverse('item-analysis', args=[self.quiz.id]))
+
+    def test_statistics(self):
+        response = self.report()
+
+        self.assertEqual(response.status_code, 200)
+        report = response.data
+        self.assertEqual(report['attempts'], 4)
+        self.assertEqual(report['kr20'], 0.75)
+        self.assertEqual([q['difficulty'] for q in report['questions']], [0.75, 0.5, 0.25])
+        self.assertAlmostEqual(report['questions'][0]['discrimination'], 0.5222, places=4)
+        first_options = report['questions'][0]['options']
+        self.assertEqual([o['count'] for o in first_options], [3, 1, 0, 0])
+        self.assertEqual(first_options[0]['share'], 0.75)
+
+    def test_report_is_cached_until_an_attempt_completes(self):
+        self.report()
+        with self.assertNumQueries(1):
+            self.report()
+
+        student = User.objects.create_user(username='late', password='pw', role='student')
+        with self.captureOnCommitCallbacks(execute=True):
+            submit_attempt(student, self.quiz, answers_for(self.quiz))
+
+        self.assertEqual(self.report().data['attempts'], 5)
+
+    def test_only_course_teachers(self):
+        outsider = User.objects.create_user(username='outsider', password='pw', role='teacher')
+        response = self.client_for(outsider).get(reverse('item-analysis', args=[self.quiz.id]))
+        self.assertEqual(response.status_code, 404)
+        response = self.client_for(self.student).get(reverse('item-analysis', args=[self.quiz.id]))
+        self.assertEqual(response.status_code, 403)
+
+
+class RegradeTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        self.quiz = make_quiz(self.course, self.teacher, 2)
+        self.first, self.second = self.quiz.questions.order_by('id')
+        self.fixed = self.second.options.order_by('id')[1]
+        right = answers_for(self.quiz)
+        wrong = answers_for(self.quiz, correct=False)
+        self.attempts = {}
+        # 'right' was right before the correction; the second question's
+        # wrong answer is the option it corrects to
+        for name, answers in [('all', right), ('none', wrong), ('half', [right[0], wrong[1]])]:
+            student = User.objects.create_user(username=name, password='pw', role='student')
+            self.course.students.add(student)
+            self.attempts[name] = submit_attempt(student, self.quiz, answers)
+
+    def correct(self, corrections, user=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client_for(user or self.teacher).post(
+                reverse('answer-key', args=[self.quiz.id]), {'corrections': corrections}, format='json',
+            )
+
+    def scores(self):
+        return {
+            name: QuizAttempt.objects.get(pk=attempt.pk).score for name, attempt in self.attempts.items()
+        }
+
+    @override_settings(REGRADE_CHUNK_SIZE=2)
+    def test_regrades_answers_scores_and_reviews(self):
+        self.assertEqual(self.scores(), {'all': 100.0, 'none': 0.0, 'half': 50.0})
+
+        response = self.correct([{'question_id': self.second.id, 'correct_option_id': self.fixed.id}])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {k: response.data[k] for k in ('questions_corrected', 'attempts_regraded', 'scores_changed', 'raised', 'lowered')},
+            {'questions_corrected': 1, 'attempts_regraded': 3, 'scores_changed': 3, 'raised': 2, 'lowered': 1},
+        )
+        self.assertEqual(self.scores(), {'all': 50.0, 'none': 50.0, 'half': 100.0})
+        self.assertEqual(list(self.second.options.filter(is_correct=True)), [self.fixed])
+        self.assertFalse(StudentAnswer.objects.filter(question=self.second, selected_option=self.fixed, is_correct=False).exists())
+        self.assertEqual(
+            dict(QuizScoreBucket.objects.filter(quiz=self.quiz, count__gt=0).values_list('score', 'count')),
+            {50.0: 2, 100.0: 1},
+        )
+        review = self.client_for(self.attempts['half'].student).get(reverse('view-score', args=[self.quiz.id]))
+        review = json.loads(review.content)
+        self.assertEqual(review['score'], 100.0)
+        self.assertTrue(all(question['is_correct'] for question in review['questions']))
+
+        # Later submissions are graded with the new key
+        late = User.objects.create_user(username='late', password='pw', role='student')
+        self.assertEqual(submit_attempt(late, self.quiz, answers_for(self.quiz)).score, 100.0)
+
+    def test_derived_data_follows_the_new_key(self):
+        student = self.attempts['half'].student
+        self.client_for(self.teacher).get(reverse('item-analysis', args=[self.quiz.id]))
+        self.client_for(student).get(reverse('student_dashboard'))
+
+        self.correct([{'question_id': self.second.id, 'correct_option_id': self.fixed.id}])
+
+        analysis = self.client_for(self.teacher).get(reverse('item-analysis', args=[self.quiz.id])).data
+        self.assertEqual([q['difficulty'] for q in analysis['questions']], [round(2 / 3, 4), round(2 / 3, 4)])
+        [quiz] = self.client_for(student).get(reverse('student_dashboard')).data['courses'][0]['quizzes']
+        self.assertEqual(quiz['score'], 100.0)
+        leaders = self.client_for(student).get(reverse('quiz-leaderboard', args=[self.quiz.id])).data['top']
+        self.assertEqual(leaders[0]['username'], 'half')
+
+    def test_other_processes_reload_the_corrected_key(self):
+        # Another process's cache, which the local invalidation never reaches
+        other = AnswerKeyCache(maxsize=2)
+        other.get(self.quiz.id)
+
+        self.correct([{'question_id': self.second.id, 'correct_option_id': self.fixed.id}])
+
+        self.assertEqual(other.get(self.quiz.id)[self.second.id][0], self.fixed.id)
+
+    def test_scores_round_as_at_submission(self):
+        quiz = make_quiz(self.course, self.teacher, 32, title='Long')
+        right, wrong = answers_for(quiz), answers_for(quiz, correct=False)
+        for name, correct in [('one', 1), ('five', 5)]:
+            student = User.objects.create_user(username=f'long-{name}', password='pw', role='student')
+            submit_attempt(student, quiz, right[:correct] + wrong[correct:])
+        scores = set(QuizAttempt.objects.filter(quiz=quiz).values_list('score', flat=True))
+        self.assertEqual(scores, {3.12, 15.62})
+        last = quiz.questions.order_by('id').last()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client_for(self.teacher).post(
+                reverse('answer-key', args=[quiz.id]),
+                {'corrections': [{'question_id': last.id, 'correct_option_id': last.options.order_by('id')[3].id}]},
+                format='json',
+            )
+
+        self.assertEqual((response.data['attempts_regraded'], response.data['scores_changed']), (2, 0))
+        self.assertEqual(set(QuizAttempt.objects.filter(quiz=quiz).values_list('score', flat=True)), scores)
+        self.assertEqual(
+            dict(QuizScoreBucket.objects.filter(quiz=quiz, count__gt=0).values_list('score', 'count')),
+            {3.12: 1, 15.62: 1},
+        )
+
+    def test_unchanged_key_regrades_nothing(self):
+        current = self.second.options.get(is_correct=True)
+
+        response = self.correct([{'question_id': self.second.id, 'correct_option_id': current.id}])
+
+        self.assertEqual((response.data['questions_corrected'], response.data['attempts_regraded']), (0, 0))
+        self.assertEqual(self.scores(), {'all': 100.0, 'none': 0.0, 'half': 50.0})
+
+    def test_rejects_invalid_corrections(self):
+        other = self.first.options.order_by('id')[1]
+        self.assertEqual(self.correct([{'question_id': self.second.id, 'correct_option_id': other.id}]).status_code, 400)
+        self.assertEqual(self.correct([{'question_id': self.second.id}]).status_code, 400)
+        self.assertEqual(self.correct([]).status_code, 400)
+
+        outsider = User.objects.create_user(username='outsider', password='pw', role='teacher')
+        correction = [{'question_id': self.second.id, 'correct_option_id': self.fixed.id}]
+        self.assertEqual(self.correct(correction, user=outsider).status_code, 404)
+        self.assertEqual(self.correct(correction, user=self.student).status_code, 403)
+        self.assertEqual(self.scores(), {'all': 100.0, 'none': 0.0, 'half': 50.0})
+
+
+class GradebookTests(QuizTestCase):
+    def test_streams_pivoted_scores(self):
+        first = make_quiz(self.course, self.teacher, 2, title='First')
+        second = make_quiz(self.course, self.teacher, 2, title='Second')
+        other = User.objects.create_user(username='other', password='pw', role='student')
+        dropped = User.objects.create_user(username='dropped', password='pw', role='student')
+        self.course.students.add(other)
+        submit_attempt(self.student, first, answers_for(first))
+        submit_attempt(self.student, second, answers_for(second, correct=False))
+        submit_attempt(other, second, answers_for(second))
+        submit_attempt(dropped, first, answers_for(first))
+
+        response = self.client_for(self.teacher).get(reverse('export-gradebook', args=[self.course.code]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines, [
+            'student_id,username,email,First,Second',
+            f'{self.student.id},student,,100.0,0.0',
+            f'{other.id},other,,,100.0',
+        ])
+
+        out = StringIO()
+        call_command('export_gradebook', self.course.code, stdout=out)
+        self.assertEqual(out.getvalue().splitlines(), lines)
+
+    def test_skips_quizzes_created_after_the_header(self):
+        first = make_quiz(self.course, self.teacher, 2, title='First')
+        submit_attempt(self.student, first, answers_for(first))
+        rows = gradebook_rows(self.course)
+        header = next(rows)
+
+        late = make_quiz(self.course, self.teacher, 2, title='Late')
+        submit_attempt(self.student, late, answers_for(late))
+
+        self.assertEqual(header, 'student_id,username,email,First\r\n')
+        self.assertEqual(list(rows), [f'{self.student.id},student,,100.0\r\n'])
+
+    def test_no_query_sorts_the_attempts(self):
+        quiz = make_quiz(self.course, self.teacher, 2)
+        for n in range(5):
+            student = User.objects.create_user(username=f'graded{n}', password='pw', role='student')
+            self.course.students.add(student)
+            submit_attempt(student, quiz, answers_for(quiz))
+
+        with CaptureQueriesContext(connection) as ctx:
+            rows = list(gradebook_rows(self.course, chunk_size=2))
+
+        self.assertEqual(len(rows), 1 + 6)
+        # The quiz columns, the students, then one attempts query per chunk
+        self.assertEqual(len(ctx.captured_queries), 2 + 3)
+        with connection.cursor() as cursor:
+            for query in ctx.captured_queries:
+                cursor.execute('EXPLAIN QUERY PLAN ' + query['sql'])
+                plan = ' '.join(row[-1] for row in cursor.fetchall())
+                self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', plan, query['sql'])
+
+    def test_students_cannot_export(self):
+        response = self.client_for(self.student).get(reverse('export-gradebook', args=[self.course.code]))
+        self.assertEqual(response.status_code, 403)
+
+
+class LeaderboardTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        self.quiz = make_quiz(self.course, self.teacher, 4)
+        right = answers_for(self.quiz)
+        wrong = answers_for(self.quiz, correct=False)
+        self.students = {}
+        for name, correct in [('a', 4), ('b', 3), ('c', 3), ('d', 1)]:
+            student = User.objects.create_user(username=name, password='pw', role='student')
+            self.course.students.add(student)
+            submit_attempt(student, self.quiz, right[:correct] + wrong[correct:])
+            self.students[name] = student
+
+    def test_top_n_uses_competition_ranking(self):
+        response = self.client_for(self.teacher).get(reverse('quiz-leaderboard', args=[self.quiz.id]), {'limit': 3})
+
+        self.assertEqual(
+            [(row['username'], row['rank'], row['score']) for row in response.data['top']],
+            [('a', 1, 100.0), ('b', 2, 75.0), ('c', 2, 75.0)],
+        )
+
+    def test_percentile_reads_the_histogram(self):
+        client = self.client_for(self.students['b'])
+        with self.assertNumQueries(2):
+            response = client.get(reverse('quiz-percentile', args=[self.quiz.id]))
+
+        self.assertEqual(response.data['rank'], 2)
+        self.assertEqual(response.data['total'], 4)
+        self.assertEqual(response.data['percentile'], 50.0)
+
+    def test_rebuild_matches_incremental_histogram(self):
+        incremental = sorted(QuizScoreBucket.objects.values_list('score', 'count'))
+        QuizScoreBucket.objects.update(count=0)
+
+        call_command('rebuild_leaderboards', stdout=StringIO())
+
+        self.assertEqual(sorted(QuizScoreBucket.objects.values_list('score', 'count')), incremental)
+        self.assertEqual(incremental, [(25.0, 1), (75.0, 2), (100.0, 1)])
+
+    def test_outsiders_cannot_view(self):
+        outsider = User.objects.create_user(username='outsider', password='pw', role='student')
+        response = self.client_for(outsider).get(reverse('quiz-leaderboard', args=[self.quiz.id]))
+        self.assertEqual(response.status_code, 404)
+
+
+class DashboardTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        now = timezone.now()
+        self.done = make_quiz(self.course, self.teacher, 2, title='Done')
+        self.open = make_quiz(self.course, self.teacher, 2, title='Open')
+        self.later = make_quiz(self.course, self.teacher, 2, title='Later')
+        Quiz.objects.filter(pk=self.later.pk).update(start_time=now + timedelta(days=1), end_time=now + timedelta(days=2))
+        Quiz.objects.filter(pk=self.done.pk).update(end_time=now - timedelta(minutes=1))
+        self.draft = make_quiz(self.course, self.teacher, 2, title='Draft')
+        Quiz.objects.filter(pk=self.draft.pk).update(is_published=False)
+        submit_attempt(self.student, self.done, answers_for(self.done))
+        other = Course.objects.create(name='Go', code='GO101')
+        other.teachers.add(self.teacher)
+        other.students.add(self.student)
+        self.student = User.objects.get(pk=self.student.pk)
+
+    def dashboard(self):
+        return self.client_for(self.student).get(reverse('student_dashboard'))
+
+    def test_courses_quizzes_and_attempts_in_one_response(self):
+        with self.assertNumQueries(4):
+            response = self.dashboard()
+
+        self.assertEqual(response.status_code, 200)
+        courses = {course['code']: course for course in response.data['courses']}
+        self.assertEqual(set(courses), {'PY101', 'GO101'})
+        self.assertEqual([t['username'] for t in courses['PY101']['teachers']], ['teacher'])
+        quizzes = {quiz['title']: quiz for quiz in courses['PY101']['quizzes']}
+        self.assertEqual(set(quizzes), {'Done', 'Open', 'Later'})
+        self.assertEqual(
+            (quizzes['Done']['state'], quizzes['Done']['attempt_status'], quizzes['Done']['score']),
+            ('closed', 'completed', 100.0),
+        )
+        self.assertEqual((quizzes['Open']['state'], quizzes['Open']['attempt_status']), ('open', 'not_started'))
+        self.assertEqual(quizzes['Later']['state'], 'upcoming')
+        self.assertEqual(courses['GO101']['quizzes'], [])
+
+    def test_cached_until_something_changes(self):
+        self.dashboard()
+        with self.assertNumQueries(0):
+            self.dashboard()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            submit_attempt(self.student, self.open, answers_for(self.open, correct=False))
+        quizzes = {quiz['title']: quiz for quiz in self.dashboard().data['courses'][1]['quizzes']}
+        self.assertEqual((quizzes['Open']['attempt_status'], quizzes['Open']['score']), ('completed', 0.0))
+
+        Quiz.objects.filter(pk=self.draft.pk).update(is_published=True)
+        Quiz.objects.get(pk=self.draft.pk).save()
+        self.assertIn('Draft', [q['title'] for q in self.dashboard().data['courses'][1]['quizzes']])
+
+        helper = User.objects.create_user(username='helper', password='pw', role='teacher')
+        self.course.teachers.add(helper)
+        teachers = [t['username'] for t in self.dashboard().data['courses'][1]['teachers']]
+        self.assertEqual(sorted(teachers), ['helper', 'teacher'])
+
+        Course.objects.get(code='GO101').students.remove(self.student)
+        self.student = User.objects.get(pk=self.student.pk)
+        self.assertEqual([c['code'] for c in self.dashboard().data['courses']], ['PY101'])
+
+    def test_students_only(self):
+        response = self.client_for(self.teacher).get(reverse('student_dashboard'))
+        self.assertEqual(response.status_code, 403)
+
+
+@override_settings(MONITOR_TICK_SECONDS=0.01, MONITOR_RESYNC_SECONDS=60)
+class MonitorTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        self.quiz = make_quiz(self.course, self.teacher, 2)
+        self.students = []
+        for n in range(3):
+            student = User.objects.create_user(username=f'watched{n}', password='pw', role='student')
+            self.course.students.add(student)
+            self.students.append(student)
+
+    def token(self, user):
+        return str(MembershipTokenObtainPairSerializer.get_token(User.objects.get(pk=user.pk)).access_token)
+
+    def submit(self, student, correct=True):
+        with self.captureOnCommitCallbacks(execute=True):
+            submit_attempt(student, self.quiz, answers_for(self.quiz, correct=correct))
+
+    def test_snapshot_for_the_quiz_teachers(self):
+        self.submit(self.students[0])
+        self.submit(self.students[1], correct=False)
+        QuizAttempt.objects.create(student=self.students[2], quiz=self.quiz)
+        url = reverse('quiz-monitor', args=[self.quiz.id])
+
+        response = self.client.get(url, {'access_token': self.token(self.teacher)})
+
+        self.assertEqual(response.status_code, 200)
+        counters = response.json()
+        self.assertEqual((counters['started'], counters['in_progress'], counters['submitted']), (3, 1, 2))
+        self.assertEqual(counters['average_score'], 50.0)
+        self.assertEqual([b['count'] for b in counters['histogram']], [1] + [0] * 8 + [1])
+
+        self.assertEqual(self.client.get(url, {'access_token': self.token(self.student)}).status_code, 404)
+        self.assertEqual(self.client.get(url).status_code, 401)
+        self.assertEqual(self.client.get(url, {'access_token': 'garbage'}).status_code, 401)
+
+    async def queries_of(self, awaitables):
+        '''(results, queries) of the awaitables; the ORM runs in the sync
+        thread, so the queries are captured and read there.'''
+        ctx = CaptureQueriesContext(connection)
+        await sync_to_async(ctx.__enter__)()
+        try:
+            results = [await awaitable for awaitable in awaitables]
+        finally:
+            await sync_to_async(ctx.__exit__)(None, None, None)
+        return results, await sync_to_async(lambda: ctx.captured_queries)()
+
+    async def until_submitted(self, watcher, count):
+        async for counters in watcher:
+            if counters is not None and counters['submitted'] == count:
+                return counters
+
+    async def test_watchers_share_one_aggregation(self):
+        watchers = [hub.watch(self.quiz.id) for _ in range(50)]
+        try:
+            first, queries = await self.queries_of([anext(watcher) for watcher in watchers])
+            self.assertEqual(len(queries), 2)
+            self.assertEqual({counters['submitted'] for counters in first}, {0})
+
+            await sync_to_async(lambda: [self.submit(student) for student in self.students])()
+            # Pushed from the in-memory counters, without querying
+            updates, queries = await self.queries_of([self.until_submitted(watcher, 3) for watcher in watchers])
+            self.assertEqual(queries, [])
+            self.assertEqual({(c['started'], c['average_score']) for c in updates}, {(3, 100.0)})
+        finally:
+            for watcher in watchers:
+                await watcher.aclose()
+        self.assertEqual(hub._channels, {})
+
+    async def test_changes_between_ticks_are_one_event(self):
+        watcher = hub.watch(self.quiz.id)
+        try:
+            await anext(watcher)
+            for score in (100.0, 50.0, 0.0):
+                hub.attempts_completed(self.quiz.id, [score])
+            counters = await anext(watcher)
+        finally:
+            await watcher.aclose()
+
+        self.assertEqual((counters['submitted'], counters['average_score']), (3, 50.0))
+        self.assertEqual([b['count'] for b in counters['histogram']], [1, 0, 0, 0, 0, 1, 0, 0, 0, 1])
+
+    async def test_streams_server_sent_events(self):
+        token = await sync_to_async(self.token)(self.teacher)
+        response = await self.async_client.get(
+            reverse('quiz-monitor', args=[self.quiz.id]),
+            headers={'Accept': 'text/event-stream', 'Authorization': f'Bearer {token}'},
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = aiter(response.streaming_content)
+        try:
+            event = (await anext(events)).decode()
+        finally:
+            await events.aclose()
+
+        self.assertTrue(event.startswith('event: counters\ndata: '))
+        self.assertEqual(json.loads(event.split('data: ', 1)[1])['quiz_id'], self.quiz.id)
+
+
+class QueuedSubmissionTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        spool_settings = self.settings(
+            QUIZ_SUBMISSION_MODE='queued',
+            SUBMISSION_SPOOL_PATH=os.path.join(self.tmp.name, 'spool.sqlite3'),
+        )
+        spool_settings.enable()
+        self.addCleanup(spool_settings.disable)
+        self.addCleanup(lambda: get_spool().close())
+
+    def test_submission_is_spooled_then_graded_in_batch(self):
+        quiz = make_quiz(self.course, self.teacher, 3)
+        others = [User.objects.create_user(username=f'q{n}', password='pw', role='student') for n in range(3)]
+        receipts = {}
+        for user in [self.student] + others:
+            response = self.client_for(user).post(
+                reverse('submit-quiz'), {'quiz_id': quiz.id, 'answers': answers_for(quiz)}, format='json'
+            )
+            self.assertEqual(response.status_code, 202)
+            receipts[user] = response.data['receipt']
+        self.assertFalse(QuizAttempt.objects.exists())
+
+        poll = self.client_for(self.student).get(reverse('submission-status', args=[receipts[self.student]]))
+        self.assertEqual(poll.data['status'], 'pending')
+
+        call_command('process_submissions', '--once', stdout=StringIO())
+
+        poll = self.client_for(self.student).get(reverse('submission-status', args=[receipts[self.student]]))
+        self.assertEqual((poll.data['status'], poll.data['score']), ('graded', 100.0))
+        self.assertEqual(QuizAttempt.objects.filter(completed=True, score=100.0).count(), 4)
+        self.assertEqual(StudentAnswer.objects.count(), 12)
+
+    def test_duplicate_submission_is_rejected_by_worker(self):
+        quiz = make_quiz(self.course, self.teacher, 2)
+        client = self.client_for(self.student)
+        first = client.post(reverse('submit-quiz'), {'quiz_id': quiz.id, 'answers': answers_for(quiz)}, format='json')
+        second = client.post(
+            reverse('submit-quiz'), {'quiz_id': quiz.id, 'answers': answers_for(quiz, correct=False)}, format='json'
+        )
+
+        call_command('process_submissions', '--once', stdout=StringIO())
+
+        statuses = [client.get(reverse('submission-status', args=[r.data['receipt']])).data['status'] for r in (first, second)]
+        self.assertEqual(statuses, ['graded', 'rejected'])
+        self.assertEqual(QuizAttempt.objects.get().score, 100.0)
+
+    def test_locked_database_defers_isolated_submissions(self):
+        quiz = make_quiz(self.course, self.teacher, 2)
+        other = User.objects.create_user(username='other', password='pw', role='student')
+        receipts = [
+            self.client_for(user).post(
+                reverse('submit-quiz'), {'quiz_id': quiz.id, 'answers': answers_for(quiz)}, format='json'
+            ).data['receipt']
+            for user in (self.student, other)
+        ]
+
+        class FlakyWorker(process_submissions.Command):
+            locked = False
+
+            def grade(self, batch):
+                if len(batch) > 1:
+                    raise ValueError('Broken batch.')
+                if not self.locked:
+                    FlakyWorker.locked = True
+                    raise OperationalError('database is locked')
+                return super().grade(batch)
+
+        call_command(FlakyWorker(), '--once', stdout=StringIO(), stderr=StringIO())
+
+        statuses = [
+            self.client_for(user).get(reverse('submission-status', args=[receipt])).data['status']
+            for user, receipt in zip((self.student, other), receipts)
+        ]
+        self.assertEqual(statuses, ['graded', 'graded'])
+
+    def test_receipts_are_private(self):
+        quiz = make_quiz(self.course, self.teacher, 1)
+        receipt = self.client_for(self.student).post(
+            reverse('submit-quiz'), {'quiz_id': quiz.id, 'answers': answers_for(quiz)}, format='json'
+        ).data['receipt']
+        other = User.objects.create_user(username='nosy', password='pw', role='student')
+
+        response = self.client_for(other).get(reverse('submission-status', args=[receipt]))
+
+        self.assertEqual(response.status_code, 404)
+
+
+HOT_TABLES = {'myapp_studentanswer', 'myapp_quizattempt', 'myapp_option', 'myapp_questionband'}
+
+
+def full_scans(queries):
+    '''Full table scans of HOT_TABLES in the EXPLAIN QUERY PLAN of each query.'''
+    scans = []
+    with connection.cursor() as cursor:
+        for query in queries:
+            sql = query['sql']
+            if not sql.startswith(('SELECT', 'UPDATE', 'DELETE')):
+                continue
+            # Subqueries alias their tables (U0, T3...), and the plan names the alias
+            aliases = {alias: table for table, alias in re.findall(r'"(\w+)" (?:AS )?"?([UT]\d+)\b', sql)}
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            for *_, detail in cursor.fetchall():
+                words = detail.split()
+                if len(words) < 2 or words[0] != 'SCAN':
+                    continue
+                table = aliases.get(words[1], words[1])
+                if table in HOT_TABLES and 'INDEX' not in detail:
+                    scans.append(f'{detail} in {sql}')
+    return scans
+
+
+class QueryBudgetTests(QuizTestCase):
+    '''Every route runs a fixed number of queries whatever the data size,
+    and none of them scans StudentAnswer, QuizAttempt or Option in full.'''
+
+    # Queries per request, savepoints and authentication included. Raising a
+    # budget needs a reason.
+    BUDGETS = {
+        # + the caller's teaching and enrolled course ids for the claims
+        'token_obtain_pair': 3,
+        'token_refresh': 4,
+        'register_student': 2,
+        'register_teacher': 2,
+        'provision_students': 5,
+        # + the user's generation jobs
+        'delete_user_by_username': 10,
+        # + the LSH bands, and the duplicate lookup
+        'create_quiz': 11,
+        'import_quizzes': 7,
+        'generate-quiz': 9,
+        'generation-job': 1,
+        'search-questions': 2,
+        'take-quiz': 8,
+        'quiz-answers': 5,
+        'quiz-answers?method=GET': 4,
+        # + the attempt's autosaved answers
+        'submit-quiz': 18,
+        'submission-status': 0,
+        'view-score': 1,
+        # + the user row, for the email the claims do not carry
+        'get_profile': 3,
+        'get_student_courses': 2,
+        'student_dashboard': 3,
+        'quizzes_for_course': 4,
+        'quizzes_for_course?view=summary': 2,
+        'get_teacher_courses': 1,
+        'item-analysis': 4,
+        # + per chunk: the attempts, the answers and scores, the reviews and
+        # the score histogram
+        'answer-key': 20,
+        'export-gradebook': 4,
+        'quiz-leaderboard': 2,
+        'quiz-percentile': 2,
+        # + attempt counts and score histogram, once per tick when streamed
+        'quiz-monitor': 3,
+    }
+
+    def setUp(self):
+        super().setUp()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        spool_settings = self.settings(SUBMISSION_SPOOL_PATH=os.path.join(self.tmp.name, 'spool.sqlite3'))
+        spool_settings.enable()
+        self.addCleanup(spool_settings.disable)
+        self.addCleanup(lambda: get_spool().close())
+
+    def seed(self, tag, students, quizzes, questions, courses):
+        '''A teacher's course with graded attempts of every student, plus one open, pooled quiz.'''
+        teacher = User.objects.create_user(username=f'{tag}-teacher', password='pw', role='teacher')
+        learners = [
+            User.objects.create_user(username=f'{tag}-student{n}', password='pw', role='student')
+            for n in range(students)
+        ]
+        course = None
+        for n in range(courses):
+            course = Course.objects.create(name=f'{tag} {n}', code=f'{tag}{n}')
+            course.teachers.add(teacher)
+            course.students.add(*learners)
+        graded = [make_quiz(course, teacher, questions, title=f'{tag} {n}') for n in range(quizzes)]
+        for quiz in graded:
+            for n, learner in enumerate(learners):
+                submit_attempt(learner, quiz, answers_for(quiz, correct=n % 2 == 0))
+        return {
+            'tag': tag,
+            'teacher': teacher,
+            'student': learners[0],
+            'course': course,
+            'graded': graded[0],
+            'open': make_quiz(course, teacher, questions, title=f'{tag} open',
+                              questions_per_attempt=questions // 2, shuffle=True),
+        }
+
+    def requests(self, data):
+        '''(name, user, method, url, payload, format) for every route in myapp/urls.py.'''
+        tag, course, student, teacher = data['tag'], data['course'], data['student'], data['teacher']
+        admin = User.objects.create_superuser(username=f'{tag}-admin', password='pw')
+        User.objects.create_user(username=f'{tag}-leaving', password='pw', role='student')
+        bank = '\n'.join(json.dumps(quiz_payload(course, 2, title=f'Imported {n}')) for n in range(2))
+        graded, open_quiz = data['graded'].id, data['open'].id
+        key = get_answer_key(open_quiz)
+        question_id = min(drawn_question_ids(key, open_quiz, student.id))
+        autosave = {'question_id': question_id, 'selected_option_id': key[question_id][0]}
+        correction = Option.objects.filter(question__quiz_id=graded, is_correct=False).order_by('id').first()
+        job = GenerationJob.objects.create(
+            created_by=teacher, course=course, title='Queued', topic=tag, difficulty='easy',
+            num_questions=2, duration_minutes=10,
+        )
+        return [
+            ('token_obtain_pair', None, 'post', reverse('token_obtain_pair'),
+             {'username': student.username, 'password': 'pw'}, 'json'),
+            ('token_refresh', None, 'post', reverse('token_refresh'),
+             {'refresh': str(RefreshToken.for_user(student))}, 'json'),
+            ('register_student', None, 'post', reverse('register_student'),
+             {'username': f'{tag}-new', 'email': 'new@example.com', 'password': 'pw'}, 'json'),
+            ('register_teacher', admin, 'post', reverse('register_teacher'),
+             {'username': f'{tag}-hired', 'email': 'hired@example.com', 'password': 'pw'}, 'json'),
+            ('provision_students', admin, 'post', reverse('provision_students'),
+             {'file': SimpleUploadedFile('roster.csv', f'username,email\n{tag}-intake1,a@example.com\n{tag}-intake2,\n'.encode())},
+             'multipart'),
+            ('delete_user_by_username', admin, 'delete', reverse('delete_user_by_username', args=[f'{tag}-leaving']),
+             None, 'json'),
+            ('create_quiz', teacher, 'post', reverse('create_quiz'), quiz_payload(course, 3), 'json'),
+            ('import_quizzes', teacher, 'post', reverse('import_quizzes'),
+             {'file': SimpleUploadedFile('bank.jsonl', bank.encode())}, 'multipart'),
+            ('generate-quiz', teacher, 'post', reverse('generate-quiz'),
+             {'course_id': course.id, 'title': 'Generated', 'topic': tag, 'difficulty': 'easy',
+              'num_questions': 2, 'duration_minutes': 10}, 'json'),
+            ('generation-job', teacher, 'get', reverse('generation-job', args=[job.id]), None, 'json'),
+            ('search-questions', teacher, 'get', reverse('search-questions') + '?q=question', None, 'json'),
+            ('take-quiz', student, 'get', reverse('take-quiz', args=[open_quiz]), None, 'json'),
+            ('quiz-answers', student, 'post', reverse('quiz-answers', args=[open_quiz]),
+             {'answers': [autosave]}, 'json'),
+            ('quiz-answers?method=GET', student, 'get', reverse('quiz-answers', args=[open_quiz]), None, 'json'),
+            ('submit-quiz', student, 'post', reverse('submit-quiz'),
+             {'quiz_id': open_quiz, 'answers': answers_for(data['open'])}, 'json'),
+            ('submission-status', student, 'get',
+             reverse('submission-status', args=[get_spool().append(student.id, open_quiz, [])]), None, 'json'),
+            ('view-score', student, 'get', reverse('view-score', args=[graded]), None, 'json'),
+            ('get_profile', student, 'get', reverse('get_profile'), None, 'json'),
+            ('get_student_courses', student, 'get', reverse('get_student_courses'), None, 'json'),
+            ('student_dashboard', student, 'get', reverse('student_dashboard'), None, 'json'),
+            ('quizzes_for_course', student, 'get', reverse('quizzes_for_course', args=[course.code]), None, 'json'),
+            ('quizzes_for_course?view=summary', student, 'get',
+             reverse('quizzes_for_course', args=[course.code]) + '?view=summary', None, 'json'),
+            ('get_teacher_courses', teacher, 'get', reverse('get_teacher_courses'), None, 'json'),
+            ('item-analysis', teacher, 'get', reverse('item-analysis', args=[graded]), None, 'json'),
+            ('export-gradebook', teacher, 'get', reverse('export-gradebook', args=[course.code]), None, 'json'),
+            ('quiz-leaderboard', student, 'get', reverse('quiz-leaderboard', args=[graded]), None, 'json'),
+            ('quiz-percentile', student, 'get', reverse('quiz-percentile', args=[graded]), None, 'json'),
+            ('quiz-monitor', teacher, 'get', reverse('quiz-monitor', args=[graded]), None, 'json'),
+            # Last: it changes the scores the routes above read
+            ('answer-key', teacher, 'post', reverse('answer-key', args=[graded]),
+             {'corrections': [{'question_id': correction.question_id, 'correct_option_id': correction.id}]}, 'json'),
+        ]
+
+    def client_for(self, user):
+        '''A client sending the access token a login would return, with the
+        membership version already cached as it is after the first request.'''
+        client = APIClient()
+        user = User.objects.get(pk=user.pk)
+        token = MembershipTokenObtainPairSerializer.get_token(user).access_token
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        current_membership_version(user.pk)
+        return client
+
+    def measure(self, data):
+        counts = {}
+        for name, user, method, url, payload, fmt in self.requests(data):
+            client = self.client_for(user) if user else APIClient()
+            with CaptureQueriesContext(connection) as ctx:
+                response = getattr(client, method)(url, payload, format=fmt)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            self.assertLess(response.status_code, 300, f'{name}: {getattr(response, "data", response)}')
+            self.assertEqual(full_scans(ctx.captured_queries), [], name)
+            counts[name] = len(ctx.captured_queries)
+        return counts
+
+    def test_detects_full_scans(self):
+        scans = full_scans([
+            {'sql': 'SELECT "myapp_option"."id" FROM "myapp_option" WHERE "myapp_option"."text" = \'x\''},
+            {'sql': 'SELECT "myapp_option"."id" FROM "myapp_option" WHERE "myapp_option"."question_id" = 1'},
+        ])
+        self.assertEqual(len(scans), 1)
+        self.assertIn('SCAN myapp_option', scans[0])
+
+    def test_every_route_is_covered(self):
+        routes = {pattern.name for pattern in urlpatterns}
+        self.assertEqual({name.split('?')[0] for name in self.BUDGETS}, routes)
+
+    def test_query_count_is_fixed_and_plans_use_indexes(self):
+        small = self.measure(self.seed('small', students=2, quizzes=1, questions=2, courses=1))
+        large = self.measure(self.seed('large', students=20, quizzes=4, questions=8, courses=3))
+
+        for name, budget in self.BUDGETS.items():
+            self.assertEqual(small[name], large[name], f'{name} grows with data size')
+            self.assertLessEqual(large[name], budget, f'{name} is over budget')
+
+
+class SeedCommandTests(QuizTestCase):
+    def seed(self, seed):
+        call_command(
+            'seed', teachers=2, students=6, courses=2, students_per_course=4, quizzes=2, questions=3,
+            attempts=2, seed=seed, stdout=StringIO(),
+        )
+        return sorted(QuizAttempt.objects.values_list('student__username', 'quiz__title', 'score'))
+
+    def test_generates_consistent_data(self):
+        admin = User.objects.create_superuser(username='admin', password='pw')
+        self.seed(7)
+
+        self.assertTrue(User.objects.filter(pk=admin.pk).exists())
+        self.assertEqual(User.objects.filter(role='student').count(), 6)
+        self.assertEqual(Question.objects.count(), 2 * 2 * 3)
+        self.assertTrue(User.objects.get(username='student000001').check_password('password'))
+        self.assertEqual(len(set(User.objects.filter(role__in=['student', 'teacher']).values_list('password', flat=True))), 1)
+
+        attempts = QuizAttempt.objects.annotate(answers_count=Count('answers'), correct=Count('answers', filter=Q(answers__is_correct=True)))
+        self.assertTrue(attempts.exists())
+        for attempt in attempts:
+            self.assertEqual(attempt.answers_count, 3)
+            self.assertEqual(attempt.score, round(attempt.correct / 3 * 100, 2))
+            self.assertTrue(attempt.quiz.course.students.filter(pk=attempt.student_id).exists())
+        self.assertEqual(QuizScoreBucket.objects.aggregate(n=Sum('count'))['n'], attempts.count())
+
+    def test_same_seed_same_data(self):
+        self.assertEqual(self.seed(3), self.seed(3))
+
+    def test_seeds_over_existing_data(self):
+        quiz = make_quiz(self.course, self.teacher, 2)
+        self.assertTrue(QuestionBand.objects.exists())
+        question_set = GeneratedQuestionSet.objects.create(
+            key='0' * 64, generator='local', topic='sets', difficulty='easy', count=2, questions=[],
+        )
+        GenerationJob.objects.create(
+            created_by=self.teacher, course=self.course, title='Sets', topic='sets', difficulty='easy',
+            num_questions=2, duration_minutes=10, status='succeeded', question_set=question_set, quiz=quiz,
+        )
+
+        self.seed(5)
+
+        self.assertEqual(Question.objects.count(), 2 * 2 * 3)
+        self.assertFalse(GenerationJob.objects.exists())
+        self.assertFalse(Question.objects.filter(bands__isnull=True).exists())
+
+
+class LoadtestCommandTests(QuizTestCase):
+    def test_refuses_to_run_over_existing_attempts(self):
+        quiz = make_quiz(self.course, self.teacher, 2)
+        attempt = submit_attempt(self.student, quiz, answers_for(quiz))
+
+        with self.assertRaisesMessage(CommandError, '--reset-attempts'):
+            call_command('loadtest', quiz=quiz.id, students=1, stdout=StringIO())
+
+        self.assertTrue(QuizAttempt.objects.filter(pk=attempt.pk).exists())
+        self.assertEqual(attempt.answers.count(), 2)
+
+
+class ProvisioningTests(QuizTestCase):
+    def provision(self, name, content, user=None):
+        admin = user or User.objects.create_superuser(username='admin', password='pw')
+        response = self.client_for(admin).post(
+            reverse('provision_students'), {'file': SimpleUploadedFile(name, content.encode())}
+        )
+        if not response.streaming:
+            return response, None
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        return response, lines
+
+    @override_settings(PROVISIONING_HASH_WORKERS=2, PROVISIONING_BATCH_SIZE=3)
+    def test_csv_roster_reports_every_row(self):
+        roster = '\n'.join([
+            'username,email,password',
+            'ada,ada@example.com,secret1',
+            'grace,,',
+            'ada,other@example.com,x',
+            'student,taken@example.com,x',
+            'bad name!,,x',
+            'linus,not-an-email,x',
+            'ken,ken@example.com,secret2',
+            ',,',
+        ])
+        response, lines = self.provision('intake.csv', roster)
+
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        *rows, summary = lines
+        self.assertEqual(summary, {'summary': {'created': 3, 'errors': 5}})
+        status_by_line = {row['line']: row['status'] for row in rows}
+        self.assertEqual(status_by_line, {
+            2: 'created', 3: 'created', 4: 'error', 5: 'error', 6: 'error', 7: 'error', 8: 'created', 9: 'error',
+        })
+        grace = next(row for row in rows if row['username'] == 'grace')
+        self.assertTrue(User.objects.get(pk=grace['id']).check_password(grace['password']))
+        ada = User.objects.get(username='ada')
+        self.assertEqual((ada.role, ada.email), ('student', 'ada@example.com'))
+        self.assertTrue(ada.check_password('secret1'))
+        self.assertNotIn('password', next(row for row in rows if row['username'] == 'ada' and row['status'] == 'created'))
+
+    def test_command_reads_jsonl(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'intake.jsonl')
+            with open(path, 'w') as f:
+                f.write('{"username": "alan", "password": "pw1"}\nnot json\n[1]\n')
+            out = StringIO()
+            call_command('provision_students', path, workers=1, stdout=out, stderr=StringIO())
+
+        *results, summary = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(sorted((r['line'], r['status']) for r in results), [(1, 'created'), (2, 'error'), (3, 'error')])
+        self.assertEqual(summary, {'summary': {'created': 1, 'errors': 2}})
+        self.assertTrue(User.objects.get(username='alan').check_password('pw1'))
+
+    def test_admins_only(self):
+        response, _ = self.provision('intake.csv', 'username\nmallory\n', user=self.teacher)
+
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(User.objects.filter(username='mallory').exists())
+
+
+class MembershipClaimsTests(QuizTestCase):
+    def login(self, user):
+        response = APIClient().post(reverse('token_obtain_pair'), {'username': user.username, 'password': 'pw'})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def bearer(self, access):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        return client
+
+    def user_lookups(self, queries):
+        return [q['sql'] for q in queries if 'FROM "myapp_user" WHERE "myapp_user"."id" =' in q['sql']]
+
+    def test_current_token_needs_no_user_lookup(self):
+        quiz = make_quiz(self.course, self.teacher, 2)
+        client = self.bearer(self.login(self.teacher)['access'])
+        client.get(reverse('get_teacher_courses'))
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(reverse('item-analysis', args=[quiz.id]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.user_lookups(ctx.captured_queries), [])
+
+    def test_enrollment_change_retires_the_claims(self):
+        quiz = make_quiz(self.course, self.teacher, 2)
+        client = self.bearer(self.login(self.student)['access'])
+        self.assertEqual(client.get(reverse('quiz-leaderboard', args=[quiz.id])).status_code, 200)
+
+        self.course.students.remove(self.student)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(reverse('quiz-leaderboard', args=[quiz.id]))
+        self.assertEqual(response.status_code, 404)
+        self.assertNotEqual(self.user_lookups(ctx.captured_queries), [])
+
+    def test_role_change_and_deletion_retire_the_claims(self):
+        client = self.bearer(self.login(self.teacher)['access'])
+        self.assertEqual(client.get(reverse('get_teacher_courses')).status_code, 200)
+
+        teacher = User.objects.get(pk=self.teacher.pk)
+        teacher.role = 'student'
+        teacher.save(update_fields=['role'])
+        self.assertEqual(client.get(reverse('get_teacher_courses')).status_code, 403)
+
+        teacher.delete()
+        self.assertEqual(client.get(reverse('get_teacher_courses')).status_code, 401)
+
+    def test_refresh_reissues_current_claims(self):
+        tokens = self.login(self.student)
+        other = Course.objects.create(name='Go', code='GO101')
+        other.students.add(self.student)
+
+        response = APIClient().post(reverse('token_refresh'), {'refresh': tokens['refresh']})
+
+        self.assertEqual(response.status_code, 200)
+        client = self.bearer(response.data['access'])
+        client.get(reverse('get_student_courses'))
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(reverse('get_student_courses'))
+        self.assertEqual({course['code'] for course in response.data}, {'PY101', 'GO101'})
+        self.assertEqual(self.user_lookups(ctx.captured_queries), [])
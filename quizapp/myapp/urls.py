@@ -6,27 +6,50 @@ from rest_framework_simplejwt.views import (
 # from .views import protected_view
 from  myapp.views.createuser import register_student, CreateTeacherView
 from myapp.views.deleteuser import delete_user_by_username
-from myapp.views.createquiz import create_quiz
+from myapp.views.createquiz import create_quiz, import_quizzes
+from myapp.views.generation import generate_quiz, generation_job
 from myapp.views.viewscore import view_score
 from myapp.views.profile import get_profile
-from myapp.views.takequizs import take_quiz, submit_quiz
+from myapp.views.takequizs import take_quiz, quiz_answers, submit_quiz, submission_status
 from myapp.views.student_courses import get_student_courses
 from myapp.views.allquiz import get_quizzes_for_course_by_code
 from myapp.views.teacherscourses import get_teacher_courses     
+from myapp.views.itemanalysis import item_analysis
+from myapp.views.answerkey import correct_answer_key
+from myapp.views.gradebook import export_gradebook
+from myapp.views.leaderboard import quiz_leaderboard, quiz_percentile
+from myapp.views.provisioning import provision_students
+from myapp.views.dashboard import student_dashboard
+from myapp.views.monitor import quiz_monitor
+from myapp.views.questionbank import search_question_bank
 urlpatterns = [
     path('token', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh', TokenRefreshView.as_view(), name='token_refresh'),
     # path('protected', protected_view, name='protected'),
     path('register/student', register_student, name='register_student'),
     path('register/teacher', CreateTeacherView.as_view(), name='register_teacher'),
+    path('provision/students', provision_students, name='provision_students'),
     path('deleteuser/<str:username>' , delete_user_by_username , name='delete_user_by_username'),
     path('create_quiz' , create_quiz, name='create_quiz'),
+    path('import_quizzes', import_quizzes, name='import_quizzes'),
+    path('quiz/generate', generate_quiz, name='generate-quiz'),
+    path('quiz/generate/<int:job_id>', generation_job, name='generation-job'),
+    path('questions/search', search_question_bank, name='search-questions'),
     path('quiz/<int:quiz_id>/take', take_quiz, name='take-quiz'),
+    path('quiz/<int:quiz_id>/answers', quiz_answers, name='quiz-answers'),
     path('quiz/submit', submit_quiz, name='submit-quiz'),
+    path('quiz/submission/<str:receipt>', submission_status, name='submission-status'),
     path('quiz/<int:quiz_id>/viewscore', view_score, name='view-score'),
     path('profile', get_profile, name='get_profile'),
     path('courses', get_student_courses, name='get_student_courses'),
+    path('dashboard', student_dashboard, name='student_dashboard'),
     path('quizzes/<str:course_code>', get_quizzes_for_course_by_code, name='quizzes_for_course'),
     path('teacher/courses', get_teacher_courses, name='get_teacher_courses'),
+    path('quiz/<int:quiz_id>/item-analysis', item_analysis, name='item-analysis'),
+    path('quiz/<int:quiz_id>/answer-key', correct_answer_key, name='answer-key'),
+    path('gradebook/<str:course_code>', export_gradebook, name='export-gradebook'),
+    path('quiz/<int:quiz_id>/leaderboard', quiz_leaderboard, name='quiz-leaderboard'),
+    path('quiz/<int:quiz_id>/percentile', quiz_percentile, name='quiz-percentile'),
+    path('quiz/<int:quiz_id>/monitor', quiz_monitor, name='quiz-monitor'),
 
 ]
@@ -1,20 +1,56 @@
 # views/quiz_views.py
 
+from django.db.models import Count, OuterRef, Subquery
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
-from ..models import Course, Quiz
-from ..serializers import QuizDetailSerializer
+from ..models import Course, Quiz, QuizAttempt
+from ..pagination import QuizCursorPagination
+from ..serializers import QuizDetailSerializer, QuizSummarySerializer
+from ..dbrouters import read_replica
+
+
+def annotate_quiz_summary(quizzes, user):
+    '''Add question_count and the user's attempt state to a Quiz queryset.'''
+    attempt = QuizAttempt.objects.filter(quiz=OuterRef('pk'), student=user)
+    return quizzes.annotate(
+        question_count=Count('questions'),
+        attempt_completed=Subquery(attempt.values('completed')[:1]),
+        attempt_score=Subquery(attempt.values('score')[:1]),
+    )
+
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@read_replica
 def get_quizzes_for_course_by_code(request, course_code):
+    '''Cursor-paginated quizzes of a course.
+
+    ``?view=summary`` returns title, timing, question count and the
+    caller's attempt status; the default ``detail`` view nests questions
+    and options, fetched with two prefetch queries per page.
+    '''
     try:
         course = Course.objects.get(code=course_code)
     except Course.DoesNotExist:
         return Response({'error': 'Course not found.'}, status=status.HTTP_404_NOT_FOUND)
 
+    view = request.query_params.get('view', 'detail')
     quizzes = Quiz.objects.filter(course=course)
-    serializer = QuizDetailSerializer(quizzes, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    if request.user.role == 'student':
+        # Students cannot take drafts, so they do not see them either
+        quizzes = quizzes.filter(is_published=True)
+    if view == 'summary':
+        quizzes = annotate_quiz_summary(quizzes, request.user)
+        serializer_class = QuizSummarySerializer
+    elif view == 'detail':
+        quizzes = quizzes.prefetch_related('questions__options')
+        serializer_class = QuizDetailSerializer
+    else:
+        return Response({'error': "view must be 'summary' or 'detail'."}, status=status.HTTP_400_BAD_REQUEST)
+
+    paginator = QuizCursorPagination()
+    page = paginator.paginate_queryset(quizzes, request)
+    serializer = serializer_class(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
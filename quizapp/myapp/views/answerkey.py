@@ -0,0 +1,45 @@
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework import status
+
+from ..models import Quiz
+from ..regrade import AnswerKeyError, clean_corrections, regrade_quiz
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def correct_answer_key(request, quiz_id):
+    '''{
+  "corrections": [
+    {"question_id": 12, "correct_option_id": 48}
+  ]
+}
+
+Marks each option as its question's only correct one and regrades every
+submitted attempt (myapp.regrade). The response counts the attempts
+regraded and the scores that changed.
+'''
+    user = request.user
+
+    if user.role != 'teacher':
+        return Response({'detail': 'Only teachers can access this.'}, status=status.HTTP_403_FORBIDDEN)
+
+    if not Quiz.objects.filter(pk=quiz_id, course_id__in=user.teaching_course_ids).exists():
+        return Response({'detail': 'Quiz not found in your courses.'}, status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        corrections = clean_corrections(quiz_id, request.data.get('corrections'))
+    except AnswerKeyError as exc:
+        return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+    report = regrade_quiz(quiz_id, corrections)
+    return Response({
+        'detail': 'Answer key updated.',
+        'quiz_id': quiz_id,
+        'questions_corrected': len(corrections),
+        'attempts_regraded': report['attempts'],
+        'scores_changed': report['changed'],
+        'raised': report['raised'],
+        'lowered': report['lowered'],
+    }, status=status.HTTP_200_OK)
@@ -1,10 +1,16 @@
-from rest_framework.decorators import api_view, permission_classes
+import json
+
+from django.conf import settings
+from rest_framework.decorators import api_view, parser_classes, permission_classes
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
-from django.utils import timezone
 
-from myapp.models import User, Course, Quiz, Question, Option
+from myapp.duplicates import find_duplicates
+from myapp.models import Course
+from myapp.quizbuilder import QuizPayloadError, clean_quiz_payload, create_quizzes
+from myapp.quizpayload import prewarm_quiz_payload
 
 
 @api_view(['POST'])
@@ -26,60 +32,116 @@ def create_quiz(request):
       "options": ["func", "def", "function", "lambda"],
       "correct_option": 1
     }
-  ]
+  ],
+  "questions_per_attempt": 1,
+  "shuffle": true
 }
+
+questions_per_attempt and shuffle are optional: the first deals each
+student that many of the questions, the second orders questions and
+options differently for each student.
+
+The response lists the new questions that nearly duplicate an earlier
+question of the quiz or of the teacher's courses, by position in
+"questions" (myapp.duplicates). They are created all the same.
 '''
     user = request.user
 
     if user.role != 'teacher':
         return Response({'detail': 'Only teachers can create quizzes.'}, status=status.HTTP_403_FORBIDDEN)
 
-    data = request.data
-    course_id = data.get('course_id')
-    title = data.get('title')
-    num_questions = data.get('num_questions')
-    duration_minutes = data.get('duration_minutes')
-    questions_data = data.get('questions', [])
-
-    if not (course_id and title and num_questions and duration_minutes and questions_data):
-        return Response({'detail': 'Missing required fields.'}, status=status.HTTP_400_BAD_REQUEST)
-
-    if len(questions_data) != int(num_questions):
-        return Response({'detail': 'Number of questions mismatch.'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        spec = clean_quiz_payload(request.data)
+    except QuizPayloadError as exc:
+        return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
 
     try:
-        course = Course.objects.get(id=course_id)
+        course = Course.objects.get(id=spec['course_id'])
     except Course.DoesNotExist:
         return Response({'detail': 'Course not found.'}, status=status.HTTP_404_NOT_FOUND)
 
-    if user not in course.teachers.all():
+    if course.id not in user.teaching_course_ids:
         return Response({'detail': 'You are not assigned as a teacher to this course.'}, status=status.HTTP_403_FORBIDDEN)
 
-    quiz = Quiz.objects.create(
-        title=title,
-        course=course,
-        created_by=user,
-        start_time=timezone.now(),
-        end_time=timezone.now() + timezone.timedelta(minutes=int(duration_minutes)),
-        duration_minutes=duration_minutes,
-        is_published=True
-    )
-
-    for q_data in questions_data:
-        q_text = q_data.get('text')
-        options = q_data.get('options', [])
-        correct_index = q_data.get('correct_option')  # 0-based index
-
-        if not (q_text and options and isinstance(correct_index, int)) or correct_index >= len(options):
-            return Response({'detail': 'Invalid question or options format.'}, status=status.HTTP_400_BAD_REQUEST)
-
-        question = Question.objects.create(quiz=quiz, text=q_text)
-
-        for idx, opt_text in enumerate(options):
-            Option.objects.create(
-                question=question,
-                text=opt_text,
-                is_correct=(idx == correct_index)
-            )
-
-    return Response({'detail': 'Quiz created successfully.', 'quiz_id': quiz.id}, status=status.HTTP_201_CREATED)
+    spec['created_by'] = user
+    [quiz] = create_quizzes([spec])
+    prewarm_quiz_payload(quiz.id)
+    duplicates = find_duplicates([quiz.id], user.teaching_course_ids).get(quiz.id, [])
+
+    return Response({
+        'detail': 'Quiz created successfully.',
+        'quiz_id': quiz.id,
+        'duplicates': duplicates,
+    }, status=status.HTTP_201_CREATED)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@parser_classes([MultiPartParser])
+def import_quizzes(request):
+    '''Bulk-create quizzes from an uploaded JSONL file (form field "file").
+
+    Every line is one quiz in the same format as ``create_quiz``. The file
+    is read line by line and valid quizzes are inserted in batches of
+    roughly QUIZ_IMPORT_BATCH_QUESTIONS questions, each batch in its own
+    short transaction, so memory stays bounded and the database write lock
+    is released between batches. Invalid lines are reported and skipped.
+    Near-duplicate questions are reported per quiz, as by ``create_quiz``,
+    including duplicates of questions imported earlier in the file.
+    '''
+    user = request.user
+
+    if user.role != 'teacher':
+        return Response({'detail': 'Only teachers can import quizzes.'}, status=status.HTTP_403_FORBIDDEN)
+
+    upload = request.FILES.get('file')
+    if upload is None:
+        return Response({'detail': 'A JSONL file is required.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    batch_questions = getattr(settings, 'QUIZ_IMPORT_BATCH_QUESTIONS', 2000)
+    quiz_ids = []
+    errors = []
+    duplicates = {}
+    batch = []
+    pending = 0
+
+    def import_batch(batch):
+        created = [quiz.id for quiz in create_quizzes(batch)]
+        quiz_ids.extend(created)
+        duplicates.update(find_duplicates(created, user.teaching_course_ids))
+
+    for line_no, raw in enumerate(upload, start=1):
+        line = raw.strip()
+        if not line:
+            continue
+        try:
+            data = json.loads(line)
+            if not isinstance(data, dict):
+                raise QuizPayloadError('Each line must be a JSON object.')
+            spec = clean_quiz_payload(data)
+        except (ValueError, UnicodeDecodeError) as exc:
+            detail = str(exc) if isinstance(exc, QuizPayloadError) else 'Invalid JSON.'
+            errors.append({'line': line_no, 'detail': detail})
+            continue
+        if spec['course_id'] not in user.teaching_course_ids:
+            errors.append({'line': line_no, 'detail': 'You are not assigned as a teacher to this course.'})
+            continue
+
+        spec['created_by'] = user
+        batch.append(spec)
+        pending += len(spec['questions'])
+        if pending >= batch_questions:
+            import_batch(batch)
+            batch, pending = [], 0
+
+    if batch:
+        import_batch(batch)
+
+    return Response({
+        'detail': f'Imported {len(quiz_ids)} quizzes.',
+        'quiz_ids': quiz_ids,
+        'errors': errors,
+        'duplicates': [
+            {'quiz_id': quiz_id, 'questions': duplicates[quiz_id]} for quiz_id in quiz_ids if quiz_id in duplicates
+        ],
+    }, status=status.HTTP_201_CREATED if quiz_ids else status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,29 @@
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework import status
+
+from ..dashboard import get_dashboard
+from ..dbrouters import read_replica
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@read_replica
+def student_dashboard(request):
+    '''Everything a student's landing page shows, in one response.
+
+    Enrolled courses with their teachers, and each course's published
+    quizzes with open/upcoming/closed state and the student's attempt
+    status and score.
+    '''
+    user = request.user
+
+    if user.role != 'student':
+        return Response({'detail': 'Only students have a dashboard.'}, status=status.HTTP_403_FORBIDDEN)
+
+    return Response({
+        'id': user.id,
+        'username': user.username,
+        'courses': get_dashboard(user),
+    }, status=status.HTTP_200_OK)
@@ -0,0 +1,73 @@
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework import status
+
+from myapp.generation import clean_generation_request, enqueue
+from myapp.models import Course, GenerationJob
+from myapp.quizbuilder import QuizPayloadError
+
+
+def _job_data(job):
+    return {
+        'job_id': job.id,
+        'status': job.status,
+        'course_id': job.course_id,
+        'title': job.title,
+        'topic': job.topic,
+        'difficulty': job.difficulty,
+        'num_questions': job.num_questions,
+        'cached': job.cached,
+        'quiz_id': job.quiz_id,
+        'error': job.error or None,
+        'created_at': job.created_at,
+        'finished_at': job.finished_at,
+    }
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def generate_quiz(request):
+    '''{
+  "course_id": 3,
+  "title": "Python Basics Quiz",
+  "topic": "Python lists",
+  "difficulty": "medium",
+  "num_questions": 10,
+  "duration_minutes": 20
+}
+
+Queues a job that generates the questions (QUIZ_GENERATOR) and creates
+the quiz, and returns it with status 202; poll generation_job until it
+has succeeded or failed. Questions are cached by generator, topic,
+difficulty and count, so a request someone already made reuses them.
+'''
+    user = request.user
+
+    if user.role != 'teacher':
+        return Response({'detail': 'Only teachers can create quizzes.'}, status=status.HTTP_403_FORBIDDEN)
+
+    try:
+        spec = clean_generation_request(request.data)
+    except QuizPayloadError as exc:
+        return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+    if not Course.objects.filter(id=spec['course_id']).exists():
+        return Response({'detail': 'Course not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+    if spec['course_id'] not in user.teaching_course_ids:
+        return Response({'detail': 'You are not assigned as a teacher to this course.'}, status=status.HTTP_403_FORBIDDEN)
+
+    job = GenerationJob.objects.create(created_by=user, **spec)
+    enqueue(job)
+    return Response(_job_data(job), status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def generation_job(request, job_id):
+    '''Status of one of the caller's generation jobs; quiz_id is set once it has succeeded.'''
+    job = GenerationJob.objects.filter(pk=job_id, created_by=request.user).first()
+    if job is None:
+        return Response({'detail': 'Generation job not found.'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(_job_data(job), status=status.HTTP_200_OK)
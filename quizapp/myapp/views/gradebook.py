@@ -0,0 +1,26 @@
+from django.http import StreamingHttpResponse
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework import status
+
+from ..gradebook import gradebook_rows
+from ..models import Course
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_gradebook(request, course_code):
+    user = request.user
+
+    try:
+        course = Course.objects.get(code=course_code)
+    except Course.DoesNotExist:
+        return Response({'detail': 'Course not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+    if not (user.is_staff or course.id in user.teaching_course_ids):
+        return Response({'detail': 'You are not assigned as a teacher to this course.'}, status=status.HTTP_403_FORBIDDEN)
+
+    response = StreamingHttpResponse(gradebook_rows(course), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="gradebook-{course.code}.csv"'
+    return response
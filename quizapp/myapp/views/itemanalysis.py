@@ -0,0 +1,21 @@
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework import status
+
+from ..analytics import get_item_analysis
+from ..models import Quiz
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def item_analysis(request, quiz_id):
+    user = request.user
+
+    if user.role != 'teacher':
+        return Response({'detail': 'Only teachers can access this.'}, status=status.HTTP_403_FORBIDDEN)
+
+    if not Quiz.objects.filter(pk=quiz_id, course_id__in=user.teaching_course_ids).exists():
+        return Response({'detail': 'Quiz not found in your courses.'}, status=status.HTTP_404_NOT_FOUND)
+
+    return Response(get_item_analysis(quiz_id), status=status.HTTP_200_OK)
@@ -0,0 +1,40 @@
+from django.conf import settings
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework import status
+
+from ..leaderboard import score_position, top_attempts
+from ..models import Quiz, QuizAttempt
+
+
+def _can_view(user, quiz_id):
+    course_ids = user.enrolled_course_ids | user.teaching_course_ids
+    return Quiz.objects.filter(pk=quiz_id, course_id__in=course_ids).exists()
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def quiz_leaderboard(request, quiz_id):
+    if not _can_view(request.user, quiz_id):
+        return Response({'detail': 'Quiz not found in your courses.'}, status=status.HTTP_404_NOT_FOUND)
+
+    max_limit = getattr(settings, 'LEADERBOARD_MAX_LIMIT', 100)
+    try:
+        limit = min(int(request.query_params.get('limit', 10)), max_limit)
+    except ValueError:
+        return Response({'detail': 'limit must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({'quiz_id': quiz_id, 'top': top_attempts(quiz_id, max(limit, 1))}, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def quiz_percentile(request, quiz_id):
+    attempt = QuizAttempt.objects.filter(
+        student=request.user, quiz_id=quiz_id, completed=True
+    ).values_list('score', flat=True).first()
+    if attempt is None:
+        return Response({'detail': 'No completed attempt for this quiz.'}, status=status.HTTP_404_NOT_FOUND)
+
+    return Response({'quiz_id': quiz_id, 'score': attempt, **score_position(quiz_id, attempt)}, status=status.HTTP_200_OK)
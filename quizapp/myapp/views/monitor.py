@@ -0,0 +1,53 @@
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework import exceptions, status
+
+from ..authentication import QueryTokenAuthentication
+from ..models import Quiz
+from ..monitor import format_event, hub
+
+
+def _check_access(request, quiz_id):
+    '''An error response, or None if the caller may watch the quiz.'''
+    try:
+        result = QueryTokenAuthentication().authenticate(request)
+    except exceptions.AuthenticationFailed as exc:
+        return JsonResponse({'detail': str(exc.detail)}, status=status.HTTP_401_UNAUTHORIZED)
+    if result is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'},
+                            status=status.HTTP_401_UNAUTHORIZED)
+    user = result[0]
+    course_id = Quiz.objects.filter(pk=quiz_id).values_list('course_id', flat=True).first()
+    if course_id is None or not (user.is_staff or course_id in user.teaching_course_ids):
+        return JsonResponse({'detail': 'Quiz not found in your courses.'}, status=status.HTTP_404_NOT_FOUND)
+    return None
+
+
+async def _events(quiz_id):
+    async for snapshot in hub.watch(quiz_id):
+        yield format_event(snapshot)
+
+
+@require_GET
+async def quiz_monitor(request, quiz_id):
+    '''Live counters of a quiz for its teachers: attempts started and
+    submitted, average score so far and a histogram in ten-point bins.
+
+    With "Accept: text/event-stream" the counters are streamed as
+    server-sent events (myapp.monitor), which needs an ASGI server such as
+    ``uvicorn quizapp.asgi:application``; otherwise, or under WSGI, the
+    current counters are returned once as JSON. The access token may be
+    passed as ``?access_token=`` since EventSource cannot set headers.
+    '''
+    error = await sync_to_async(_check_access)(request, quiz_id)
+    if error is not None:
+        return error
+
+    if 'text/event-stream' in request.headers.get('Accept', '') and isinstance(request, ASGIRequest):
+        response = StreamingHttpResponse(_events(quiz_id), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+    return JsonResponse(await hub.snapshot(quiz_id))
@@ -2,11 +2,13 @@
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from ..models import User
 from ..serializers import UserProfileSerializer
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_profile(request):
-    user = request.user
+    # Token claims do not carry the email
+    user = User.objects.get(pk=request.user.pk)
     serializer = UserProfileSerializer(user)
     return Response(serializer.data)
@@ -0,0 +1,33 @@
+import codecs
+
+from django.http import StreamingHttpResponse
+from rest_framework.decorators import api_view, parser_classes, permission_classes
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework import status
+
+from ..provisioning import create_students, read_roster, report_lines, roster_format
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+@parser_classes([MultiPartParser])
+def provision_students(request):
+    '''Create student accounts from an uploaded roster (form field "file").
+
+    The roster is CSV with a header row or JSONL, with username, email and
+    password fields; the format comes from the file extension or the
+    "format" form field. The response streams one JSON result per row as
+    NDJSON, then a summary line.
+    '''
+    upload = request.FILES.get('file')
+    if upload is None:
+        return Response({'detail': 'A roster file is required.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    fmt = roster_format(upload.name, request.data.get('format'))
+    if fmt is None:
+        return Response({'detail': "Roster must be 'csv' or 'jsonl'."}, status=status.HTTP_400_BAD_REQUEST)
+
+    rows = read_roster(codecs.iterdecode(upload, 'utf-8-sig'), fmt)
+    return StreamingHttpResponse(report_lines(create_students(rows)), content_type='application/x-ndjson')
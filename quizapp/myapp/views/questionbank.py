@@ -0,0 +1,57 @@
+from django.conf import settings
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from rest_framework import status
+
+from ..dbrouters import read_replica
+from ..models import Course
+from ..questionbank import match_expression, search_questions
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@read_replica
+def search_question_bank(request):
+    '''Full-text search over the questions and options of the caller's courses.
+
+    ``?q=`` is free text; every word must match, as a prefix, in the
+    question or one of its options. ``?course=<code>`` narrows the search
+    to one course. Results are ranked best first and paginated with
+    ``page`` and ``page_size``; ``next`` is null on the last page.
+    '''
+    user = request.user
+
+    if user.role != 'teacher':
+        return Response({'detail': 'Only teachers can access this.'}, status=status.HTTP_403_FORBIDDEN)
+
+    query = request.query_params.get('q', '')
+    if match_expression(query) is None:
+        return Response({'detail': 'q must contain at least one word.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    max_page_size = getattr(settings, 'QUESTION_SEARCH_MAX_PAGE_SIZE', 100)
+    try:
+        page = int(request.query_params.get('page', 1))
+        page_size = min(int(request.query_params.get('page_size', 20)), max_page_size)
+    except ValueError:
+        return Response({'detail': 'page and page_size must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+    if page < 1 or page_size < 1:
+        return Response({'detail': 'page and page_size must be positive.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    course_ids = user.teaching_course_ids
+    course_code = request.query_params.get('course')
+    if course_code:
+        course_ids = Course.objects.filter(code=course_code, id__in=course_ids).values_list('id', flat=True)
+
+    # One extra row tells whether there is a next page without counting matches
+    results = search_questions(query, course_ids, page_size + 1, (page - 1) * page_size)
+    url = request.build_absolute_uri()
+    return Response({
+        'next': replace_query_param(url, 'page', page + 1) if len(results) > page_size else None,
+        'previous': (
+            None if page == 1 else
+            remove_query_param(url, 'page') if page == 2 else replace_query_param(url, 'page', page - 1)
+        ),
+        'results': results[:page_size],
+    }, status=status.HTTP_200_OK)
@@ -4,10 +4,12 @@ from rest_framework.response import Response
 from rest_framework import status
 from ..models import Course  # adjust path if needed
 from ..serializers import CourseSerializer  # create if not present
+from ..dbrouters import read_replica
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@read_replica
 def get_student_courses(request):
     user = request.user
 
@@ -17,6 +19,6 @@ def get_student_courses(request):
             status=status.HTTP_403_FORBIDDEN
         )
 
-    enrolled_courses = user.enrolled_courses.all()
+    enrolled_courses = user.enrolled_courses.prefetch_related('teachers')
     serialized = CourseSerializer(enrolled_courses, many=True)
     return Response(serialized.data, status=status.HTTP_200_OK)
@@ -3,26 +3,118 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 
+import gzip
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
 from django.utils import timezone
 
-from ..models import Quiz, QuizAttempt
-from ..serializers import QuizDetailSerializer, SubmitQuizSerializer
+from ..answerkey import get_answer_key
+from ..autosave import autosaves
+from ..deadlines import is_expired, start_attempt
+from ..grading import drawn_question_ids
+from ..models import Quiz, QuizAttempt, StudentAnswer
+from ..quizpayload import get_student_quiz_payload
+from ..serializers import StudentAnswerInputSerializer, SubmitQuizSerializer
+from ..spool import get_spool
+from ..dbrouters import read_replica
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@read_replica
 def take_quiz(request, quiz_id):
     try:
         quiz = Quiz.objects.get(id=quiz_id, is_published=True)
     except Quiz.DoesNotExist:
         return Response({'error': 'Quiz not found or not published.'}, status=status.HTTP_404_NOT_FOUND)
 
-    # Optional: Prevent taking if student already submitted
-    if QuizAttempt.objects.filter(student=request.user, quiz=quiz, completed=True).exists():
+    # Opening the quiz starts a student's attempt, and its clock
+    if request.user.role == 'student':
+        attempt, _ = start_attempt(request.user, quiz)
+        completed = attempt.completed
+    else:
+        attempt = None
+        completed = QuizAttempt.objects.filter(student=request.user, quiz=quiz, completed=True).exists()
+    if completed:
         return Response({'error': 'You have already completed this quiz.'}, status=status.HTTP_400_BAD_REQUEST)
+    if attempt is not None and is_expired(attempt, quiz):
+        return Response({'error': 'Time is up for this quiz.'}, status=status.HTTP_403_FORBIDDEN)
+
+    # The quiz body is rendered once per quiz and served pre-compressed;
+    # pooled and shuffled quizzes are reordered per student from it.
+    # Clients revalidate with If-None-Match.
+    etag, body = get_student_quiz_payload(quiz, request.user.id)
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+    elif 'gzip' in request.headers.get('Accept-Encoding', ''):
+        response = HttpResponse(body, content_type='application/json')
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(gzip.decompress(body), content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    patch_vary_headers(response, ['Accept-Encoding', 'Authorization'])
+    return response
+
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+def quiz_answers(request, quiz_id):
+    '''Autosave answers of an attempt in progress, or read them back.
+
+    POST {"answers": [{"question_id": 1, "selected_option_id": 3}]} with
+    any number of answers; the latest answer per question wins. Answers
+    are buffered and written in batches (myapp.autosave), and merged into
+    the final submission. GET returns the saved answers, e.g. to resume
+    after a crashed browser, with the attempt's deadline.
+    '''
+    if request.user.role != 'student':
+        return Response({'error': 'Only students can save answers.'}, status=status.HTTP_403_FORBIDDEN)
+
+    try:
+        quiz = Quiz.objects.get(id=quiz_id, is_published=True)
+    except Quiz.DoesNotExist:
+        return Response({'error': 'Quiz not found or not published.'}, status=status.HTTP_404_NOT_FOUND)
+
+    if request.method == 'GET':
+        attempt = QuizAttempt.objects.filter(student=request.user, quiz=quiz).first()
+        if attempt is None:
+            return Response(
+                {'quiz_id': quiz.id, 'completed': False, 'deadline': None, 'answers': []}, status=status.HTTP_200_OK
+            )
+        saved = dict(StudentAnswer.objects.filter(attempt=attempt).values_list('question_id', 'selected_option_id'))
+        saved.update(autosaves.peek(attempt.id))
+        return Response({
+            'quiz_id': quiz.id,
+            'completed': attempt.completed,
+            'deadline': attempt.deadline,
+            'answers': [{'question_id': q, 'selected_option_id': o} for q, o in sorted(saved.items())],
+        }, status=status.HTTP_200_OK)
 
-    serializer = QuizDetailSerializer(quiz)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    serializer = StudentAnswerInputSerializer(data=request.data.get('answers'), many=True)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    key = get_answer_key(quiz.id)
+    drawn = drawn_question_ids(key, quiz.id, request.user.id)
+    answers = {}
+    for answer in serializer.validated_data:
+        question_id, option_id = answer['question_id'], answer['selected_option_id']
+        entry = key.get(question_id)
+        if entry is None or option_id not in entry[1] or (drawn is not None and question_id not in drawn):
+            return Response({'error': f'Invalid answer to question {question_id}.'}, status=status.HTTP_400_BAD_REQUEST)
+        answers[question_id] = option_id
+
+    attempt, _ = start_attempt(request.user, quiz)
+    if attempt.completed:
+        return Response({'error': 'You have already submitted this quiz.'}, status=status.HTTP_403_FORBIDDEN)
+    if is_expired(attempt, quiz):
+        return Response({'error': 'Time is up for this quiz.'}, status=status.HTTP_403_FORBIDDEN)
+
+    autosaves.save(attempt.id, answers)
+    return Response({'saved': len(answers)}, status=status.HTTP_202_ACCEPTED)
 
 
 @api_view(['POST'])
@@ -43,15 +135,51 @@ def submit_quiz(request):
         if attempt.completed:
             return Response({'error': 'You have already submitted this quiz.'}, status=status.HTTP_403_FORBIDDEN)
     except QuizAttempt.DoesNotExist:
-        pass  # No attempt yet; proceed
+        attempt = None  # No attempt yet; proceed
+
+    # Late submissions are refused; expire_attempts grades what was saved
+    if is_expired(attempt, quiz):
+        return Response({'error': 'Time is up for this quiz.'}, status=status.HTTP_403_FORBIDDEN)
 
     # Proceed to serialize and save submission
     serializer = SubmitQuizSerializer(data=request.data, context={'request': request})
-    if serializer.is_valid():
-        attempt = serializer.save()
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    # Autosaved answers still in this process's buffer go first, so the
+    # submitted ones win; flushed ones are merged in by grading
+    answers = [dict(answer) for answer in serializer.validated_data['answers']]
+    if attempt is not None:
+        buffered = autosaves.take(attempt.id)
+        answers = [{'question_id': q, 'selected_option_id': o} for q, o in buffered.items()] + answers
+
+    if settings.QUIZ_SUBMISSION_MODE == 'queued':
+        # Write-behind: spool the submission and let process_submissions
+        # grade it in a batch; the student polls the receipt for the score.
+        receipt = get_spool().append(request.user.id, quiz.id, answers)
         return Response({
-            'message': 'Quiz submitted successfully.',
-            'score': attempt.score
-        }, status=status.HTTP_200_OK)
-    
-    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            'message': 'Quiz submission received.',
+            'receipt': receipt,
+        }, status=status.HTTP_202_ACCEPTED)
+
+    attempt = serializer.save(answers=answers)
+    return Response({
+        'message': 'Quiz submitted successfully.',
+        'score': attempt.score
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def submission_status(request, receipt):
+    entry = get_spool().get(receipt)
+    if entry is None or entry['student_id'] != request.user.id:
+        return Response({'error': 'Submission not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+    return Response({
+        'receipt': entry['receipt'],
+        'quiz_id': entry['quiz_id'],
+        'status': entry['status'],
+        'score': entry['score'],
+        'error': entry['error'],
+    }, status=status.HTTP_200_OK)
@@ -4,10 +4,12 @@ from rest_framework.response import Response
 from rest_framework import status
 
 from myapp.models import Course
+from myapp.dbrouters import read_replica
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@read_replica
 def get_teacher_courses(request):
     user = request.user
     
@@ -1,46 +1,35 @@
+from django.http import HttpResponse
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 
-from ..models import Quiz, QuizAttempt, StudentAnswer, Option
+from ..models import AttemptReview, QuizAttempt
+from ..reviews import write_reviews
+from ..dbrouters import read_replica
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@read_replica
 def view_score(request, quiz_id):
     user = request.user
 
     # Ensure student has attempted the quiz
     try:
-        attempt = QuizAttempt.objects.get(student=user, quiz__id=quiz_id)
+        attempt = QuizAttempt.objects.select_related('review').get(student=user, quiz__id=quiz_id)
     except QuizAttempt.DoesNotExist:
         return Response({"error": "Quiz not attempted or does not exist."}, status=status.HTTP_404_NOT_FOUND)
 
-    data = {
-        "quiz_title": attempt.quiz.title,
-        "score": attempt.score,
-        "completed": attempt.completed,
-        "questions": []
-    }
+    # Reviews show the correct options; an attempt in progress only holds
+    # autosaved answers
+    if not attempt.completed:
+        return Response({"error": "Quiz not submitted yet."}, status=status.HTTP_400_BAD_REQUEST)
 
-    for answer in attempt.answers.select_related('question', 'selected_option').all():
-        question_data = {
-            "question_id": answer.question.id,
-            "question_text": answer.question.text,
-            "selected_option_id": answer.selected_option.id if answer.selected_option else None,
-            "selected_option_text": answer.selected_option.text if answer.selected_option else None,
-            "is_correct": answer.is_correct,
-            "options": []
-        }
-
-        # Get all options for the question
-        for opt in answer.question.options.all():
-            question_data["options"].append({
-                "option_id": opt.id,
-                "text": opt.text,
-                "is_correct": opt.is_correct
-            })
-
-        data["questions"].append(question_data)
+    # Completed attempts carry a review rendered at submission time; it is
+    # re-materialized here if an edit to the quiz dropped it.
+    try:
+        return HttpResponse(attempt.review.document, content_type='application/json')
+    except AttemptReview.DoesNotExist:
+        pass
 
-    return Response(data, status=status.HTTP_200_OK)
+    return Response(write_reviews([attempt.id])[attempt.id], status=status.HTTP_200_OK)
@@ -76,15 +76,65 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'quizapp.wsgi.application'
+ASGI_APPLICATION = 'quizapp.asgi.application'
 
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# Applied to every new SQLite connection: WAL lets readers run alongside the
+# single writer, busy_timeout waits for the write lock instead of failing
+# with "database is locked", synchronous=NORMAL is durable under WAL except
+# for the last transactions before a power loss, and mmap/cache_size keep
+# hot pages in memory.
+SQLITE_PRAGMAS = [
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA busy_timeout=20000',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA mmap_size=268435456',
+    'PRAGMA cache_size=-65536',
+    'PRAGMA temp_store=MEMORY',
+]
+SQLITE_DB_PATH = BASE_DIR / 'db.sqlite3'
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': SQLITE_DB_PATH,
+        'OPTIONS': {
+            'init_command': ';'.join(SQLITE_PRAGMAS),
+            # Take the write lock at BEGIN so transactions queue on
+            # busy_timeout instead of failing when upgrading a read lock
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+    },
+    # Read-only connection to the same file used by the read-heavy views
+    # (see myapp.dbrouters). Under WAL its readers never wait on the writer.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f'file:{SQLITE_DB_PATH}?mode=ro',
+        'OPTIONS': {
+            'init_command': ';'.join(SQLITE_PRAGMAS[1:] + ['PRAGMA query_only=1']),
+            'timeout': 20,
+        },
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+DATABASE_ROUTERS = ['myapp.dbrouters.ReadReplicaRouter']
+
+# The default local-memory cache is per process. Point this at a shared
+# backend (Redis, Memcached or FileBasedCache) when running several workers
+# so rendered quiz payloads are built once for all of them.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
     }
 }
 
@@ -137,7 +187,83 @@ STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'myapp.authentication.MembershipJWTAuthentication',
     )
 }
 
+# Tokens carry the user's role and course ids (myapp.membership)
+SIMPLE_JWT = {
+    'TOKEN_OBTAIN_SERIALIZER': 'myapp.serializers.MembershipTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'myapp.serializers.MembershipTokenRefreshSerializer',
+}
+
+# How long a process trusts its cached copy of a user's membership
+# version. Changes clear the shared cache at once; with a per-process
+# cache this bounds how long another process accepts outdated claims.
+MEMBERSHIP_VERSION_CACHE_SECONDS = 60
+
+
+# Number of quiz answer keys kept in each process's LRU cache (myapp.answerkey)
+ANSWER_KEY_CACHE_SIZE = 256
+
+# Questions inserted per transaction by the JSONL quiz import endpoint
+QUIZ_IMPORT_BATCH_QUESTIONS = 2000
+
+# Bulk student provisioning (myapp.provisioning): password hashing
+# processes (None: one per core) and accounts inserted per transaction
+PROVISIONING_HASH_WORKERS = None
+PROVISIONING_BATCH_SIZE = 1000
+
+# Seconds a rendered take_quiz payload stays cached (myapp.quizpayload)
+QUIZ_PAYLOAD_CACHE_TIMEOUT = 24 * 3600
+
+# Upper bound, in seconds, on how long a student dashboard stays cached;
+# entries also expire when one of its quizzes opens or closes (myapp.dashboard)
+DASHBOARD_CACHE_SECONDS = 300
+
+# Autosaved answers are buffered in each process and written in one upsert
+# every AUTOSAVE_FLUSH_INTERVAL seconds, or as soon as AUTOSAVE_MAX_PENDING
+# answers are waiting (myapp.autosave). An interval of 0 disables the
+# background flush.
+AUTOSAVE_FLUSH_INTERVAL = 2.0
+AUTOSAVE_MAX_PENDING = 1000
+
+# Attempts end ATTEMPT_GRACE_SECONDS after their deadline (start plus the
+# quiz's duration, capped at its end time); later answers and submissions
+# are refused. `manage.py expire_attempts` grades the saved answers of
+# expired attempts every ATTEMPT_SWEEP_INTERVAL seconds (myapp.deadlines).
+ATTEMPT_GRACE_SECONDS = 30
+ATTEMPT_SWEEP_INTERVAL = 15.0
+
+# Live quiz monitor (myapp.monitor): changed counters are pushed to
+# watchers every MONITOR_TICK_SECONDS and reloaded from the database every
+# MONITOR_RESYNC_SECONDS; idle streams get a keepalive comment.
+MONITOR_TICK_SECONDS = 1.0
+MONITOR_RESYNC_SECONDS = 5.0
+MONITOR_KEEPALIVE_SECONDS = 15.0
+
+# Largest page_size accepted by the question bank search
+QUESTION_SEARCH_MAX_PAGE_SIZE = 100
+
+# Estimated Jaccard similarity (of text and options) from which
+# create_quiz and import_quizzes flag a question as a near-duplicate
+# (myapp.duplicates)
+DUPLICATE_SIMILARITY = 0.8
+
+# Completed attempts regraded per transaction after an answer key
+# correction (myapp.regrade)
+REGRADE_CHUNK_SIZE = 500
+
+# Backend quiz generation (myapp.generation). QUIZ_GENERATOR is the dotted
+# path of a myapp.generation.QuizGenerator; the default is a deterministic
+# stand-in. At most GENERATION_WORKERS jobs run at once in each process
+# (0 runs them inline); requests ask for at most GENERATION_MAX_QUESTIONS.
+QUIZ_GENERATOR = 'myapp.generation.LocalGenerator'
+GENERATION_WORKERS = 4
+GENERATION_MAX_QUESTIONS = 50
+
+# 'sync' grades submit_quiz requests inline. 'queued' appends them to a
+# local write-behind spool and returns a receipt; run
+# `manage.py process_submissions` to grade the spool in batches.
+QUIZ_SUBMISSION_MODE = os.environ.get('QUIZ_SUBMISSION_MODE', 'sync')
+SUBMISSION_SPOOL_PATH = os.environ.get('SUBMISSION_SPOOL_PATH', BASE_DIR / 'submission_spool.sqlite3')